@@ -1,13 +1,18 @@
+import logging
 import dag_crawling
+from utils_crawler.board_registry import CRAWL_FROM_LATEST_TO_MIDDLE, find_board
 
 base_url = "https://www.ptt.cc/bbs/HatePolitics/index.html"
-ptt_board = "gossip" if "Gossiping" in base_url else "politics"
+ptt_board = dag_crawling.decide_ptt_board(base_url)
+dag_crawling.setup_task_logging()
 
 for i in range(3, 4):
     crawl_results = dag_crawling.crawl_articles(
         base_url, i, 1,
-        crawling_logger=dag_crawling.logger_politic_from_latest_to_middle
+        crawling_logger=logging.getLogger(
+            find_board(base_url).logger_name_of(CRAWL_FROM_LATEST_TO_MIDDLE)
+        )
     )
     if crawl_results:
-        collection = dag_crawling.db["testing_collection"]
+        collection = dag_crawling.get_db()["testing_collection"]
         collection.insert_many(crawl_results)
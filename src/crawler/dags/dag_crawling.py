@@ -1,105 +1,232 @@
 import os
+import re
 import bs4
+import html
 import json
 import time
-import pytz
+import asyncio
+import functools
 import logging
+import tempfile
+import socket
 import requests
 import urllib.parse
 import configparser
-from airflow import DAG
 from loguru import logger
-import google.cloud.logging
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from dotenv import load_dotenv
-from pymongo import MongoClient
-from fake_useragent import UserAgent
-from datetime import datetime, timedelta
-from typing import Union, Dict, Tuple, Any, List
-from airflow.operators.empty import EmptyOperator
-from airflow.operators.python import PythonOperator
-from google.oauth2.service_account import Credentials
-
-SLEEP_INTERVAL_BETWEEN_ARTICLES = 4.0
-SLEEP_INTERVAL_BETWEEN_PAGES = 9.0
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import PyMongoError
+from redis import Redis
+from datetime import datetime
+from typing import Callable, Dict, Tuple, Any, List
+from utils_crawler.crawl_engine import AsyncCrawlEngine
+from utils_crawler.board_context import BoardCrawlContext, REQUEST_KIND_INDEX
+from utils_crawler.bulk_writer import ArticleBulkWriter, build_article_update
+from utils_crawler.change_detection import build_index_signal, should_refetch
+from utils_crawler.comment_fingerprint import (
+    COMMENT_FINGERPRINT_TAIL,
+    comment_fingerprint,
+    split_unseen_comments,
+)
+from utils_crawler.retry_policy import ExponentialBackoffRetryPolicy, RetryBudget
+from utils_crawler.page_parser import BACKEND_LXML, SoupPttPage, load_page
+from utils_crawler.recrawl_scheduler import RecrawlScheduler, observe_velocity
+from utils_crawler.html_archive import HtmlArchive
+from utils_crawler.write_spool import WriteSpool
+from utils_crawler.pipeline import ParseStage, WriteStage
+from utils_crawler.ptt_time import parse_article_time, parse_comment_time
+from utils_crawler.telemetry import CrawlTelemetry, export_telemetry
+from utils_crawler.rate_control import AimdRateController
+from utils_crawler.board_registry import find_board
+from utils_crawler.backfill import (
+    BackfillCheckpointStore,
+    generation_to_page_idx,
+    next_page_idx,
+    plan_shards,
+    summarize_progress,
+)
+from utils_crawler.url_frontier import ITEM_KIND_ARTICLE, ITEM_KIND_INDEX, UrlFrontier
+from utils_crawler.crawl_cadence import CrawlCadenceStore, is_due, observe_run, plan_pages
+
+MAX_REQUESTS_IN_FLIGHT = 4
+# the rate of the blocking crawler (one article every 4 seconds), raised by the rate control up to its ceiling
+REQUESTS_PER_SECOND_PER_HOST = float(os.getenv("PTT_REQUESTS_PER_SECOND", "0.25"))
+REQUEST_BURST_PER_HOST = 3
+RATE_CONTROL_DIR = os.getenv(
+    "PTT_RATE_CONTROL_DIR", os.path.join(tempfile.gettempdir(), "ptt_rate_control")
+)
+RATE_MIN_REQUESTS_PER_SECOND = 0.05
+RATE_MAX_REQUESTS_PER_SECOND = float(os.getenv("PTT_RATE_MAX_REQUESTS_PER_SECOND", "1.0"))
+RATE_INCREASE_PER_SECOND = 0.05
+RATE_DECREASE_FACTOR = 0.5
+RATE_DECREASE_COOLDOWN = 10.0
+RATE_LATENCY_SPIKE_FACTOR = 4.0
+RATE_LATENCY_SPIKE_MIN_SECONDS = 3.0
+RATE_SYNC_SECONDS = 1.0
 SLEEP_INTERVAL_IF_GET_CAUGHT = 60.0
-TAIPEI_TIMEZONE = pytz.timezone("Asia/Taipei")
-
-PAGE_GENERATION_LATEST = 1
-PAGE_GENERATION_MIDDLE = 5
-PAGE_GENERATION_ANCIENT = 5000
-PAGE_GENERATION_EARLIEST = 40000
+RETRY_MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 4.0
+RETRY_BUDGET_RESERVE = 50
+RETRY_BUDGET_RATIO = 0.2
+WRITE_FLUSH_EVERY_PAGES = 1
+COMMENT_FINGERPRINT_SLACK = 8
+INDEX_SIGNAL_MAX_STALENESS = 60 * 60
+HTML_PARSER_BACKEND = BACKEND_LXML
+RECRAWL_REQUESTS_PER_RUN = 100
+RECRAWL_VELOCITY_HALF_LIFE = 6 * 60 * 60
+RECRAWL_MAX_ARTICLE_AGE = 3 * 24 * 60 * 60
+RECRAWL_MIN_EXPECTED_COMMENTS = 1.0
+BACKFILL_PAGES_PER_SHARD = 1000
+BACKFILL_PROGRESS_EVERY_PAGES = 50
+BACKFILL_CHECKPOINT_COLLECTION = "backfill_checkpoints"
+CADENCE_COLLECTION = "crawl_cadence"
+CADENCE_MIN_PAGES = 2
+CADENCE_MAX_PAGES = 20
+CADENCE_TARGET_ARTICLES_PER_RUN = 40
+CADENCE_MIN_INTERVAL = 2 * 60
+CADENCE_MAX_INTERVAL = 60 * 60
+CADENCE_SMOOTHING = 0.3
+CADENCE_DUE_TOLERANCE = 30
+REDIS_URL = os.getenv("PTT_REDIS_URL")
+FRONTIER_LEASE_SECONDS = 10 * 60
+FRONTIER_LEASE_ITEMS = 20
+FRONTIER_POLL_SECONDS = 5.0
+ARTICLE_URL_INDEX_NAME = "article_url_unique"
+DUPLICATES_DELETED_PER_BATCH = 1000
+HTML_ARCHIVE_DIR = os.getenv("PTT_HTML_ARCHIVE_DIR")
+METRICS_DIR = os.getenv("PTT_METRICS_DIR")
+WRITE_SPOOL_DIR = os.getenv("PTT_WRITE_SPOOL_DIR")
+DEFAULT_SERVER_SELECTION_TIMEOUT_MS = 30000
+SPOOL_SERVER_SELECTION_TIMEOUT_MS = 5000
+PARSE_WORKERS = min(4, os.cpu_count() or 1)
+PARSE_MAX_PENDING_PAGES = 2 * PARSE_WORKERS
+WRITE_MAX_PENDING_BATCHES = 2
+ARTICLE_META_STRAINER = SoupStrainer("div", class_="article-metaline")
+PUSH_STRAINER = SoupStrainer("div", class_="push")
+PUSH_DIV_OPENING = '<div class="push'
+PUSH_TAG_PATTERN = re.compile(r'push-tag">([^<]*)<')
+PUSH_IPDATETIME_PATTERN = re.compile(r'push-ipdatetime">([^<]*)<')
 
 load_dotenv(verbose=True)
 
-default_args = {
-    "owner": "Raymond",
-    "start_date": datetime(2023, 1, 1),
-    "email_on_failure": False,
-    "email_on_retry": False,
-    "retries": 5,
-    "retry_delay": timedelta(minutes=5),
-}
-
-uri = os.getenv("ATLAS_URI", "None")
-client = MongoClient(uri)
-db = client.ptt
+# created on first use by get_db (assign a database to use another one)
+db = None
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 ini_file_path = os.path.join(current_dir, 'config.ini')
-config = configparser.ConfigParser()
-config.read(ini_file_path)
-environment = config["settings"]["environment"]
 
-ua = UserAgent()
 cookies = {"from": "/bbs/Gossiping/index.html", "yes": "yes"}
 
-logger.add(
-    sink="logs/airflow_crawler_{time}.log",
-    rotation="00:00",
-    retention="14 days",
-    level="DEBUG",
-    encoding="utf-8",
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {file}:{line} {function}() | {message}",
-    enqueue=True,
-    serialize=True,
-    backtrace=True,
-    diagnose=True,
-)
 
-if environment == "production":
-    gcp_key_path = os.environ.get("AIRFLOW__LOGGING__GOOGLE_KEY_PATH")
-    credentials = Credentials.from_service_account_file(gcp_key_path)
-    client = google.cloud.logging.Client(credentials=credentials)
-    client.setup_logging()
+def get_db():
+    """
+    connect to mongoDB on first use, so that importing the crawler opens no connection
+    :return: ptt database
+    """
+    global db
+    if db is None:
+        uri = os.getenv("ATLAS_URI", "None")
+        # with the write spool, the crawl does not wait long for an unreachable database
+        db = MongoClient(
+            uri,
+            serverSelectionTimeoutMS=(
+                SPOOL_SERVER_SELECTION_TIMEOUT_MS if WRITE_SPOOL_DIR else DEFAULT_SERVER_SELECTION_TIMEOUT_MS
+            ),
+        ).ptt
+    return db
+
+
+@functools.lru_cache(maxsize=None)
+def get_redis() -> Redis:
+    """
+    connect to the redis of PTT_REDIS_URL once per process (the url frontier and the shared rate control)
+    :return: redis client
+    :raises ValueError: if PTT_REDIS_URL is not set
+    """
+    if not REDIS_URL:
+        raise ValueError("PTT_REDIS_URL is not set.")
+    return Redis.from_url(REDIS_URL, decode_responses=True)
 
-logger_gossip_from_latest_to_middle = logging.getLogger(
-    "logger_gossip_from_latest_to_middle"
-)
-logger_gossip_from_middle_to_ancient = logging.getLogger(
-    "logger_gossip_from_middle_to_ancient"
-)
-logger_gossip_from_ancient_to_earliest = logging.getLogger(
-    "logger_gossip_from_ancient_to_earliest"
-)
-logger_politic_from_latest_to_middle = logging.getLogger(
-    "logger_politic_from_latest_to_middle"
-)
-logger_politic_from_middle_to_ancient = logging.getLogger(
-    "logger_politic_from_middle_to_ancient"
-)
-logger_politic_from_ancient_to_earliest = logging.getLogger(
-    "logger_politic_from_ancient_to_earliest"
-)
+
+@functools.lru_cache(maxsize=None)
+def get_user_agent():
+    """
+    load the user agents of fake_useragent once per process
+    :return: fake_useragent.UserAgent
+    """
+    from fake_useragent import UserAgent
+
+    return UserAgent()
+
+
+@functools.lru_cache(maxsize=None)
+def setup_task_logging():
+    """
+    add the log file of the crawler and, in production, send the logs to google cloud logging.
+    called once per process by the tasks (see dag_ptt_boards.run_crawler_task)
+    """
+    logger.add(
+        sink="logs/airflow_crawler_{time}.log",
+        rotation="00:00",
+        retention="14 days",
+        level="DEBUG",
+        encoding="utf-8",
+        format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {file}:{line} {function}() | {message}",
+        enqueue=True,
+        serialize=True,
+        backtrace=True,
+        diagnose=True,
+    )
+
+    config = configparser.ConfigParser()
+    config.read(ini_file_path)
+    environment = config["settings"]["environment"]
+    if environment == "production":
+        import google.cloud.logging
+        from google.oauth2.service_account import Credentials
+
+        gcp_key_path = os.environ.get("AIRFLOW__LOGGING__GOOGLE_KEY_PATH")
+        credentials = Credentials.from_service_account_file(gcp_key_path)
+        client = google.cloud.logging.Client(credentials=credentials)
+        client.setup_logging()
+
+
+@functools.lru_cache(maxsize=None)
+def get_html_archive() -> HtmlArchive | None:
+    """
+    open the raw html archive of this process (set PTT_HTML_ARCHIVE_DIR to enable it)
+    :return: html archive (None if archiving is disabled)
+    """
+    return HtmlArchive(HTML_ARCHIVE_DIR) if HTML_ARCHIVE_DIR else None
+
+
+async def fetch_and_parse_article(engine: AsyncCrawlEngine, article_url: str, parse):
+    """
+    download an article page, archive it (if archiving is enabled) and parse it in the parse stage
+    :param engine: crawl engine
+    :param article_url: article url
+    :param parse: picklable function turning html into the parsing result
+    :return: parsing result
+    """
+    status, page_html = await engine.fetch_page(article_url)
+    html_archive = get_html_archive()
+    # the error page of a deleted article is not the article: only articles are archived
+    if html_archive is not None and status == 200:
+        await asyncio.to_thread(
+            html_archive.add, article_url, page_html, datetime.now().timestamp()
+        )
+    return await engine.parse(parse, page_html)
 
 
 def decide_ptt_board(url: str) -> str:
     """
     decide mongoDB collection
     :base_url: article url
-    :return: mongoDB collection (either gossip or politics)
+    :return: mongoDB collection of the registered board of the url
+    :raises ValueError: if the board of the url is not registered
     """
-    return "gossip" if "Gossiping" in url else "politics"
+    return find_board(url).collection
 
 
 def is_article_existing(article_url: str, target_collection: str) -> bool:
@@ -110,7 +237,7 @@ def is_article_existing(article_url: str, target_collection: str) -> bool:
     :return: True if article exists, False otherwise
     """
     return (
-        True if db[target_collection].find_one({"article_url": article_url}) else False
+        True if get_db()[target_collection].find_one({"article_url": article_url}) else False
     )
 
 
@@ -118,35 +245,28 @@ def update_article(
     article_url: str, new_data: dict, previous_num_comments: int, target_collection: str
 ):
     """
-    update article data in mongodb
+    update article data in mongodb, appending the comments after the stored fingerprint tail
     :param target_collection: target collection
     :param article_url: article url
     :param new_data: new data
-    :param previous_num_comments: previous number of comments
+    :param previous_num_comments: previous number of comments (where the new comments start if the article has
+        no fingerprint tail)
     """
-    num_of_favor = new_data["num_of_favor"]
-    num_of_against = new_data["num_of_against"]
-    num_of_arrow = new_data["num_of_arrow"]
-    num_of_comment = num_of_favor + num_of_against + num_of_arrow
-    new_comments = new_data["comments"][previous_num_comments:]
-
-    db[target_collection].update_one(
-        {"article_url": article_url},
-        {
-            "$set": {
-                "article_data.last_crawled_datetime": datetime.now().timestamp(),
-                "article_data.num_of_favor": num_of_favor,
-                "article_data.num_of_against": num_of_against,
-                "article_data.num_of_arrow": num_of_arrow,
-                "article_data.num_of_comment": num_of_comment,
-            }
-        },
+    stored = get_db()[target_collection].find_one(
+        {"article_url": article_url}, {"_id": 0, "article_data.comment_fingerprints": 1}
     )
-
-    for comment in new_comments:
-        db[target_collection].update_one(
-            {"article_url": article_url}, {"$push": {"article_data.comments": comment}}
+    stored_fingerprints = (stored or {}).get("article_data", {}).get("comment_fingerprints")
+    new_comments, fingerprints = split_unseen_comments(
+        new_data["comments"], stored_fingerprints, previous_num_comments
+    )
+    get_db()[target_collection].update_one(
+        *build_article_update(
+            article_url,
+            {**new_data, "comment_fingerprints": fingerprints},
+            new_comments,
+            previous_fingerprints=stored_fingerprints,
         )
+    )
 
 
 def get_article_num_of_comments(article_url: str, target_collection: str) -> int:
@@ -156,31 +276,161 @@ def get_article_num_of_comments(article_url: str, target_collection: str) -> int
     :param article_url: article url
     :return: number of comments
     """
-    return db[target_collection].find_one({"article_url": article_url})["article_data"][
+    return get_db()[target_collection].find_one({"article_url": article_url})["article_data"][
         "num_of_comment"
     ]
 
 
-def update_wrong_ip(target_collection: str):
+def get_articles_num_of_comments(
+    article_urls: list[str], target_collection: str
+) -> dict[str, int]:
     """
-    find out documents with error ip including space at the end before update the ip address
+    get number of comments for all articles of a page with one query
     :param target_collection: target collection
+    :param article_urls: article urls
+    :return: article url -> number of comments (articles not in mongodb are left out)
     """
-    results = list(
-        db[target_collection].find({"article_data.ipaddress": {"$regex": "\\s"}})
+    documents = get_db()[target_collection].find(
+        {"article_url": {"$in": article_urls}},
+        {"_id": 0, "article_url": 1, "article_data.num_of_comment": 1},
+    )
+    return {
+        document["article_url"]: document.get("article_data", {}).get("num_of_comment")
+        for document in documents
+    }
+
+
+def get_articles_crawl_state(
+    article_urls: list[str], target_collection: str
+) -> dict[str, dict]:
+    """
+    get number of comments, time, comment fingerprint tail, stored index signal and recrawl state for all articles
+    of a page with one query
+    :param target_collection: target collection
+    :param article_urls: article urls
+    :return: article url -> crawl state (articles not in mongodb are left out)
+    """
+    documents = get_db()[target_collection].find(
+        {"article_url": {"$in": article_urls}},
+        {
+            "_id": 0,
+            "article_url": 1,
+            "article_data.num_of_comment": 1,
+            "article_data.time": 1,
+            "article_data.comment_fingerprints": 1,
+            "index_signal": 1,
+            "recrawl_state": 1,
+        },
     )
-    for result in results:
-        new_ip = result["article_data"]["ipaddress"].split(" ")[0]
-        new_ip_values = {"$set": {"article_data.ipaddress": new_ip}}
-        db[target_collection].update_one(
-            {"article_data.ipaddress": {"$regex": "\\s"}}, new_ip_values
+    return {
+        document["article_url"]: {
+            "num_of_comment": document.get("article_data", {}).get("num_of_comment"),
+            "time": document.get("article_data", {}).get("time"),
+            "comment_fingerprints": document.get("article_data", {}).get("comment_fingerprints"),
+            "index_signal": document.get("index_signal"),
+            "recrawl_state": document.get("recrawl_state"),
+        }
+        for document in documents
+    }
+
+
+def get_recrawl_candidates(
+    target_collection: str, now: float, max_article_age: float
+) -> list[dict]:
+    """
+    get the recrawl state of the articles posted recently enough to be recrawled
+    :param target_collection: target collection
+    :param now: current timestamp
+    :param max_article_age: seconds after posting from which articles are not recrawled any more
+    :return: documents with article url, time, number of comments, comment fingerprint tail and recrawl state
+    """
+    return list(
+        get_db()[target_collection].find(
+            {
+                "article_data.time": {"$gte": now - max_article_age},
+                "recrawl_state": {"$exists": True},
+            },
+            {
+                "_id": 0,
+                "article_url": 1,
+                "article_data.time": 1,
+                "article_data.num_of_comment": 1,
+                "article_data.comment_fingerprints": 1,
+                "recrawl_state": 1,
+            },
         )
+    )
+
+
+def build_ip_repair_expression(ip_field: str) -> dict:
+    """
+    build the aggregation expression keeping what comes before the first space of an ip (non-strings are kept)
+    :param ip_field: field path of the ip (e.g. "$article_data.ipaddress")
+    :return: aggregation expression
+    """
+    return {
+        "$cond": [
+            {"$eq": [{"$type": ip_field}, "string"]},
+            {"$arrayElemAt": [{"$split": [{"$trim": {"input": ip_field}}, " "]}, 0]},
+            ip_field,
+        ]
+    }
 
 
-def delete_duplicates(target_collection: str):
+def update_wrong_ip(target_collection: str) -> int:
     """
-    delete duplicated articles in mongodb
+    trim the article ips and commenter ips including spaces with one server-side update
     :param target_collection: target collection
+    :return: number of modified documents
+    """
+    result = get_db()[target_collection].update_many(
+        {
+            "$or": [
+                {"article_data.ipaddress": {"$regex": "\\s"}},
+                {"article_data.comments.commenter_ip": {"$regex": "\\s"}},
+            ]
+        },
+        [
+            {
+                "$set": {
+                    "article_data.ipaddress": build_ip_repair_expression(
+                        "$article_data.ipaddress"
+                    ),
+                    "article_data.comments": {
+                        "$cond": [
+                            {"$isArray": "$article_data.comments"},
+                            {
+                                "$map": {
+                                    "input": "$article_data.comments",
+                                    "as": "comment",
+                                    "in": {
+                                        "$mergeObjects": [
+                                            "$$comment",
+                                            {
+                                                "commenter_ip": build_ip_repair_expression(
+                                                    "$$comment.commenter_ip"
+                                                )
+                                            },
+                                        ]
+                                    },
+                                }
+                            },
+                            "$article_data.comments",
+                        ]
+                    },
+                }
+            }
+        ],
+    )
+    logger.info(f"Wrong ip repaired in {target_collection}: {result.modified_count} documents")
+    return result.modified_count
+
+
+def delete_duplicates(target_collection: str) -> int:
+    """
+    delete duplicated articles in mongodb (the first stored document of each article is kept)
+    :param target_collection: target collection
+    :return: number of deleted documents
     """
     pipeline = [
         {
@@ -192,17 +442,51 @@ def delete_duplicates(target_collection: str):
         },
         {"$match": {"count": {"$gt": 1}}},
     ]
-    duplicates = db[target_collection].aggregate(pipeline)
+    duplicates = get_db()[target_collection].aggregate(pipeline, allowDiskUse=True)
 
+    duplicate_ids = []
     for duplicate in duplicates:
-        article_url = duplicate["_id"]
-        duplicate_ids = duplicate["ids"]
         logger.info(
-            f"Article ({article_url}) appears {len(duplicate_ids)} times. Duplicates are deleted."
+            f"Article ({duplicate['_id']}) appears {duplicate['count']} times. Duplicates are deleted."
         )
+        duplicate_ids.extend(duplicate["ids"][1:])
+
+    num_deleted = 0
+    for i in range(0, len(duplicate_ids), DUPLICATES_DELETED_PER_BATCH):
+        batch = duplicate_ids[i: i + DUPLICATES_DELETED_PER_BATCH]
+        num_deleted += get_db()[target_collection].delete_many({"_id": {"$in": batch}}).deleted_count
+    return num_deleted
+
 
-        for _id in duplicate_ids[1:]:
-            db[target_collection].delete_one({"_id": _id})
+def has_article_url_index(target_collection: str) -> bool:
+    """
+    check whether article_url is unique in a collection
+    :param target_collection: target collection
+    :return: whether the unique article_url index exists
+    """
+    return any(
+        index.get("unique") and index["key"] == [("article_url", 1)]
+        for index in get_db()[target_collection].index_information().values()
+    )
+
+
+def ensure_article_url_index(target_collection: str):
+    """
+    make article_url unique: the first time, existing duplicates are deleted and the unique index is built,
+    afterwards only the index is checked
+    :param target_collection: target collection
+    """
+    if has_article_url_index(target_collection):
+        logger.debug(f"Unique article_url index exists in {target_collection}.")
+        return
+
+    num_deleted = delete_duplicates(target_collection)
+    get_db()[target_collection].create_index(
+        [("article_url", ASCENDING)], unique=True, name=ARTICLE_URL_INDEX_NAME
+    )
+    logger.info(
+        f"Unique article_url index built in {target_collection} ({num_deleted} duplicates deleted)."
+    )
 
 
 # --- Functions related to crawling ---
@@ -224,23 +508,36 @@ def parse_basic_info(
     :param article_basic_info: article basic info part
     :return: tuple of article's title, author, published time and timestamp or error message
     """
+    return parse_article_meta_values(
+        [
+            get_article_info(article_basic_info, _idx)
+            for _idx in range(min(len(article_basic_info), 3))
+        ]
+    )
+
+
+def parse_article_meta_values(
+    meta_values: list[str],
+) -> dict[str, str] | tuple[str, str, str, datetime, Any]:
+    """
+    parse article basic info from the texts of its meta values
+    :param meta_values: texts of the article's meta values (author, title and time)
+    :return: tuple of article's title, author, published time and timestamp or error message
+    """
     try:
-        article_author = get_article_info(article_basic_info, 0)
-        article_title = get_article_info(article_basic_info, 1)
-        article_time = get_article_info(article_basic_info, 2)
+        article_author = meta_values[0]
+        article_title = meta_values[1]
+        article_time = meta_values[2]
     except IndexError as e:
         logger.exception(f"{e}: article author, title and time have problems")
         return {"error": "Article's info (author, title and time) is incomplete"}
 
     try:
-        article_timestamp = datetime.strptime(article_time, "%a %b %d %H:%M:%S %Y")
+        article_timestamp, localized_article_timestamp = parse_article_time(article_time)
     except ValueError:
         # to handle: https://www.ptt.cc/bbs/HatePolitics/M.1694139970.A.129.html (only occurred once)
         article_time = "Fri Sep 8 10:26:08 2023"
-        article_timestamp = datetime.strptime(article_time, "%a %b %d %H:%M:%S %Y")
-    localized_article_timestamp = TAIPEI_TIMEZONE.localize(
-        article_timestamp
-    ).timestamp()
+        article_timestamp, localized_article_timestamp = parse_article_time(article_time)
 
     return (
         article_author,
@@ -260,13 +557,26 @@ def parse_article_content_and_ip(
     :param article_time: article time
     :return: tuple of article content and ip or error message
     """
+    return split_article_content_and_ip(
+        main_content_text=SoupPttPage(soup).main_content_text(),
+        article_time=article_time,
+    )
+
+
+def split_article_content_and_ip(
+    main_content_text: str | None, article_time: str
+) -> tuple[str | None, str | None] | dict[str, str]:
+    """
+    split the text of main-content into article content and ip
+    :param main_content_text: text of div#main-content (None if the page has none)
+    :param article_time: article time
+    :return: tuple of article content and ip or error message
+    """
     main_content, article_ip = None, None
     try:
-        if soup.find("div", id="main-content") is not None:
-            bottom_text = (
-                soup.find("div", id="main-content")
-                .get_text()
-                .split("--\n※ 發信站: 批踢踢實業坊(ptt.cc), 來自: ")
+        if main_content_text is not None:
+            bottom_text = main_content_text.split(
+                "--\n※ 發信站: 批踢踢實業坊(ptt.cc), 來自: "
             )
             if len(bottom_text) == 2:
                 main_content = bottom_text[0].split(article_time)[1]
@@ -286,9 +596,7 @@ def parse_article_content_and_ip(
                 ]
 
                 for signal in ending_signals_potential_variants:
-                    bottom_text = (
-                        soup.find("div", id="main-content").get_text().split(signal)
-                    )
+                    bottom_text = main_content_text.split(signal)
                     if len(bottom_text) == 2:
                         main_content = bottom_text[0].split(article_time)[1]
                         if signal == "--\n※ 編輯: ":
@@ -302,91 +610,137 @@ def parse_article_content_and_ip(
         return {"error": "Article's content and IP are incomplete."}
 
 
+def parse_comment_ip_and_time(
+    commenter_info: list[str],
+    article_time: str,
+    article_timestamp,
+    previous_comment_time: float | None,
+) -> tuple[str | None, float | None]:
+    """
+    parse commenter ip and comment time
+    :param commenter_info: push-ipdatetime split by spaces
+    :param article_time: article time
+    :param article_timestamp: article timestamp
+    :param previous_comment_time: comment time of the previous comment (None if there is none)
+    :return: commenter ip and comment time (None if not recorded)
+    :raises ValueError: if the comment time cannot be parsed
+    """
+    commenter_ip, localized_timestamp = None, None
+    if len(commenter_info) == 3 and article_time is not None:
+        # Sometimes the commenter ip has not been recorded yet
+        commenter_ip = commenter_info[-3]
+        month_date = commenter_info[-2].split("/")
+        comment_month, comment_day = month_date[0], month_date[1]
+        comment_time = commenter_info[-1].strip()
+        # to process article like: https://www.ptt.cc/bbs/Gossiping/M.1694607629.A.B47.html
+        if len(comment_time) != 5:
+            comment_time = comment_time[:5]
+        # to process article: https://www.ptt.cc/bbs/Gossiping/M.1695070048.A.60B.html (cpmmenter: funeasy)
+        if len(comment_time) < 5:
+            if previous_comment_time is not None:
+                comment_time = datetime.fromtimestamp(previous_comment_time).strftime(
+                    "%H:%M"
+                )
+            else:
+                # to handle: https://www.ptt.cc/bbs/HatePolitics/M.1693407881.A.DDD.html
+                # to handle: https://www.ptt.cc/bbs/Gossiping/M.1694656103.A.27D.html
+                if article_timestamp is not None:
+                    comment_time = article_timestamp.strftime("%H:%M")
+        # to handle: https://www.ptt.cc/bbs/Gossiping/M.1692381678.A.441.html
+        if comment_time == "2023-08-19 02:l1":
+            comment_time = "2023-08-19 02:10"
+        localized_timestamp = parse_comment_time(
+            article_time[-4:], comment_month, comment_day, comment_time
+        )
+
+    return (
+        commenter_ip,
+        localized_timestamp + 59 if localized_timestamp is not None else None,
+    )
+
+
 def parse_comments(
-    soup: bs4.BeautifulSoup, article_time: str, article_timestamp
+    soup: bs4.BeautifulSoup, article_time: str, article_timestamp, start_from: int = 0
 ) -> tuple[int, int, int, list[dict]]:
     """
     parse article comments
     :param soup: bs4.BeautifulSoup
     :param article_time: article time
     :param article_timestamp: article timestamp
+    :param start_from: number of leading comments only counted, not materialized (e.g. comments already stored)
+    :return: article comments
+    """
+    return parse_comment_rows(
+        comment_rows=SoupPttPage(soup).comment_rows(),
+        article_time=article_time,
+        article_timestamp=article_timestamp,
+        start_from=start_from,
+    )
+
+
+def parse_comment_rows(
+    comment_rows: list[dict], article_time: str, article_timestamp, start_from: int = 0
+) -> tuple[int, int, int, list[dict]]:
+    """
+    parse article comments from the texts of their rows
+    :param comment_rows: rows of div.push built by a page backend
+    :param article_time: article time
+    :param article_timestamp: article timestamp
+    :param start_from: number of leading comments only counted, not materialized (e.g. comments already stored)
     :return: article comments
     """
     favor, against, arrow = 0, 0, 0
     comments = []
-    article_comments = soup.find_all("div", "push")
-    if article_comments:
-        for comment in article_comments:
-            if "warning-box" in comment.get("class"):
+    num_skipped, last_skipped_commenter_info = 0, None
+    if comment_rows:
+        for comment in comment_rows:
+            if comment["is_warning"]:
                 continue
-            commenter_info = (
-                comment.find("span", class_="push-ipdatetime")
-                .get_text()
-                .strip()
-                .split(" ")
-            )
+            commenter_info = comment["commenter_info"].strip().split(" ")
 
             # to handle author's sign having comments of another article
             if len(commenter_info) < 3:
                 continue
 
-            commenter_id = comment.find("span", class_="push-userid").get_text()
-            comment_type = comment.find("span", class_="push-tag").get_text(strip=True)
+            comment_type = comment["comment_type"]
             favor += 1 if comment_type == "推" else 0
             arrow += 1 if comment_type == "→" else 0
             against += 1 if comment_type == "噓" else 0
 
-            month_date, commenter_ip, localized_timestamp = None, None, None
-            if len(commenter_info) == 3 and article_time is not None:
-                # Sometimes the commenter ip has not been recorded yet
-                commenter_ip = commenter_info[-3] if len(commenter_info) >= 3 else None
-                month_date = (
-                    commenter_info[-2].split("/") if len(commenter_info) >= 3 else None
-                )
-                if month_date is not None:
-                    comment_date = (
-                        f"{article_time[-4:]}-{month_date[0]}-{month_date[1]}"
+            # comments before start_from are only counted, which skips the costly time parsing
+            if num_skipped < start_from:
+                num_skipped += 1
+                last_skipped_commenter_info = commenter_info
+                continue
+
+            if comments:
+                previous_comment_time = comments[-1]["comment_time"]
+            elif last_skipped_commenter_info is not None:
+                try:
+                    _, previous_comment_time = parse_comment_ip_and_time(
+                        last_skipped_commenter_info, article_time, article_timestamp, None
                     )
-                    comment_time = commenter_info[-1].strip()
-                    # to process article like: https://www.ptt.cc/bbs/Gossiping/M.1694607629.A.B47.html
-                    if len(comment_time) != 5:
-                        comment_time = comment_time[:5]
-                    # to process article: https://www.ptt.cc/bbs/Gossiping/M.1695070048.A.60B.html (cpmmenter: funeasy)
-                    if len(comment_time) < 5:
-                        if len(comments) != 0:
-                            comment_time = datetime.fromtimestamp(
-                                comments[-1]["comment_time"]
-                            ).strftime("%H:%M")
-                        else:
-                            # to handle: https://www.ptt.cc/bbs/HatePolitics/M.1693407881.A.DDD.html
-                            # to handle: https://www.ptt.cc/bbs/Gossiping/M.1694656103.A.27D.html
-                            if article_timestamp is not None:
-                                comment_time = article_timestamp.strftime("%H:%M")
-                    # to handle: https://www.ptt.cc/bbs/Gossiping/M.1692381678.A.441.html
-                    if comment_time == "2023-08-19 02:l1":
-                        comment_time = "2023-08-19 02:10"
-                    try:
-                        comment_timestamp = datetime.strptime(
-                            f"{comment_date} {comment_time}", "%Y-%m-%d %H:%M"
-                        )
-                        localized_timestamp = TAIPEI_TIMEZONE.localize(
-                            comment_timestamp
-                        )
-                    except ValueError as e:
-                        # to handle: https://www.ptt.cc/bbs/HatePolitics/M.1574178562.A.4EE.html
-                        logger.exception(f"{e}: Comment's timestamp is incomplete")
-                        continue
+                except ValueError:
+                    previous_comment_time = None
+            else:
+                previous_comment_time = None
 
-            comment_content = (
-                comment.find("span", class_="push-content").get_text().strip(": ")
-            )
+            try:
+                commenter_ip, comment_time = parse_comment_ip_and_time(
+                    commenter_info, article_time, article_timestamp, previous_comment_time
+                )
+            except ValueError as e:
+                # to handle: https://www.ptt.cc/bbs/HatePolitics/M.1574178562.A.4EE.html
+                logger.exception(f"{e}: Comment's timestamp is incomplete")
+                continue
+
+            commenter_id = comment["commenter_id"]
+            comment_content = comment["comment_content"].strip(": ")
             comments.append(
                 {
                     "commenter_id": commenter_id,
                     "commenter_ip": commenter_ip,
-                    "comment_time": localized_timestamp.timestamp() + 59
-                    if localized_timestamp
-                    else None,
+                    "comment_time": comment_time,
                     "comment_type": comment_type,
                     "comment_content": comment_content,
                 }
@@ -401,19 +755,31 @@ def create_page_idx(soup: BeautifulSoup, start_page: int) -> tuple[int, int]:
     :param start_page: start page
     :return: latest page and start page index
     """
-    for trying in range(5):
-        try:
-            if soup.find_all("a", "btn wide")[1] is not None:
-                # using previous button to get index
-                prev_page_link = soup.find_all("a", "btn wide")[1].get("href")
-                prev_idx = prev_page_link[
-                    (prev_page_link.find("index") + 5): prev_page_link.find(".html")
-                ]
-                latest_page = int(prev_idx) + 1
-                start_idx = int(prev_idx) + 1 - (start_page - 1)
-                return latest_page, start_idx
-        except IndexError as e:
-            logger.exception(f"{e}: cannot find the previous page button.")
+    return create_page_idx_from_links(
+        paging_links=SoupPttPage(soup).paging_links(), start_page=start_page
+    )
+
+
+def create_page_idx_from_links(
+    paging_links: list[str | None], start_page: int
+) -> tuple[int, int]:
+    """
+    create page index with start page from the paging buttons of a board index
+    :param paging_links: hrefs of the paging buttons
+    :param start_page: start page
+    :return: latest page and start page index
+    """
+    try:
+        # using previous button to get index
+        prev_page_link = paging_links[1]
+        prev_idx = prev_page_link[
+            (prev_page_link.find("index") + 5): prev_page_link.find(".html")
+        ]
+        latest_page = int(prev_idx) + 1
+        start_idx = int(prev_idx) + 1 - (start_page - 1)
+        return latest_page, start_idx
+    except IndexError as e:
+        logger.exception(f"{e}: cannot find the previous page button.")
 
 
 def get_num_announcements(soup: BeautifulSoup) -> int:
@@ -422,8 +788,7 @@ def get_num_announcements(soup: BeautifulSoup) -> int:
     :param soup: bs4.BeautifulSoup
     :return: num of announcement
     """
-    sep_div = soup.find("div", class_="r-list-sep")
-    return len(sep_div.find_all_next("div", class_="r-ent")) if sep_div else 0
+    return SoupPttPage(soup).num_announcements()
 
 
 def exclude_announcements_from_titles(
@@ -444,12 +809,19 @@ def parse_article(page_response: requests.models.Response) -> dict:
     :param page_response: response object of page response
     :return: dict containing article information
     """
+    return parse_article_html(page_response.text)
 
-    soup = BeautifulSoup(page_response.text, "lxml")
 
-    basic_info = parse_basic_info(
-        article_basic_info=soup.find_all("div", "article-metaline")
-    )
+def parse_article_html(page_html: str) -> dict:
+    """
+    parsing article html including comments
+    :param page_html: html of article page
+    :return: dict containing article information
+    """
+
+    page = load_page(page_html, backend=HTML_PARSER_BACKEND)
+
+    basic_info = parse_article_meta_values(meta_values=page.article_meta_values())
     if isinstance(basic_info, tuple):
         (
             article_author,
@@ -467,14 +839,18 @@ def parse_article(page_response: requests.models.Response) -> dict:
             localized_article_timestamp,
         ) = (None, None, None, None, None)
 
-    content_and_ip = parse_article_content_and_ip(soup=soup, article_time=article_time)
+    content_and_ip = split_article_content_and_ip(
+        main_content_text=page.main_content_text(), article_time=article_time
+    )
     if isinstance(content_and_ip, tuple):
         main_content, article_ip = content_and_ip
     else:
         main_content, article_ip = (None, None)
 
-    favor, against, arrow, comments = parse_comments(
-        soup=soup, article_time=article_time, article_timestamp=article_timestamp
+    favor, against, arrow, comments = parse_comment_rows(
+        comment_rows=page.comment_rows(),
+        article_time=article_time,
+        article_timestamp=article_timestamp,
     )
 
     article_info = {
@@ -489,147 +865,633 @@ def parse_article(page_response: requests.models.Response) -> dict:
         "num_of_against": against,
         "num_of_arrow": arrow,
         "comments": comments,
+        "comment_fingerprints": [
+            comment_fingerprint(comment) for comment in comments[-COMMENT_FINGERPRINT_TAIL:]
+        ],
     }
     return article_info
 
 
-def crawl_articles(
-    base_url: str, start_page: int, pages: int, crawling_logger: logging.Logger = None
+def count_leading_comments(
+    push_rows: list[str], num_comments: int
+) -> tuple[int, int, int, int]:
+    """
+    count the types of the first comments of an article by scanning their raw html
+    :param push_rows: article html split by the opening of div.push
+    :param num_comments: number of comments to count
+    :return: favor, against and arrow among all but the last counted comment, and the row of the last counted one
+    """
+    counted_types, last_counted_row = [], None
+    for row_idx, row in enumerate(push_rows):
+        if len(counted_types) >= num_comments:
+            break
+        if row.startswith(" warning-box"):
+            continue
+        comment_type = PUSH_TAG_PATTERN.search(row)
+        commenter_info = PUSH_IPDATETIME_PATTERN.search(row)
+        # same rows as skipped by parse_comments: author's sign having comments of another article
+        if (
+            comment_type is None
+            or commenter_info is None
+            or len(html.unescape(commenter_info.group(1)).strip().split(" ")) < 3
+        ):
+            continue
+        counted_types.append(comment_type.group(1).strip())
+        last_counted_row = row_idx
+
+    counted_types = counted_types[:-1]
+    return (
+        counted_types.count("推"),
+        counted_types.count("噓"),
+        counted_types.count("→"),
+        last_counted_row,
+    )
+
+
+def parse_article_update(
+    page_html: str, previous_num_comments: int, stored_fingerprints: list[str] | None = None
+) -> dict:
+    """
+    parsing only what an update of a stored article needs: comment counters and comments after the stored ones
+    :param page_html: html of article page
+    :param previous_num_comments: number of comments already stored
+    :param stored_fingerprints: fingerprint tail of the stored comments (None if the article has none: the new
+        comments then start after previous_num_comments)
+    :return: dict containing comment counters, new comments and the fingerprint tail
+    """
+    article_head, *push_rows = page_html.split(PUSH_DIV_OPENING)
+
+    basic_info = parse_article_meta_values(
+        meta_values=load_page(
+            article_head,
+            backend=HTML_PARSER_BACKEND,
+            soup_strainer=ARTICLE_META_STRAINER,
+        ).article_meta_values()
+    )
+    if isinstance(basic_info, tuple):
+        _, _, article_time, article_timestamp, _ = basic_info
+    else:
+        article_time, article_timestamp = None, None
+
+    # stored comments are only counted from the raw html, but the last ones: their fingerprints tell where the
+    # new comments start. tags are built from the comment before them, whose time is needed when a parsed
+    # comment has an incomplete time
+    first_parsed_comment = max(
+        previous_num_comments - COMMENT_FINGERPRINT_TAIL - COMMENT_FINGERPRINT_SLACK, 0
+    )
+    favor, against, arrow, last_stored_row = count_leading_comments(
+        push_rows=push_rows, num_comments=first_parsed_comment
+    )
+    first_parsed_row = last_stored_row if last_stored_row is not None else 0
+    new_rows_html = "".join(
+        f"{PUSH_DIV_OPENING}{row}" for row in push_rows[first_parsed_row:]
+    )
+    new_comment_rows = (
+        load_page(
+            new_rows_html, backend=HTML_PARSER_BACKEND, soup_strainer=PUSH_STRAINER
+        ).comment_rows()
+        if new_rows_html
+        else []
+    )
+    new_favor, new_against, new_arrow, comments = parse_comment_rows(
+        comment_rows=new_comment_rows,
+        article_time=article_time,
+        article_timestamp=article_timestamp,
+        start_from=1 if last_stored_row is not None else 0,
+    )
+    favor, against, arrow = favor + new_favor, against + new_against, arrow + new_arrow
+    new_comments, fingerprints = split_unseen_comments(
+        comments, stored_fingerprints, previous_num_comments - first_parsed_comment
+    )
+
+    return {
+        "last_crawled_datetime": datetime.now().timestamp(),
+        "num_of_comment": favor + against + arrow,
+        "num_of_favor": favor,
+        "num_of_against": against,
+        "num_of_arrow": arrow,
+        "comments": new_comments,
+        "comment_fingerprints": fingerprints,
+    }
+
+
+async def fetch_index_rows(engine: AsyncCrawlEngine, page_url: str) -> dict[str, tuple[str, str]]:
+    """
+    download an index page and read its article rows (announcements and deleted articles excluded)
+    :param engine: crawl engine
+    :param page_url: url of the index page
+    :return: nrec and title of the articles of the page by article url
+    """
+    index_page = load_page(await engine.fetch_text(page_url), backend=HTML_PARSER_BACKEND)
+    current_page_title_collections = index_page.index_rows()
+
+    # check whether this page has announcement
+    num_announcement = index_page.num_announcements()
+    current_page_title_collections_excluding_announcement = (
+        exclude_announcements_from_titles(
+            title_collections=current_page_title_collections,
+            num_announcement=num_announcement,
+        )
+    )
+
+    index_rows = {}
+    for title in current_page_title_collections_excluding_announcement:
+        # deleted articles have no link
+        if title["href"]:
+            article_url = urllib.parse.urljoin(page_url, title["href"])
+            index_rows[article_url] = (title["nrec"], title["title"])
+    return index_rows
+
+
+async def crawl_article_rows(
+    engine: AsyncCrawlEngine,
+    writer: ArticleBulkWriter,
+    article_rows: dict[str, tuple[int, str, str]],
+    ptt_board: str,
+    telemetry: CrawlTelemetry,
+) -> tuple[list[dict], dict[str, int]]:
+    """
+    fetch the new articles and the stored ones whose index row changed, and add the updates to the writer
+    :param engine: crawl engine
+    :param writer: write stage collecting the article updates
+    :param article_rows: index page, nrec and title of the articles by article url
+    :param ptt_board: collection of the board
+    :param telemetry: telemetry of the task run
+    :return: new articles (to be inserted by the caller) and the number of inserted, updated, ignored, skipped and
+        failed articles
+    """
+    num_insert, num_update, num_ignore, num_skip, num_fail = 0, 0, 0, 0, 0
+
+    # one query tells which articles exist, how many comments they had and how their rows looked
+    read_started = time.perf_counter()
+    try:
+        crawl_state = await asyncio.to_thread(
+            get_articles_crawl_state,
+            article_urls=list(article_rows),
+            target_collection=ptt_board,
+        )
+    except PyMongoError as e:
+        if writer.spool is None:
+            raise
+        # the writes go to the spool: the articles are crawled as if nothing were stored, and the inserts of
+        # articles that are stored are ignored when they are replayed
+        logger.warning(f"{e}: cannot read the crawl state of {len(article_rows)} articles, every one is fetched.")
+        crawl_state = {}
+    telemetry.add_db_read(time.perf_counter() - read_started)
+
+    # articles whose index row did not change since the last fetch are not downloaded again
+    checked_datetime = datetime.now().timestamp()
+    article_urls = []
+    for article_url, (_, nrec, article_title) in article_rows.items():
+        if article_url not in crawl_state or should_refetch(
+            nrec=nrec,
+            title=article_title,
+            stored_signal=crawl_state[article_url]["index_signal"],
+            now=checked_datetime,
+            max_staleness=INDEX_SIGNAL_MAX_STALENESS,
+        ):
+            article_urls.append(article_url)
+        else:
+            num_skip += 1
+            logger.debug(f"Skip: {article_url}")
+
+    # stored articles only have the comments after the stored ones parsed
+    parsers = []
+    for article_url in article_urls:
+        if article_url in crawl_state:
+            previous_num_comments = crawl_state[article_url]["num_of_comment"] or 0
+            parsers.append(
+                functools.partial(
+                    parse_article_update,
+                    previous_num_comments=previous_num_comments,
+                    stored_fingerprints=crawl_state[article_url]["comment_fingerprints"],
+                )
+            )
+        else:
+            parsers.append(parse_article_html)
+
+    # articles are fetched concurrently and parsed as soon as each response arrives
+    parsing_results = await asyncio.gather(
+        *(
+            fetch_and_parse_article(engine, article_url, parse)
+            for article_url, parse in zip(article_urls, parsers)
+        ),
+        return_exceptions=True,
+    )
+
+    crawling_results = []
+    for article_url, parsing_result in zip(article_urls, parsing_results):
+        # an article that cannot be fetched is left as it is (and fetched again by a later run)
+        if isinstance(parsing_result, Exception):
+            num_fail += 1
+            logger.error(f"{parsing_result}: cannot crawl {article_url}, it is skipped.")
+            continue
+
+        page_idx, nrec, article_title = article_rows[article_url]
+        index_signal = build_index_signal(nrec, article_title, checked_datetime=checked_datetime)
+        if article_url not in crawl_state:
+            if "error" in parsing_result.keys():
+                logger.error(f"Error: {parsing_result['error']} - {article_url}.")
+
+            num_insert += 1
+            logger.debug(f"Insert: {article_url}")
+
+            article_data = {
+                "article_page_idx": page_idx,
+                "article_url": article_url,
+                "article_data": parsing_result,
+                "index_signal": index_signal,
+                "recrawl_state": observe_velocity(
+                    recrawl_state=None,
+                    num_of_comment=parsing_result["num_of_comment"],
+                    observed_datetime=checked_datetime,
+                    article_time=parsing_result["time"],
+                    half_life=RECRAWL_VELOCITY_HALF_LIFE,
+                ),
+            }
+            crawling_results.append(article_data)
+        else:
+            num_comments = crawl_state[article_url]["num_of_comment"]
+            if "error" in parsing_result.keys():
+                logger.error(f"Error: {parsing_result['error']} - {article_url}.")
+            else:
+                recrawl_state = observe_velocity(
+                    recrawl_state=crawl_state[article_url]["recrawl_state"],
+                    num_of_comment=parsing_result["num_of_comment"],
+                    observed_datetime=checked_datetime,
+                    article_time=crawl_state[article_url]["time"],
+                    half_life=RECRAWL_VELOCITY_HALF_LIFE,
+                )
+                # a comment can be removed as another one is added: the count alone does not tell
+                if parsing_result["num_of_comment"] != num_comments or parsing_result["comments"]:
+                    num_update += 1
+                    logger.debug(f"Update: {article_url}")
+
+                    writer.add_update(
+                        article_url=article_url,
+                        new_data=parsing_result,
+                        new_comments=parsing_result["comments"],
+                        index_signal=index_signal,
+                        recrawl_state=recrawl_state,
+                        previous_num_comments=num_comments,
+                        previous_fingerprints=crawl_state[article_url]["comment_fingerprints"],
+                    )
+                else:
+                    num_ignore += 1
+                    logger.debug(f"Ignore: {article_url}")
+                    writer.add_index_signal(article_url, index_signal, recrawl_state)
+
+    return crawling_results, {
+        "insert": num_insert,
+        "update": num_update,
+        "ignore": num_ignore,
+        "skip": num_skip,
+        "fail": num_fail,
+    }
+
+
+async def crawl_articles_with_engine(
+    engine: AsyncCrawlEngine,
+    writer: ArticleBulkWriter,
+    base_url: str,
+    start_page: int,
+    pages: int,
+    crawling_logger: logging.Logger = None,
+    board: BoardCrawlContext | None = None,
+    telemetry: CrawlTelemetry | None = None,
 ):
     """
-    crawl articles from ptt
+    crawl articles from ptt with a running crawl engine
+    :param engine: crawl engine shared by the pages of a task run
+    :param writer: write stage collecting the article updates
     :param base_url: original url
     :param start_page: crawling start page (1 = the last page)
     :param pages: crawling how many pages
     :param crawling_logger: logger
-    :return: list of articles
+    :param board: board context of the task run (opened here if not given, which costs a request)
+    :param telemetry: telemetry of the task run (pages are measured from now on if not given)
+    :return: list of new articles (to be inserted by the caller)
     """
     if pages > start_page:
         logger.info("Page Error: pages > start_page")
         return None
-    else:
-        headers = {"user-agent": ua.random}
-        current_session = requests.session()
-        current_request = current_session.get(base_url, headers=headers)
 
-        if "over18" in current_request.url:
-            current_session.post("https://www.ptt.cc/ask/over18", data=cookies)
-            current_request = current_session.get(base_url, headers=headers)
+    attempts_position = len(engine.recorder.attempts)
+    if telemetry is None:
+        telemetry = CrawlTelemetry(crawling_logger.name, engine, writer)
+    if board is None:
+        board = await open_board_context(engine, base_url)
+    start_idx = board.page_idx(start_page)
 
-        soup = BeautifulSoup(current_request.text, "lxml")
+    crawling_results = []
+    idx_collections = [i for i in range(start_idx, start_idx + pages)]
+    for idx in idx_collections:
+        current_page_url = board.page_url(idx)
 
-        latest_page, start_idx = create_page_idx(soup=soup, start_page=start_page)
+        index_rows = await fetch_index_rows(engine, current_page_url)
 
-        crawling_results = []
-        idx_collections = [i for i in range(start_idx, start_idx + pages)]
-        for idx in idx_collections:
-            num_insert, num_update, num_ignore = 0, 0, 0
-            current_page_url = (
-                f"{base_url[:-5]}{idx}.html" if idx != latest_page else base_url
-            )
+        logger.info(
+            f"-- start crawling: page {idx} (current_page_url: {current_page_url}) --"
+        )
 
-            soup = BeautifulSoup(
-                current_session.get(current_page_url, headers=headers).text, "lxml"
-            )
-            current_page_title_collections = soup.find_all("div", "r-ent")
-
-            # check whether this page has announcement
-            num_announcement = get_num_announcements(soup=soup)
-            current_page_title_collections_excluding_announcement = (
-                exclude_announcements_from_titles(
-                    title_collections=current_page_title_collections,
-                    num_announcement=num_announcement,
-                )
-            )
+        ptt_board = decide_ptt_board(url=current_page_url)
+        if crawling_logger.name == "logger_test_integration":
+            ptt_board = "testing_collection"
+
+        page_results, page_counts = await crawl_article_rows(
+            engine,
+            writer,
+            {
+                article_url: (idx, nrec, article_title)
+                for article_url, (nrec, article_title) in index_rows.items()
+            },
+            ptt_board,
+            telemetry,
+        )
+        crawling_results.extend(page_results)
+
+        request_summary = engine.recorder.summary(since=attempts_position)
+        request_counts = board.request_counts(since=attempts_position)
+        attempts_position = len(engine.recorder.attempts)
+        crawling_logs = {
+            "crawler": crawling_logger.name,
+            "current_page_url": current_page_url,
+            "crawling_data_insert": page_counts["insert"],
+            "crawling_data_update": page_counts["update"],
+            "crawling_data_ignore": page_counts["ignore"],
+            "crawling_data_skip": page_counts["skip"],
+            "crawling_data_fail": page_counts["fail"],
+            "crawling_requests": request_summary["requests"],
+            "crawling_index_requests": request_counts[REQUEST_KIND_INDEX],
+            "crawling_retries": request_summary["retries"],
+            "crawling_request_outcomes": request_summary["outcomes"],
+            **{
+                f"crawling_{key}": value
+                for key, value in telemetry.page_done().items()
+                if key not in ("requests", "retries")
+            },
+        }
+
+        crawling_logger.info(json.dumps(crawling_logs))
+    return crawling_results
+
+
+async def open_board_context(engine: AsyncCrawlEngine, base_url: str) -> BoardCrawlContext:
+    """
+    resolve the latest page of a board once for all the pages of a task run
+    :param engine: crawl engine of the task run
+    :param base_url: original url
+    :return: board context
+    """
+    index_page = load_page(await engine.fetch_text(base_url), backend=HTML_PARSER_BACKEND)
+    latest_page, _ = create_page_idx_from_links(
+        paging_links=index_page.paging_links(), start_page=1
+    )
+    return BoardCrawlContext(engine, base_url, latest_page)
+
+
+def log_crawl_run(
+    board: BoardCrawlContext,
+    pages: int,
+    crawling_logger: logging.Logger,
+    write_stage: WriteStage | None = None,
+    telemetry: CrawlTelemetry | None = None,
+):
+    """
+    log the requests of a task run by kind of page and the statistics of the pipeline stages,
+    and export the page histograms of the run (if PTT_METRICS_DIR is set)
+    :param board: board context of the task run
+    :param pages: number of index pages crawled
+    :param crawling_logger: logger
+    :param write_stage: write stage of the task run
+    :param telemetry: telemetry of the task run
+    """
+    rate_controller = board.engine.budget.controller_for(board.base_url)
+    request_counts = board.request_counts()
+    requests_total = sum(request_counts.values())
+    request_logs = {
+        "crawler": crawling_logger.name,
+        "latest_page": board.latest_page,
+        "pages": pages,
+        "run_requests": requests_total,
+        **{f"run_{kind}_requests": count for kind, count in request_counts.items()},
+        "run_requests_per_page": round(requests_total / pages, 2) if pages else 0,
+        **board.engine.stage_stats(),
+        **(write_stage.stats.snapshot() if write_stage is not None else {}),
+        **(telemetry.run_summary() if telemetry is not None else {}),
+        **(rate_controller.snapshot() if rate_controller is not None else {}),
+    }
+    crawling_logger.info(json.dumps(request_logs))
+    if telemetry is not None and METRICS_DIR:
+        try:
+            export_telemetry(METRICS_DIR, telemetry)
+        except OSError as e:
+            logger.error(f"{e}: cannot export the crawl telemetry to {METRICS_DIR}.")
+
+
+def create_article_writer(
+    ptt_board: str, crawling_logger: logging.Logger, flush_every_pages: int = 1
+) -> ArticleBulkWriter:
+    """
+    create the writer of a task run. with PTT_WRITE_SPOOL_DIR set, the writes are appended to the write spool of
+    the machine and the drainer (python -m utils_crawler.write_spool) replays them into mongoDB
+    :param ptt_board: collection of the board
+    :param crawling_logger: logger
+    :param flush_every_pages: number of pages written at once
+    :return: writer (close it at the end of the task run)
+    """
+    return ArticleBulkWriter(
+        get_db()[ptt_board],
+        flush_every_pages=flush_every_pages,
+        crawling_logger=crawling_logger,
+        spool=WriteSpool(WRITE_SPOOL_DIR) if WRITE_SPOOL_DIR else None,
+    )
+
+
+def create_rate_controller(
+    host: str, initial_rate: float, weight: float = 1.0
+) -> AimdRateController:
+    """
+    create the adaptive rate controller of a host, shared by the crawl tasks of all the machines through redis if
+    PTT_REDIS_URL is set, else by the tasks of the machine through RATE_CONTROL_DIR (set PTT_RATE_CONTROL_DIR to an
+    empty string to adapt the rate per task run only). the tasks of all the boards draw on the same rate, so crawling
+    more boards (or with more workers) does not send more requests
+    :param host: host (and port) of the requested urls
+    :param initial_rate: requests per second of the host if no task has adapted it yet (raises the ceiling if above it)
+    :param weight: share of the rate of the task relative to the other tasks crawling the host
+    :return: rate controller
+    """
+    return AimdRateController(
+        initial_rate=initial_rate,
+        min_rate=RATE_MIN_REQUESTS_PER_SECOND,
+        max_rate=max(RATE_MAX_REQUESTS_PER_SECOND, initial_rate),
+        increase_per_second=RATE_INCREASE_PER_SECOND,
+        decrease_factor=RATE_DECREASE_FACTOR,
+        decrease_cooldown=RATE_DECREASE_COOLDOWN,
+        latency_spike_factor=RATE_LATENCY_SPIKE_FACTOR,
+        latency_spike_min_seconds=RATE_LATENCY_SPIKE_MIN_SECONDS,
+        state_path=(
+            os.path.join(RATE_CONTROL_DIR, f"{host.replace(':', '_')}.json")
+            if RATE_CONTROL_DIR and not REDIS_URL
+            else None
+        ),
+        weight=weight,
+        redis_client=get_redis() if REDIS_URL else None,
+        redis_key=f"ptt:rate_control:{host}",
+    )
 
-            logger.info(
-                f"-- start crawling: page {idx} (current_page_url: {current_page_url}) --"
+
+def create_crawl_engine(
+    max_requests_in_flight: int = MAX_REQUESTS_IN_FLIGHT,
+    requests_per_second: float = REQUESTS_PER_SECOND_PER_HOST,
+    parse_workers: int = PARSE_WORKERS,
+    adaptive_rate: bool = True,
+    rate_weight: float = 1.0,
+) -> AsyncCrawlEngine:
+    """
+    create the crawl engine used by a task run (every url is downloaded and parsed once)
+    :param max_requests_in_flight: maximum number of concurrent requests
+    :param requests_per_second: initial request rate towards ptt (the fixed rate without adaptive rate)
+    :param parse_workers: number of parsing processes (0 to parse in threads)
+    :param adaptive_rate: adapt the request rate to the health of ptt (AIMD), shared by the tasks of the machine
+    :param rate_weight: share of the adaptive rate of the task (the rate_weight of its board)
+    :return: crawl engine (to be used with async with)
+    """
+    return AsyncCrawlEngine(
+        user_agent_factory=lambda: get_user_agent().random,
+        over18_data=cookies,
+        max_in_flight=max_requests_in_flight,
+        requests_per_second=requests_per_second,
+        burst=REQUEST_BURST_PER_HOST,
+        retry_policy=ExponentialBackoffRetryPolicy(
+            max_attempts=RETRY_MAX_ATTEMPTS,
+            base_delay=RETRY_BASE_DELAY,
+            max_delay=SLEEP_INTERVAL_IF_GET_CAUGHT,
+            budget=RetryBudget(retry_ratio=RETRY_BUDGET_RATIO, reserve=RETRY_BUDGET_RESERVE),
+        ),
+        parse_stage=(
+            functools.partial(
+                ParseStage, workers=parse_workers, max_pending=PARSE_MAX_PENDING_PAGES
+            )
+            if parse_workers
+            else None
+        ),
+        rate_controller=(
+            functools.partial(
+                create_rate_controller, initial_rate=requests_per_second, weight=rate_weight
             )
+            if adaptive_rate
+            else None
+        ),
+        rate_sync_seconds=RATE_SYNC_SECONDS,
+    )
 
-            for title in current_page_title_collections_excluding_announcement:
-                title_link = title.find("a")
-                if title_link:
-                    article_url = urllib.parse.urljoin(
-                        current_page_url, title_link.get("href")
-                    )
-                    ptt_board = decide_ptt_board(url=article_url)
-
-                    if crawling_logger.name == "logger_test_integration":
-                        ptt_board = "testing_collection"
-
-                    if not is_article_existing(
-                        target_collection=ptt_board, article_url=article_url
-                    ):
-                        for i in range(5):
-                            try:
-                                if (
-                                    parse_article(
-                                        current_session.get(
-                                            article_url, headers=headers
-                                        )
-                                    )
-                                    is not None
-                                ):
-                                    break
-                            except requests.exceptions.ConnectionError as e:
-                                logger.error(
-                                    f"{e}: cannot connect to the server - wait 60 seconds to restart."
-                                )
-                                time.sleep(SLEEP_INTERVAL_IF_GET_CAUGHT)
-                                headers = {"user-agent": ua.random}
 
-                        parsing_result = parse_article(current_session.get(article_url))
-                        if "error" in parsing_result.keys():
-                            logger.error(
-                                f"Error: {parsing_result['error']} - {article_url}."
-                            )
+def crawl_articles(
+    base_url: str, start_page: int, pages: int, crawling_logger: logging.Logger = None
+):
+    """
+    crawl articles from ptt
+    :param base_url: original url
+    :param start_page: crawling start page (1 = the last page)
+    :param pages: crawling how many pages
+    :param crawling_logger: logger
+    :return: list of articles
+    """
 
-                        num_insert += 1
-                        logger.debug(f"Insert: {article_url}")
+    ptt_board = decide_ptt_board(url=base_url)
+    if crawling_logger.name == "logger_test_integration":
+        ptt_board = "testing_collection"
+    writer = create_article_writer(ptt_board, crawling_logger)
+
+    async def crawl():
+        async with create_crawl_engine() as engine:
+            telemetry = CrawlTelemetry(crawling_logger.name, engine, writer)
+            board = await open_board_context(engine, base_url)
+            try:
+                crawling_results = await crawl_articles_with_engine(
+                    engine,
+                    writer,
+                    base_url,
+                    start_page,
+                    pages,
+                    crawling_logger=crawling_logger,
+                    board=board,
+                    telemetry=telemetry,
+                )
+                await asyncio.to_thread(writer.flush)
+            finally:
+                log_crawl_run(board, telemetry.pages, crawling_logger, telemetry=telemetry)
+            return crawling_results
 
-                        article_data = {
-                            "article_page_idx": idx,
-                            "article_url": article_url,
-                            "article_data": parsing_result,
-                        }
-                        crawling_results.append(article_data)
-                    else:
-                        num_comments = get_article_num_of_comments(
-                            target_collection=ptt_board, article_url=article_url
-                        )
-                        parsing_result = parse_article(current_session.get(article_url))
-                        if "error" in parsing_result.keys():
-                            logger.error(
-                                f"Error: {parsing_result['error']} - {article_url}."
-                            )
-                        else:
-                            if parsing_result["num_of_comment"] != num_comments:
-                                num_update += 1
-                                logger.debug(f"Update: {article_url}")
-
-                                update_article(
-                                    target_collection=ptt_board,
-                                    article_url=article_url,
-                                    new_data=parsing_result,
-                                    previous_num_comments=num_comments,
-                                )
-                            else:
-                                num_ignore += 1
-                                logger.debug(f"Ignore: {article_url}")
+    try:
+        return asyncio.run(crawl())
+    finally:
+        writer.close()
 
-                time.sleep(SLEEP_INTERVAL_BETWEEN_ARTICLES)
 
-            crawling_logs = {
-                "crawler": crawling_logger.name,
-                "current_page_url": current_page_url,
-                "crawling_data_insert": num_insert,
-                "crawling_data_update": num_update,
-                "crawling_data_ignore": num_ignore,
-            }
+def crawl_board_pages(
+    base_url: str,
+    ptt_board: str,
+    logger_assigned,
+    choose_generations: Callable[[BoardCrawlContext], range],
+    max_requests_in_flight: int = MAX_REQUESTS_IN_FLIGHT,
+    requests_per_second: float = REQUESTS_PER_SECOND_PER_HOST,
+    write_flush_every_pages: int = WRITE_FLUSH_EVERY_PAGES,
+    rate_weight: float = 1.0,
+) -> dict:
+    """
+    crawl the pages of a board chosen once its latest page is known
+    :param base_url: original url
+    :param ptt_board: collection of the board
+    :param logger_assigned: logger
+    :param choose_generations: pages to crawl (counted from the latest one) given the board context
+    :param max_requests_in_flight: maximum number of concurrent requests
+    :param requests_per_second: initial request rate towards ptt
+    :param write_flush_every_pages: number of pages written with one bulk write
+    :param rate_weight: share of the adaptive rate of the task (the rate_weight of its board)
+    :return: latest page of the board, pages crawled and articles found for the first time
+    """
+    writer = create_article_writer(ptt_board, logger_assigned, write_flush_every_pages)
+
+    async def crawl() -> dict:
+        async with create_crawl_engine(
+            max_requests_in_flight=max_requests_in_flight,
+            requests_per_second=requests_per_second,
+            rate_weight=rate_weight,
+        ) as engine:
+            telemetry = CrawlTelemetry(logger_assigned.name, engine, writer)
+            # the session, the over18 cookie and the latest page are shared by all pages
+            board = await open_board_context(engine, base_url)
+            pages, new_articles = 0, 0
+            # pages are written while the next ones are crawled (and on failure, what was crawled is kept)
+            write_stage = WriteStage(writer, WRITE_MAX_PENDING_BATCHES)
+            try:
+                async with write_stage:
+                    for i in choose_generations(board):
+                        crawl_results = await crawl_articles_with_engine(
+                            engine,
+                            writer,
+                            base_url,
+                            i,
+                            1,
+                            crawling_logger=logger_assigned,
+                            board=board,
+                            telemetry=telemetry,
+                        )
+                        if crawl_results:
+                            writer.add_inserts(crawl_results)
+                            new_articles += len(crawl_results)
+                        await write_stage.page_done()
+                        pages += 1
+            finally:
+                log_crawl_run(board, pages, logger_assigned, write_stage, telemetry)
+            return {"latest_page": board.latest_page, "pages": pages, "new_articles": new_articles}
 
-            crawling_logger.info(json.dumps(crawling_logs))
-            time.sleep(SLEEP_INTERVAL_BETWEEN_PAGES)
-        return crawling_results
+    try:
+        return asyncio.run(crawl())
+    finally:
+        writer.close()
 
 
 def set_range_and_crawl(
@@ -638,177 +1500,643 @@ def set_range_and_crawl(
     logger_assigned,
     start_generation: int,
     end_generation: int,
+    max_requests_in_flight: int = MAX_REQUESTS_IN_FLIGHT,
+    requests_per_second: float = REQUESTS_PER_SECOND_PER_HOST,
+    write_flush_every_pages: int = WRITE_FLUSH_EVERY_PAGES,
+    rate_weight: float = 1.0,
 ):
-    for i in range(start_generation, end_generation):
-        crawl_results = crawl_articles(base_url, i, 1, crawling_logger=logger_assigned)
-        if crawl_results:
-            collection = db[ptt_board]
-            collection.insert_many(crawl_results)
+    crawl_board_pages(
+        base_url,
+        ptt_board,
+        logger_assigned,
+        lambda board: range(start_generation, end_generation),
+        max_requests_in_flight=max_requests_in_flight,
+        requests_per_second=requests_per_second,
+        write_flush_every_pages=write_flush_every_pages,
+        rate_weight=rate_weight,
+    )
 
 
-def create_dag_from_latest_to_middle(
-    dag_id: str,
-    schedule: Union[str, timedelta],
-    base_url: str,
-    logger_assigned,
-):
-    ptt_board = decide_ptt_board(url=base_url)
+def load_crawl_cadence(dag_id: str) -> dict | None:
+    """
+    :param dag_id: dag crawling the latest pages of a board
+    :return: cadence state of its last run (None before the first run, or if mongoDB is unreachable while the
+        writes go to the spool: the run then crawls as a first run)
+    """
+    try:
+        return CrawlCadenceStore(get_db()[CADENCE_COLLECTION]).load(dag_id)
+    except PyMongoError as e:
+        if not WRITE_SPOOL_DIR:
+            raise
+        logger.warning(f"{e}: cannot read the crawl cadence of {dag_id}.")
+        return None
 
-    dag = DAG(
-        dag_id=dag_id,
-        default_args=default_args,
-        schedule=schedule,
-        catchup=False,
-    )
 
-    start = EmptyOperator(task_id="start", dag=dag)
+def is_crawl_due(dag_id: str) -> bool:
+    """
+    tell whether the adaptive cadence wants the latest pages of a board to be crawled now
+    (the dag checks on a fixed tick and skips the crawl if not)
+    :param dag_id: dag crawling the latest pages of a board
+    :return: whether the crawl is due
+    """
+    state = load_crawl_cadence(dag_id)
+    due = is_due(state, now=datetime.now().timestamp(), tolerance=CADENCE_DUE_TOLERANCE)
+    if not due:
+        logger.info(
+            f"Cadence of {dag_id}: next crawl at {datetime.fromtimestamp(state['next_run_datetime'])}"
+        )
+    return due
 
-    crawl = PythonOperator(
-        task_id="crawl",
-        python_callable=set_range_and_crawl,
-        op_args=[
-            base_url,
-            ptt_board,
-            logger_assigned,
-            PAGE_GENERATION_LATEST,
-            PAGE_GENERATION_MIDDLE,
-        ],
-        dag=dag,
-    )
 
-    check_ip = PythonOperator(
-        task_id="check_ip",
-        python_callable=update_wrong_ip,
-        op_args=[ptt_board],
-        dag=dag,
+def crawl_latest_by_cadence(
+    base_url: str,
+    ptt_board: str,
+    logger_assigned,
+    dag_id: str,
+    start_generation: int,
+    end_generation: int,
+    max_requests_in_flight: int = MAX_REQUESTS_IN_FLIGHT,
+    requests_per_second: float = REQUESTS_PER_SECOND_PER_HOST,
+    write_flush_every_pages: int = WRITE_FLUSH_EVERY_PAGES,
+    rate_weight: float = 1.0,
+) -> dict:
+    """
+    crawl the pages that turned over since the previous run, then schedule the next run from the arrival rate of
+    new articles. a run that comes late (e.g. after skipped ones) covers every page turned over since
+    :param base_url: original url
+    :param ptt_board: collection of the board
+    :param logger_assigned: logger
+    :param dag_id: dag crawling the latest pages of the board
+    :param start_generation: first page counted from the latest one
+    :param end_generation: page counted from the latest one where the first run stops
+    :param max_requests_in_flight: maximum number of concurrent requests
+    :param requests_per_second: initial request rate towards ptt
+    :param write_flush_every_pages: number of pages written with one bulk write
+    :param rate_weight: share of the adaptive rate of the task (the rate_weight of its board)
+    :return: cadence state of the run
+    """
+    state = load_crawl_cadence(dag_id)
+    started_datetime = datetime.now().timestamp()
+
+    def choose_generations(board: BoardCrawlContext) -> range:
+        pages = plan_pages(
+            state,
+            board.latest_page,
+            default_pages=end_generation - start_generation,
+            min_pages=CADENCE_MIN_PAGES,
+            max_pages=CADENCE_MAX_PAGES,
+        )
+        return range(start_generation, start_generation + pages)
+
+    run = crawl_board_pages(
+        base_url,
+        ptt_board,
+        logger_assigned,
+        choose_generations,
+        max_requests_in_flight=max_requests_in_flight,
+        requests_per_second=requests_per_second,
+        write_flush_every_pages=write_flush_every_pages,
+        rate_weight=rate_weight,
     )
-
-    remove_duplicate = PythonOperator(
-        task_id="remove_duplicate",
-        python_callable=delete_duplicates,
-        op_args=[ptt_board],
-        dag=dag,
+    cadence = observe_run(
+        state,
+        latest_page=run["latest_page"],
+        pages=run["pages"],
+        new_articles=run["new_articles"],
+        started_datetime=started_datetime,
+        smoothing=CADENCE_SMOOTHING,
+        target_articles_per_run=CADENCE_TARGET_ARTICLES_PER_RUN,
+        min_interval=CADENCE_MIN_INTERVAL,
+        max_interval=CADENCE_MAX_INTERVAL,
     )
+    try:
+        CrawlCadenceStore(get_db()[CADENCE_COLLECTION]).save(dag_id, cadence)
+    except PyMongoError as e:
+        if not WRITE_SPOOL_DIR:
+            raise
+        logger.warning(f"{e}: the crawl cadence of {dag_id} is not saved.")
+
+    cadence_logs = {
+        "crawler": logger_assigned.name,
+        "cadence_pages": run["pages"],
+        "cadence_pages_turned": (
+            max(run["latest_page"] - state["latest_page"], 0) if state is not None else None
+        ),
+        "cadence_new_articles": run["new_articles"],
+        "cadence_articles_per_minute": cadence["articles_per_minute"],
+        "cadence_pages_per_minute": cadence["pages_per_minute"],
+        "cadence_interval_minutes": round(cadence["interval_seconds"] / 60, 1),
+    }
+    logger_assigned.info(json.dumps(cadence_logs))
+    return cadence
 
-    end = EmptyOperator(task_id="end", dag=dag)
 
-    start >> crawl >> check_ip >> remove_duplicate >> end
+def resolve_board_context(base_url: str) -> BoardCrawlContext:
+    """
+    resolve the latest page of a board outside of a crawl (the engine of the context is closed, only its pages
+    can be addressed)
+    :param base_url: original url
+    :return: board context
+    """
 
-    return dag
+    async def open_board() -> BoardCrawlContext:
+        async with create_crawl_engine(max_requests_in_flight=1) as engine:
+            return await open_board_context(engine, base_url)
 
+    return asyncio.run(open_board())
 
-def create_dag_from_middle_to_ancient(
-    dag_id: str,
-    schedule: Union[str, timedelta],
+
+def plan_backfill(
     base_url: str,
-    logger_assigned,
-):
-    ptt_board = decide_ptt_board(url=base_url)
+    ptt_board: str,
+    dag_id: str,
+    start_generation: int,
+    end_generation: int,
+    pages_per_shard: int = BACKFILL_PAGES_PER_SHARD,
+    run_id: str = "manual",
+    rate_weight: float = 1.0,
+) -> list[dict]:
+    """
+    pin the pages of a backfill run to absolute page indices, split them into shards and register their checkpoints
+    :param base_url: original url
+    :param ptt_board: collection of the board
+    :param dag_id: dag crawling the range
+    :param start_generation: first page counted from the latest one
+    :param end_generation: page counted from the latest one where the backfill stops
+    :param pages_per_shard: pages crawled by one shard
+    :param run_id: dag run (passed by airflow)
+    :param rate_weight: share of the adaptive rate of each shard (the rate_weight of the board)
+    :return: keyword arguments of the shard tasks (shard, first_page_idx, last_page_idx and rate_weight)
+    """
 
-    dag = DAG(
-        dag_id=dag_id,
-        default_args=default_args,
-        schedule=schedule,
-        catchup=False,
-    )
+    latest_page = resolve_board_context(base_url).latest_page
+    shards = plan_shards(latest_page, start_generation, end_generation, pages_per_shard)
+    # registered up front so the progress report counts the shards not started yet
+    store = BackfillCheckpointStore(get_db()[BACKFILL_CHECKPOINT_COLLECTION])
+    for shard in shards:
+        store.load_or_create(ptt_board, dag_id, run_id, **shard)
+    logger.info(f"Backfill of {base_url}: {len(shards)} shards from latest page {latest_page}")
+    return [{**shard, "rate_weight": rate_weight} for shard in shards]
 
-    start = EmptyOperator(task_id="start", dag=dag)
 
-    crawl = PythonOperator(
-        task_id="crawl",
-        python_callable=set_range_and_crawl,
-        op_args=[
-            base_url,
-            ptt_board,
-            logger_assigned,
-            PAGE_GENERATION_MIDDLE,
-            PAGE_GENERATION_ANCIENT,
-        ],
-        dag=dag,
+def report_backfill_progress(
+    ptt_board: str, logger_assigned, dag_id: str, run_id: str = "manual"
+) -> dict:
+    """
+    log how far the shards of a backfill run are, how fast they go and when they should be done
+    :param ptt_board: collection of the board
+    :param logger_assigned: logger
+    :param dag_id: dag crawling the range
+    :param run_id: dag run (passed by airflow)
+    :return: progress report
+    """
+    store = BackfillCheckpointStore(get_db()[BACKFILL_CHECKPOINT_COLLECTION])
+    progress = summarize_progress(
+        store.run_checkpoints(ptt_board, dag_id, run_id), now=datetime.now().timestamp()
     )
-
-    end = EmptyOperator(task_id="end", dag=dag)
-
-    start >> crawl >> end
-
-    return dag
+    progress_logs = {
+        "crawler": logger_assigned.name,
+        "board": ptt_board,
+        "dag_id": dag_id,
+        "run_id": run_id,
+        **progress,
+    }
+    logger_assigned.info(json.dumps(progress_logs))
+    return progress
 
 
-def create_dag_from_ancient_to_earliest(
-    dag_id: str,
-    schedule: Union[str, timedelta],
+def crawl_backfill_shard(
     base_url: str,
+    ptt_board: str,
     logger_assigned,
+    dag_id: str,
+    shard: int,
+    first_page_idx: int,
+    last_page_idx: int,
+    run_id: str = "manual",
+    max_requests_in_flight: int = MAX_REQUESTS_IN_FLIGHT,
+    requests_per_second: float = REQUESTS_PER_SECOND_PER_HOST,
+    write_flush_every_pages: int = WRITE_FLUSH_EVERY_PAGES,
+    rate_weight: float = 1.0,
 ):
-    ptt_board = decide_ptt_board(url=base_url)
+    """
+    crawl the pages of a shard from first_page_idx down to last_page_idx, resuming after its checkpoint
+    :param base_url: original url
+    :param ptt_board: collection of the board
+    :param logger_assigned: logger
+    :param dag_id: dag crawling the range
+    :param shard: shard number
+    :param first_page_idx: absolute index of the shard's first page
+    :param last_page_idx: absolute index of the shard's last page
+    :param run_id: dag run (passed by airflow)
+    :param max_requests_in_flight: maximum number of concurrent requests
+    :param requests_per_second: initial request rate towards ptt (the adaptive rate is split among the shards running at once)
+    :param write_flush_every_pages: number of pages written with one bulk write
+    :param rate_weight: share of the adaptive rate of the shard (the rate_weight of its board)
+    """
+    store = BackfillCheckpointStore(get_db()[BACKFILL_CHECKPOINT_COLLECTION])
+    checkpoint = store.load_or_create(
+        ptt_board, dag_id, run_id, shard, first_page_idx, last_page_idx
+    )
+    writer = create_article_writer(ptt_board, logger_assigned, write_flush_every_pages)
+
+    def update_shard_state(function, *args):
+        try:
+            function(*args)
+        except PyMongoError as e:
+            if writer.spool is None:
+                raise
+            # the pages are in the write spool: a checkpoint behind only makes a retried shard crawl them again
+            logger.warning(f"{e}: the checkpoint of shard {shard} is not updated.")
+
+    async def crawl():
+        async with create_crawl_engine(
+            max_requests_in_flight=max_requests_in_flight,
+            requests_per_second=requests_per_second,
+            rate_weight=rate_weight,
+        ) as engine:
+            telemetry = CrawlTelemetry(logger_assigned.name, engine, writer)
+            board = await open_board_context(engine, base_url)
+            pages_crawled = 0
+            write_stage = WriteStage(writer, WRITE_MAX_PENDING_BATCHES)
+            try:
+                async with write_stage:
+                    for idx in range(next_page_idx(checkpoint), last_page_idx - 1, -1):
+                        # the board may have grown since the plan: the page is addressed by its absolute index
+                        crawl_results = await crawl_articles_with_engine(
+                            engine,
+                            writer,
+                            base_url,
+                            board.generation(idx),
+                            1,
+                            crawling_logger=logger_assigned,
+                            board=board,
+                            telemetry=telemetry,
+                        )
+                        if crawl_results:
+                            writer.add_inserts(crawl_results)
+                        # a page only counts as done once its articles are written
+                        await write_stage.page_done(
+                            on_written=functools.partial(
+                                update_shard_state, store.mark_page_done, checkpoint, idx
+                            )
+                        )
+                        pages_crawled += 1
+                        if pages_crawled % BACKFILL_PROGRESS_EVERY_PAGES == 0:
+                            await asyncio.to_thread(
+                                update_shard_state,
+                                report_backfill_progress,
+                                ptt_board,
+                                logger_assigned,
+                                dag_id,
+                                run_id,
+                            )
+            finally:
+                log_crawl_run(board, pages_crawled, logger_assigned, write_stage, telemetry)
+
+    try:
+        asyncio.run(crawl())
+    finally:
+        writer.close()
 
-    dag = DAG(
-        dag_id=dag_id,
-        default_args=default_args,
-        schedule=schedule,
-        catchup=False,
+
+def create_url_frontier(ptt_board: str, dag_id: str, run_id: str) -> UrlFrontier:
+    """
+    :param ptt_board: collection of the board
+    :param dag_id: dag crawling the range
+    :param run_id: dag run
+    :return: url frontier of the run, in the redis of PTT_REDIS_URL
+    """
+    return UrlFrontier(
+        get_redis(),
+        name=f"{ptt_board}:{dag_id}:{run_id}",
+        worker_id=f"{socket.gethostname()}:{os.getpid()}",
+        lease_seconds=FRONTIER_LEASE_SECONDS,
     )
 
-    start = EmptyOperator(task_id="start", dag=dag)
 
-    crawl = PythonOperator(
-        task_id="crawl",
-        python_callable=set_range_and_crawl,
-        op_args=[
-            base_url,
-            ptt_board,
-            logger_assigned,
-            PAGE_GENERATION_ANCIENT,
-            PAGE_GENERATION_EARLIEST,
-        ],
-        dag=dag,
+def plan_frontier(
+    base_url: str,
+    ptt_board: str,
+    dag_id: str,
+    start_generation: int,
+    end_generation: int,
+    workers: int,
+    run_id: str = "manual",
+    rate_weight: float = 1.0,
+) -> list[dict]:
+    """
+    pin the pages of a run to absolute page indices and queue them in the url frontier of the run
+    :param base_url: original url
+    :param ptt_board: collection of the board
+    :param dag_id: dag crawling the range
+    :param start_generation: first page counted from the latest one
+    :param end_generation: page counted from the latest one where the run stops
+    :param workers: number of workers pulling from the frontier
+    :param run_id: dag run (passed by airflow)
+    :param rate_weight: share of the adaptive rate of each worker (the rate_weight of the board)
+    :return: keyword arguments of the worker tasks (worker and rate_weight)
+    """
+    board = resolve_board_context(base_url)
+    first_page_idx = generation_to_page_idx(board.latest_page, start_generation)
+    last_page_idx = max(generation_to_page_idx(board.latest_page, end_generation - 1), 1)
+    # pages are leased from the newest; the articles of a page are queued right after it (see crawl_frontier)
+    queued = create_url_frontier(ptt_board, dag_id, run_id).push(
+        [
+            {
+                "url": board.page_url(idx),
+                "priority": first_page_idx - idx,
+                "kind": ITEM_KIND_INDEX,
+                "page_idx": idx,
+            }
+            for idx in range(first_page_idx, last_page_idx - 1, -1)
+        ]
     )
+    logger.info(f"Frontier of {base_url}: {queued} pages queued from latest page {board.latest_page}")
+    return [{"worker": worker, "rate_weight": rate_weight} for worker in range(workers)]
 
-    end = EmptyOperator(task_id="end", dag=dag)
 
-    start >> crawl >> end
+def report_frontier_progress(
+    ptt_board: str, logger_assigned, dag_id: str, run_id: str = "manual"
+) -> dict:
+    """
+    log how many urls of the frontier of a run are done
+    :param ptt_board: collection of the board
+    :param logger_assigned: logger
+    :param dag_id: dag crawling the range
+    :param run_id: dag run (passed by airflow)
+    :return: progress report
+    """
+    progress = create_url_frontier(ptt_board, dag_id, run_id).stats()
+    progress_logs = {
+        "crawler": logger_assigned.name,
+        "board": ptt_board,
+        "dag_id": dag_id,
+        "run_id": run_id,
+        **progress,
+    }
+    logger_assigned.info(json.dumps(progress_logs))
+    return progress
 
-    return dag
 
+def crawl_frontier(
+    base_url: str,
+    ptt_board: str,
+    logger_assigned,
+    dag_id: str,
+    worker: int,
+    run_id: str = "manual",
+    max_requests_in_flight: int = MAX_REQUESTS_IN_FLIGHT,
+    requests_per_second: float = REQUESTS_PER_SECOND_PER_HOST,
+    write_flush_every_pages: int = WRITE_FLUSH_EVERY_PAGES,
+    rate_weight: float = 1.0,
+):
+    """
+    lease urls from the frontier of a run until every url is done: an index page queues its articles, and the
+    articles are acknowledged once written. workers crawl the same range concurrently without fetching a url twice
+    :param base_url: original url
+    :param ptt_board: collection of the board
+    :param logger_assigned: logger
+    :param dag_id: dag crawling the range
+    :param worker: worker number
+    :param run_id: dag run (passed by airflow)
+    :param max_requests_in_flight: maximum number of concurrent requests
+    :param requests_per_second: initial request rate towards ptt (the adaptive rate is split among the workers)
+    :param write_flush_every_pages: number of leased batches written with one bulk write
+    :param rate_weight: share of the adaptive rate of the worker (the rate_weight of its board)
+    """
+    frontier = create_url_frontier(ptt_board, dag_id, run_id)
+    writer = create_article_writer(ptt_board, logger_assigned, write_flush_every_pages)
+
+    async def crawl():
+        async with create_crawl_engine(
+            max_requests_in_flight=max_requests_in_flight,
+            requests_per_second=requests_per_second,
+            rate_weight=rate_weight,
+        ) as engine:
+            telemetry = CrawlTelemetry(logger_assigned.name, engine, writer)
+            board = await open_board_context(engine, base_url)
+            index_pages, leased, unwritten_urls = 0, [], []
+            write_stage = WriteStage(writer, WRITE_MAX_PENDING_BATCHES)
+            try:
+                async with write_stage:
+                    while True:
+                        leased = await asyncio.to_thread(frontier.lease, FRONTIER_LEASE_ITEMS)
+                        if not leased:
+                            if await asyncio.to_thread(frontier.is_drained):
+                                break
+                            # the other urls are leased: wait until they are done or their leases expire
+                            await asyncio.sleep(FRONTIER_POLL_SECONDS)
+                            continue
+
+                        article_rows = {}
+                        for item in leased:
+                            if item["kind"] == ITEM_KIND_INDEX:
+                                index_rows = await fetch_index_rows(engine, item["url"])
+                                await asyncio.to_thread(
+                                    frontier.push,
+                                    [
+                                        {
+                                            "url": article_url,
+                                            "priority": item["priority"] + 0.5,
+                                            "kind": ITEM_KIND_ARTICLE,
+                                            "page_idx": item["page_idx"],
+                                            "nrec": nrec,
+                                            "title": article_title,
+                                        }
+                                        for article_url, (nrec, article_title) in index_rows.items()
+                                    ],
+                                )
+                                await asyncio.to_thread(frontier.ack, [item["url"]])
+                                index_pages += 1
+                            else:
+                                article_rows[item["url"]] = (
+                                    item["page_idx"],
+                                    item["nrec"],
+                                    item["title"],
+                                )
 
-dag_gossips_from_latest_to_middle = create_dag_from_latest_to_middle(
-    dag_id="crawl_ptt_gossips_from_latest_to_middle",
-    schedule="*/10 * * * *",
-    base_url="https://www.ptt.cc/bbs/Gossiping/index.html",
-    logger_assigned=logger_gossip_from_latest_to_middle,
-)
+                        counts = {}
+                        if article_rows:
+                            crawl_results, counts = await crawl_article_rows(
+                                engine, writer, article_rows, ptt_board, telemetry
+                            )
+                            if crawl_results:
+                                writer.add_inserts(crawl_results)
+                        # the callback of a batch replaces the one of the previous batch until they are written,
+                        # so it acknowledges every article since the last write
+                        unwritten_urls.extend(article_rows)
+                        await write_stage.page_done(
+                            on_written=functools.partial(frontier.ack, list(unwritten_urls))
+                        )
+                        if writer.pages_since_flush == 0:
+                            unwritten_urls = []
+                        leased = []
+
+                        crawling_logs = {
+                            "crawler": logger_assigned.name,
+                            "frontier_worker": worker,
+                            "frontier_index_pages": index_pages,
+                            **{f"crawling_data_{key}": value for key, value in counts.items()},
+                            **{f"crawling_{key}": value for key, value in telemetry.page_done().items()},
+                        }
+                        logger_assigned.info(json.dumps(crawling_logs))
+            except BaseException:
+                # the other workers can lease the batch and the articles not handed to the writer yet now rather than
+                # after their lease expired (the batches handed over after a failed write are never acknowledged)
+                await asyncio.to_thread(
+                    frontier.release, [item["url"] for item in leased] + unwritten_urls
+                )
+                raise
+            finally:
+                log_crawl_run(board, index_pages, logger_assigned, write_stage, telemetry)
 
-dag_politic_from_latest_to_middle = create_dag_from_latest_to_middle(
-    dag_id="crawl_ptt_politic_from_latest_to_middle",
-    schedule="*/10 * * * *",
-    base_url="https://www.ptt.cc/bbs/HatePolitics/index.html",
-    logger_assigned=logger_politic_from_latest_to_middle,
-)
+    try:
+        asyncio.run(crawl())
+    finally:
+        writer.close()
 
-dag_gossips_from_middle_to_ancient = create_dag_from_middle_to_ancient(
-    dag_id="crawl_ptt_gossips_from_middle_to_ancient",
-    schedule=timedelta(days=1),
-    base_url="https://www.ptt.cc/bbs/Gossiping/index.html",
-    logger_assigned=logger_gossip_from_middle_to_ancient,
-)
 
-dag_politic_from_middle_to_ancient = create_dag_from_middle_to_ancient(
-    dag_id="crawl_ptt_politic_from_middle_to_ancient",
-    schedule=timedelta(days=1),
-    base_url="https://www.ptt.cc/bbs/HatePolitics/index.html",
-    logger_assigned=logger_politic_from_middle_to_ancient,
-)
+async def recrawl_articles_with_engine(
+    engine: AsyncCrawlEngine,
+    writer: ArticleBulkWriter,
+    candidates: list[dict],
+    scheduler: RecrawlScheduler,
+    crawling_logger: logging.Logger,
+):
+    """
+    recrawl the articles with the most comments expected since their last fetch, wherever they are on the board
+    :param engine: crawl engine
+    :param writer: write stage collecting the article updates
+    :param candidates: documents returned by get_recrawl_candidates
+    :param scheduler: scheduler handing out the request budget
+    :param crawling_logger: logger
+    """
+    now = datetime.now().timestamp()
+    stored, recrawl_states = {}, {}
+    for candidate in candidates:
+        article_data = candidate.get("article_data", {})
+        stored[candidate["article_url"]] = article_data
+        recrawl_states[candidate["article_url"]] = candidate["recrawl_state"]
+        scheduler.push(
+            article_url=candidate["article_url"],
+            recrawl_state=candidate["recrawl_state"],
+            article_time=article_data.get("time"),
+            now=now,
+        )
+    num_queued = len(scheduler)
+    batch = scheduler.pop_batch()
+
+    parsing_results = await asyncio.gather(
+        *(
+            fetch_and_parse_article(
+                engine,
+                article_url,
+                functools.partial(
+                    parse_article_update,
+                    previous_num_comments=stored[article_url].get("num_of_comment") or 0,
+                    stored_fingerprints=stored[article_url].get("comment_fingerprints"),
+                ),
+            )
+            for article_url, _ in batch
+        ),
+        return_exceptions=True,
+    )
 
-dag_gossips_from_ancient_to_earliest = create_dag_from_ancient_to_earliest(
-    dag_id="crawl_ptt_gossips_from_ancient_to_earliest",
-    schedule=timedelta(days=2),
-    base_url="https://www.ptt.cc/bbs/Gossiping/index.html",
-    logger_assigned=logger_gossip_from_ancient_to_earliest,
-)
+    num_update, num_ignore, num_fail = 0, 0, 0
+    observed_datetime = datetime.now().timestamp()
+    for (article_url, _), parsing_result in zip(batch, parsing_results):
+        if isinstance(parsing_result, Exception):
+            num_fail += 1
+            logger.error(f"{parsing_result}: cannot recrawl {article_url}, it is skipped.")
+            continue
+
+        num_comments = stored[article_url].get("num_of_comment") or 0
+        # a deleted article answers with a page without comments; its stored comments are kept
+        num_of_comment = max(parsing_result["num_of_comment"], num_comments)
+        recrawl_state = observe_velocity(
+            recrawl_state=recrawl_states[article_url],
+            num_of_comment=num_of_comment,
+            observed_datetime=observed_datetime,
+            article_time=stored[article_url].get("time"),
+            half_life=RECRAWL_VELOCITY_HALF_LIFE,
+        )
+        if parsing_result["num_of_comment"] > num_comments or parsing_result["comments"]:
+            num_update += 1
+            logger.debug(f"Recrawl update: {article_url}")
+            writer.add_update(
+                article_url=article_url,
+                new_data=parsing_result,
+                new_comments=parsing_result["comments"],
+                recrawl_state=recrawl_state,
+                previous_num_comments=stored[article_url].get("num_of_comment"),
+                previous_fingerprints=stored[article_url].get("comment_fingerprints"),
+            )
+        else:
+            num_ignore += 1
+            logger.debug(f"Recrawl ignore: {article_url}")
+            writer.add_index_signal(article_url, None, recrawl_state)
+
+    request_summary = engine.recorder.summary()
+    crawling_logs = {
+        "crawler": crawling_logger.name,
+        "recrawl_candidates": len(candidates),
+        "recrawl_queued": num_queued,
+        "recrawl_selected": len(batch),
+        "recrawl_priority_max": round(batch[0][1], 2) if batch else 0,
+        "recrawl_priority_min": round(batch[-1][1], 2) if batch else 0,
+        "crawling_data_update": num_update,
+        "crawling_data_ignore": num_ignore,
+        "crawling_data_fail": num_fail,
+        "crawling_requests": request_summary["requests"],
+        "crawling_retries": request_summary["retries"],
+        "crawling_request_outcomes": request_summary["outcomes"],
+    }
+    crawling_logger.info(json.dumps(crawling_logs))
 
-dag_politic_from_ancient_to_earliest = create_dag_from_ancient_to_earliest(
-    dag_id="crawl_ptt_politic_from_ancient_to_earliest",
-    schedule=timedelta(days=2),
-    base_url="https://www.ptt.cc/bbs/HatePolitics/index.html",
-    logger_assigned=logger_politic_from_ancient_to_earliest,
-)
+
+def recrawl_by_priority(
+    ptt_board: str,
+    logger_assigned,
+    request_budget: int = RECRAWL_REQUESTS_PER_RUN,
+    max_requests_in_flight: int = MAX_REQUESTS_IN_FLIGHT,
+    requests_per_second: float = REQUESTS_PER_SECOND_PER_HOST,
+    rate_weight: float = 1.0,
+):
+    """
+    spend a fixed request budget on the articles whose comments are expected to have grown the most
+    :param ptt_board: collection of the board
+    :param logger_assigned: logger
+    :param request_budget: number of articles recrawled in this run
+    :param max_requests_in_flight: maximum number of concurrent requests
+    :param requests_per_second: allowed request rate towards ptt
+    :param rate_weight: share of the adaptive rate of the task (the rate_weight of its board)
+    """
+    candidates = get_recrawl_candidates(
+        target_collection=ptt_board,
+        now=datetime.now().timestamp(),
+        max_article_age=RECRAWL_MAX_ARTICLE_AGE,
+    )
+    scheduler = RecrawlScheduler(
+        request_budget=request_budget,
+        half_life=RECRAWL_VELOCITY_HALF_LIFE,
+        max_article_age=RECRAWL_MAX_ARTICLE_AGE,
+        min_expected_comments=RECRAWL_MIN_EXPECTED_COMMENTS,
+    )
+    writer = create_article_writer(ptt_board, logger_assigned)
+
+    async def crawl():
+        async with create_crawl_engine(
+            max_requests_in_flight=max_requests_in_flight,
+            requests_per_second=requests_per_second,
+            rate_weight=rate_weight,
+        ) as engine:
+            await recrawl_articles_with_engine(
+                engine, writer, candidates, scheduler, crawling_logger=logger_assigned
+            )
+
+    try:
+        asyncio.run(crawl())
+    finally:
+        writer.flush()
+        writer.close()
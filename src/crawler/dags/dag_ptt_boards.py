@@ -0,0 +1,302 @@
+"""
+The dags crawling the boards of the board registry. Airflow parses this file on every scheduler loop, so it
+only imports airflow and the registry: the crawler (dag_crawling, its database, http and logging clients) is
+imported by the tasks when they run.
+"""
+import inspect
+import logging
+import functools
+from airflow import DAG
+from datetime import datetime, timedelta
+from typing import Union
+from airflow.operators.empty import EmptyOperator
+from airflow.operators.python import PythonOperator, ShortCircuitOperator
+from airflow.utils.trigger_rule import TriggerRule
+from utils_crawler.board_registry import (
+    BOARDS,
+    CRAWL_FROM_LATEST_TO_MIDDLE,
+    CRAWL_FROM_MIDDLE_TO_ANCIENT,
+    CRAWL_FROM_ANCIENT_TO_EARLIEST,
+    CRAWL_RECRAWL_BY_VELOCITY,
+    PttBoard,
+)
+
+BACKFILL_MAX_ACTIVE_SHARDS = 4
+
+default_args = {
+    "owner": "Raymond",
+    "start_date": datetime(2023, 1, 1),
+    "email_on_failure": False,
+    "email_on_retry": False,
+    "retries": 5,
+    "retry_delay": timedelta(minutes=5),
+}
+
+
+def run_crawler_task(task_name: str, *args, **context):
+    """
+    import the crawler and run one of its task functions
+    :param task_name: name of the function in dag_crawling
+    :param args: positional arguments of the function (op_args)
+    :param context: airflow context and op_kwargs; only the ones the function takes are passed
+    :return: return value of the function
+    """
+    import dag_crawling
+
+    dag_crawling.setup_task_logging()
+    task_function = getattr(dag_crawling, task_name)
+    parameters = inspect.signature(task_function).parameters
+    return task_function(
+        *args, **{key: value for key, value in context.items() if key in parameters}
+    )
+
+
+def crawler_task(task_name: str):
+    """
+    :param task_name: name of the function in dag_crawling
+    :return: python_callable running the function without importing the crawler when the dag is parsed
+    """
+    return functools.partial(run_crawler_task, task_name)
+
+
+def create_dag_from_latest_to_middle(
+    dag_id: str,
+    schedule: Union[str, timedelta],
+    base_url: str,
+    ptt_board: str,
+    logger_assigned,
+    start_generation: int,
+    end_generation: int,
+    rate_weight: float = 1.0,
+):
+    dag = DAG(
+        dag_id=dag_id,
+        default_args=default_args,
+        schedule=schedule,
+        catchup=False,
+        # a run that comes late covers the pages turned over since the previous one, so runs never overlap
+        max_active_runs=1,
+    )
+
+    start = EmptyOperator(task_id="start", dag=dag)
+
+    # the schedule is a tick: the crawl cadence of the board decides whether this run crawls
+    check_cadence = ShortCircuitOperator(
+        task_id="check_cadence",
+        python_callable=crawler_task("is_crawl_due"),
+        op_args=[dag_id],
+        dag=dag,
+    )
+
+    crawl = PythonOperator(
+        task_id="crawl",
+        python_callable=crawler_task("crawl_latest_by_cadence"),
+        op_args=[
+            base_url,
+            ptt_board,
+            logger_assigned,
+            dag_id,
+            start_generation,
+            end_generation,
+        ],
+        op_kwargs={"rate_weight": rate_weight},
+        dag=dag,
+    )
+
+    check_ip = PythonOperator(
+        task_id="check_ip",
+        python_callable=crawler_task("update_wrong_ip"),
+        op_args=[ptt_board],
+        dag=dag,
+    )
+
+    ensure_unique_article_url = PythonOperator(
+        task_id="ensure_unique_article_url",
+        python_callable=crawler_task("ensure_article_url_index"),
+        op_args=[ptt_board],
+        dag=dag,
+    )
+
+    end = EmptyOperator(task_id="end", dag=dag)
+
+    start >> check_cadence >> ensure_unique_article_url >> crawl >> check_ip >> end
+
+    return dag
+
+
+def create_dag_backfill(
+    dag_id: str,
+    schedule: Union[str, timedelta],
+    base_url: str,
+    ptt_board: str,
+    logger_assigned,
+    start_generation: int,
+    end_generation: int,
+    rate_weight: float = 1.0,
+):
+    dag = DAG(
+        dag_id=dag_id,
+        default_args=default_args,
+        schedule=schedule,
+        catchup=False,
+        max_active_runs=1,
+    )
+
+    start = EmptyOperator(task_id="start", dag=dag)
+
+    plan = PythonOperator(
+        task_id="plan_shards",
+        python_callable=crawler_task("plan_backfill"),
+        op_args=[base_url, ptt_board, dag_id, start_generation, end_generation],
+        op_kwargs={"rate_weight": rate_weight},
+        dag=dag,
+    )
+
+    # one mapped task instance per shard; a retried instance resumes after its checkpoint
+    crawl = PythonOperator.partial(
+        task_id="crawl_shard",
+        python_callable=crawler_task("crawl_backfill_shard"),
+        op_args=[base_url, ptt_board, logger_assigned, dag_id],
+        max_active_tis_per_dag=BACKFILL_MAX_ACTIVE_SHARDS,
+        dag=dag,
+    ).expand(op_kwargs=plan.output)
+
+    report = PythonOperator(
+        task_id="report_progress",
+        python_callable=crawler_task("report_backfill_progress"),
+        op_args=[ptt_board, logger_assigned, dag_id],
+        trigger_rule=TriggerRule.ALL_DONE,
+        dag=dag,
+    )
+
+    end = EmptyOperator(task_id="end", dag=dag)
+
+    start >> plan >> crawl >> report >> end
+
+    return dag
+
+
+def create_dag_frontier(
+    dag_id: str,
+    schedule: Union[str, timedelta],
+    base_url: str,
+    ptt_board: str,
+    logger_assigned,
+    start_generation: int,
+    end_generation: int,
+    workers: int,
+    rate_weight: float = 1.0,
+):
+    dag = DAG(
+        dag_id=dag_id,
+        default_args=default_args,
+        schedule=schedule,
+        catchup=False,
+        max_active_runs=1,
+    )
+
+    start = EmptyOperator(task_id="start", dag=dag)
+
+    plan = PythonOperator(
+        task_id="plan_frontier",
+        python_callable=crawler_task("plan_frontier"),
+        op_args=[base_url, ptt_board, dag_id, start_generation, end_generation, workers],
+        op_kwargs={"rate_weight": rate_weight},
+        dag=dag,
+    )
+
+    # the workers lease urls from the frontier of the run, so they can run on any celery worker at once
+    crawl = PythonOperator.partial(
+        task_id="crawl_frontier",
+        python_callable=crawler_task("crawl_frontier"),
+        op_args=[base_url, ptt_board, logger_assigned, dag_id],
+        dag=dag,
+    ).expand(op_kwargs=plan.output)
+
+    report = PythonOperator(
+        task_id="report_progress",
+        python_callable=crawler_task("report_frontier_progress"),
+        op_args=[ptt_board, logger_assigned, dag_id],
+        trigger_rule=TriggerRule.ALL_DONE,
+        dag=dag,
+    )
+
+    end = EmptyOperator(task_id="end", dag=dag)
+
+    start >> plan >> crawl >> report >> end
+
+    return dag
+
+
+def create_dag_recrawl_by_velocity(
+    dag_id: str,
+    schedule: Union[str, timedelta],
+    base_url: str,
+    ptt_board: str,
+    logger_assigned,
+    rate_weight: float = 1.0,
+):
+    dag = DAG(
+        dag_id=dag_id,
+        default_args=default_args,
+        schedule=schedule,
+        catchup=False,
+    )
+
+    start = EmptyOperator(task_id="start", dag=dag)
+
+    recrawl = PythonOperator(
+        task_id="recrawl",
+        python_callable=crawler_task("recrawl_by_priority"),
+        op_args=[ptt_board, logger_assigned],
+        op_kwargs={"rate_weight": rate_weight},
+        dag=dag,
+    )
+
+    end = EmptyOperator(task_id="end", dag=dag)
+
+    start >> recrawl >> end
+
+    return dag
+
+
+def create_board_dags(board: PttBoard) -> list[DAG]:
+    """
+    create the dags of the crawls scheduled by a registered board, each with its own logger. the backfill crawls
+    of a board with frontier workers pull from a url frontier instead of crawling shards
+    :param board: registered board
+    :return: dags of the board
+    """
+    dag_factories = {
+        CRAWL_FROM_LATEST_TO_MIDDLE: create_dag_from_latest_to_middle,
+        CRAWL_FROM_MIDDLE_TO_ANCIENT: create_dag_backfill,
+        CRAWL_FROM_ANCIENT_TO_EARLIEST: create_dag_backfill,
+    }
+    dags = []
+    for crawl, schedule in board.schedules.items():
+        if schedule is None:
+            continue
+        dag_kwargs = {
+            "dag_id": board.dag_id(crawl),
+            "schedule": schedule,
+            "base_url": board.url,
+            "ptt_board": board.collection,
+            "logger_assigned": logging.getLogger(board.logger_name_of(crawl)),
+            "rate_weight": board.rate_weight,
+        }
+        if crawl == CRAWL_RECRAWL_BY_VELOCITY:
+            dags.append(create_dag_recrawl_by_velocity(**dag_kwargs))
+        else:
+            start_generation, end_generation = board.generations(crawl)
+            dag_kwargs.update(start_generation=start_generation, end_generation=end_generation)
+            if crawl != CRAWL_FROM_LATEST_TO_MIDDLE and board.frontier_workers:
+                dags.append(create_dag_frontier(**dag_kwargs, workers=board.frontier_workers))
+            else:
+                dags.append(dag_factories[crawl](**dag_kwargs))
+    return dags
+
+
+# airflow collects the dags from the globals of the module
+for registered_board in BOARDS:
+    for board_dag in create_board_dags(registered_board):
+        globals()[board_dag.dag_id] = board_dag
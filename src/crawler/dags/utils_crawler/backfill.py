@@ -0,0 +1,170 @@
+"""
+This module contains the sharded backfill of old board pages. The page range of a run is pinned to absolute
+page indices once, split into shards crawled by separate task instances, and every shard checkpoints the last
+page it has written so a retried shard resumes where it stopped instead of starting over.
+"""
+import math
+from datetime import datetime
+from pymongo.collection import Collection
+
+
+def generation_to_page_idx(latest_page: int, generation: int) -> int:
+    """
+    :param latest_page: index of the latest page of the board
+    :param generation: page counted from the latest one (1 = the latest page)
+    :return: absolute index of the page
+    """
+    return latest_page - (generation - 1)
+
+
+def plan_shards(
+    latest_page: int, start_generation: int, end_generation: int, pages_per_shard: int
+) -> list[dict]:
+    """
+    split the pages start_generation (included) to end_generation (excluded) into shards
+    :param latest_page: index of the latest page of the board
+    :param start_generation: first page counted from the latest one
+    :param end_generation: page counted from the latest one where the range stops
+    :param pages_per_shard: pages crawled by one shard
+    :return: shards (shard number, first and last absolute page index, crawled from first down to last)
+    """
+    first_page_idx = generation_to_page_idx(latest_page, start_generation)
+    last_page_idx = max(generation_to_page_idx(latest_page, end_generation - 1), 1)
+
+    shards = []
+    for shard, shard_first_page_idx in enumerate(
+        range(first_page_idx, last_page_idx - 1, -pages_per_shard)
+    ):
+        shards.append(
+            {
+                "shard": shard,
+                "first_page_idx": shard_first_page_idx,
+                "last_page_idx": max(shard_first_page_idx - pages_per_shard + 1, last_page_idx),
+            }
+        )
+    return shards
+
+
+def next_page_idx(checkpoint: dict) -> int:
+    """
+    :param checkpoint: checkpoint of a shard
+    :return: index of the next page to crawl (below last_page_idx if the shard is done)
+    """
+    if checkpoint["last_completed_page_idx"] is None:
+        return checkpoint["first_page_idx"]
+    return checkpoint["last_completed_page_idx"] - 1
+
+
+def summarize_progress(checkpoints: list[dict], now: float) -> dict:
+    """
+    summarize the checkpoints of the shards of a run
+    :param checkpoints: checkpoints of the shards started so far
+    :param now: current timestamp
+    :return: progress report (shards, pages done and total, pages per minute and eta in minutes)
+    """
+    pages_total = sum(
+        checkpoint["first_page_idx"] - checkpoint["last_page_idx"] + 1
+        for checkpoint in checkpoints
+    )
+    pages_done = sum(
+        checkpoint["first_page_idx"] - next_page_idx(checkpoint) for checkpoint in checkpoints
+    )
+    started_datetime = min(
+        (checkpoint["started_datetime"] for checkpoint in checkpoints), default=now
+    )
+    minutes = (now - started_datetime) / 60
+    pages_per_minute = pages_done / minutes if minutes > 0 else 0.0
+    pages_remaining = pages_total - pages_done
+    if pages_remaining == 0:
+        eta_minutes = 0.0
+    elif pages_per_minute > 0:
+        eta_minutes = pages_remaining / pages_per_minute
+    else:
+        eta_minutes = math.inf
+
+    return {
+        "backfill_shards": len(checkpoints),
+        "backfill_shards_completed": sum(
+            next_page_idx(checkpoint) < checkpoint["last_page_idx"] for checkpoint in checkpoints
+        ),
+        "backfill_pages_total": pages_total,
+        "backfill_pages_done": pages_done,
+        "backfill_pages_per_minute": round(pages_per_minute, 2),
+        "backfill_eta_minutes": round(eta_minutes, 1) if math.isfinite(eta_minutes) else None,
+    }
+
+
+class BackfillCheckpointStore:
+    """
+    checkpoints of the backfill shards, one document per board, dag, run and shard
+    """
+
+    def __init__(self, collection: Collection):
+        """
+        :param collection: collection holding the checkpoints
+        """
+        self.collection = collection
+
+    def load_or_create(
+        self,
+        ptt_board: str,
+        dag_id: str,
+        run_id: str,
+        shard: int,
+        first_page_idx: int,
+        last_page_idx: int,
+    ) -> dict:
+        """
+        get the checkpoint of a shard, creating it on the shard's first attempt
+        :param ptt_board: collection of the board
+        :param dag_id: dag crawling the range
+        :param run_id: dag run
+        :param shard: shard number
+        :param first_page_idx: absolute index of the shard's first page
+        :param last_page_idx: absolute index of the shard's last page
+        :return: checkpoint
+        """
+        key = {"board": ptt_board, "dag_id": dag_id, "run_id": run_id, "shard": shard}
+        self.collection.update_one(
+            key,
+            {
+                "$setOnInsert": {
+                    "first_page_idx": first_page_idx,
+                    "last_page_idx": last_page_idx,
+                    "last_completed_page_idx": None,
+                    "started_datetime": datetime.now().timestamp(),
+                }
+            },
+            upsert=True,
+        )
+        return self.collection.find_one(key, {"_id": 0})
+
+    def mark_page_done(self, checkpoint: dict, page_idx: int):
+        """
+        record that the pages down to page_idx are written
+        :param checkpoint: checkpoint of the shard
+        :param page_idx: absolute index of the last written page
+        """
+        checkpoint["last_completed_page_idx"] = page_idx
+        self.collection.update_one(
+            {key: checkpoint[key] for key in ("board", "dag_id", "run_id", "shard")},
+            {
+                "$set": {
+                    "last_completed_page_idx": page_idx,
+                    "updated_datetime": datetime.now().timestamp(),
+                }
+            },
+        )
+
+    def run_checkpoints(self, ptt_board: str, dag_id: str, run_id: str) -> list[dict]:
+        """
+        :param ptt_board: collection of the board
+        :param dag_id: dag crawling the range
+        :param run_id: dag run
+        :return: checkpoints of the shards of the run started so far
+        """
+        return list(
+            self.collection.find(
+                {"board": ptt_board, "dag_id": dag_id, "run_id": run_id}, {"_id": 0}
+            )
+        )
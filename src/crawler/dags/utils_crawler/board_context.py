@@ -0,0 +1,76 @@
+"""
+This module contains the board crawl context shared by the pages of a task run: the crawl engine (one pooled
+keep-alive session holding the over18 cookie) and the latest page index of the board, resolved once.
+"""
+import posixpath
+import urllib.parse
+from collections import Counter
+from .crawl_engine import AsyncCrawlEngine
+
+REQUEST_KIND_INDEX = "index"
+REQUEST_KIND_ARTICLE = "article"
+REQUEST_KIND_OVER18 = "over18"
+
+
+def classify_request(url: str) -> str:
+    """
+    :param url: requested url
+    :return: REQUEST_KIND_INDEX, REQUEST_KIND_ARTICLE or REQUEST_KIND_OVER18
+    """
+    path = urllib.parse.urlsplit(url).path
+    if path.startswith("/ask/over18"):
+        return REQUEST_KIND_OVER18
+    if posixpath.basename(path).startswith("index"):
+        return REQUEST_KIND_INDEX
+    return REQUEST_KIND_ARTICLE
+
+
+class BoardCrawlContext:
+    """
+    board pages addressed from the latest page index resolved when the context was opened
+    """
+
+    def __init__(self, engine: AsyncCrawlEngine, base_url: str, latest_page: int):
+        """
+        :param engine: crawl engine of the task run
+        :param base_url: url of the board's latest index page
+        :param latest_page: index of the latest page
+        """
+        self.engine = engine
+        self.base_url = base_url
+        self.latest_page = latest_page
+
+    def page_idx(self, generation: int) -> int:
+        """
+        :param generation: page counted from the latest one (1 = the latest page)
+        :return: absolute index of the page
+        """
+        return self.latest_page - (generation - 1)
+
+    def generation(self, page_idx: int) -> int:
+        """
+        :param page_idx: absolute index of the page
+        :return: page counted from the latest one (1 = the latest page)
+        """
+        return self.latest_page - page_idx + 1
+
+    def page_url(self, page_idx: int) -> str:
+        """
+        :param page_idx: absolute index of the page
+        :return: url of the index page
+        """
+        return self.base_url if page_idx == self.latest_page else f"{self.base_url[:-5]}{page_idx}.html"
+
+    def request_counts(self, since: int = 0) -> dict[str, int]:
+        """
+        count the requests of the task run by kind of page
+        :param since: position returned by len(engine.recorder.attempts) earlier
+        :return: number of requests per kind (index, article and over18)
+        """
+        counts = Counter(
+            classify_request(attempt["url"]) for attempt in self.engine.recorder.attempts[since:]
+        )
+        return {
+            kind: counts[kind]
+            for kind in (REQUEST_KIND_INDEX, REQUEST_KIND_ARTICLE, REQUEST_KIND_OVER18)
+        }
@@ -0,0 +1,149 @@
+"""
+This module contains the registry of the crawled ptt boards. A board declares its url, its mongoDB collection,
+the page generations of its crawls and how often each crawl runs; the dags and their loggers are generated from
+the registry. All the boards are on the same host, so they draw on one adaptive request budget; the weight of a
+board is its share of that budget. The backfill of a large board can be pulled by several workers from a shared url
+frontier in redis instead of being split into shards; the frontier is opt-in, as it needs PTT_REDIS_URL.
+"""
+import os
+import posixpath
+import urllib.parse
+from datetime import timedelta
+from typing import Union
+
+PTT_URL = "https://www.ptt.cc"
+
+CRAWL_FROM_LATEST_TO_MIDDLE = "from_latest_to_middle"
+CRAWL_FROM_MIDDLE_TO_ANCIENT = "from_middle_to_ancient"
+CRAWL_FROM_ANCIENT_TO_EARLIEST = "from_ancient_to_earliest"
+CRAWL_RECRAWL_BY_VELOCITY = "recrawl_by_velocity"
+
+PAGE_GENERATION_LATEST = 1
+PAGE_GENERATION_MIDDLE = 5
+PAGE_GENERATION_ANCIENT = 5000
+PAGE_GENERATION_EARLIEST = 40000
+# frontier workers of the gossiping backfills (0 to crawl shards, as without redis)
+GOSSIPING_FRONTIER_WORKERS = int(os.getenv("PTT_GOSSIPING_FRONTIER_WORKERS", "0"))
+
+# the latest pages are crawled at the cadence of each board (dag_crawling.crawl_latest_by_cadence): their schedule is
+# how often the dag checks whether its next crawl is due
+DEFAULT_SCHEDULES = {
+    CRAWL_FROM_LATEST_TO_MIDDLE: "*/2 * * * *",
+    CRAWL_FROM_MIDDLE_TO_ANCIENT: timedelta(days=1),
+    CRAWL_FROM_ANCIENT_TO_EARLIEST: timedelta(days=2),
+    CRAWL_RECRAWL_BY_VELOCITY: "*/10 * * * *",
+}
+
+
+class PttBoard:
+    """
+    a crawled ptt board and the cadence of its crawls
+    """
+
+    def __init__(
+        self,
+        board: str,
+        collection: str,
+        dag_name: str,
+        logger_name: str,
+        schedules: dict[str, Union[str, timedelta, None]] | None = None,
+        page_generations: tuple[int, int, int, int] = (
+            PAGE_GENERATION_LATEST,
+            PAGE_GENERATION_MIDDLE,
+            PAGE_GENERATION_ANCIENT,
+            PAGE_GENERATION_EARLIEST,
+        ),
+        rate_weight: float = 1.0,
+        frontier_workers: int = 0,
+    ):
+        """
+        :param board: name of the board on ptt (as in /bbs/<board>/index.html)
+        :param collection: mongoDB collection of the articles
+        :param dag_name: name of the board in the dag ids
+        :param logger_name: name of the board in the logger names
+        :param schedules: schedule of each crawl (CRAWL_* constants), None to not crawl it (DEFAULT_SCHEDULES if omitted)
+        :param page_generations: latest, middle, ancient and earliest page counted from the latest one
+        :param rate_weight: share of the request budget of the host (relative to the other boards crawled at once)
+        :param frontier_workers: workers pulling the backfill crawls from a url frontier in redis (0 to crawl shards)
+        """
+        self.board = board
+        self.collection = collection
+        self.dag_name = dag_name
+        self.logger_name = logger_name
+        self.schedules = {**DEFAULT_SCHEDULES, **(schedules or {})}
+        self.page_generations = page_generations
+        self.rate_weight = rate_weight
+        self.frontier_workers = frontier_workers
+
+    @property
+    def url(self) -> str:
+        """
+        :return: url of the latest index page of the board
+        """
+        return f"{PTT_URL}/bbs/{self.board}/index.html"
+
+    def generations(self, crawl: str) -> tuple[int, int]:
+        """
+        :param crawl: CRAWL_FROM_* constant
+        :return: first page and the page where the crawl stops, counted from the latest one
+        """
+        latest, middle, ancient, earliest = self.page_generations
+        return {
+            CRAWL_FROM_LATEST_TO_MIDDLE: (latest, middle),
+            CRAWL_FROM_MIDDLE_TO_ANCIENT: (middle, ancient),
+            CRAWL_FROM_ANCIENT_TO_EARLIEST: (ancient, earliest),
+        }[crawl]
+
+    def dag_id(self, crawl: str) -> str:
+        """
+        :param crawl: CRAWL_* constant
+        :return: dag id of the crawl
+        """
+        if crawl == CRAWL_RECRAWL_BY_VELOCITY:
+            return f"recrawl_ptt_{self.dag_name}_by_velocity"
+        return f"crawl_ptt_{self.dag_name}_{crawl}"
+
+    def logger_name_of(self, crawl: str) -> str:
+        """
+        :param crawl: CRAWL_* constant
+        :return: name of the logger of the crawl (the dashboards filter the logs on it)
+        """
+        return f"logger_{self.logger_name}_{crawl}"
+
+
+BOARDS = (
+    PttBoard(
+        board="Gossiping",
+        collection="gossip",
+        dag_name="gossips",
+        logger_name="gossip",
+        frontier_workers=GOSSIPING_FRONTIER_WORKERS,
+    ),
+    PttBoard(board="HatePolitics", collection="politics", dag_name="politic", logger_name="politic"),
+)
+
+
+def board_name_of_url(url: str) -> str | None:
+    """
+    :param url: url of a board page or an article
+    :return: name of the board (None if the url is not under /bbs/)
+    """
+    parts = posixpath.normpath(urllib.parse.urlsplit(url).path).split("/")
+    if len(parts) < 3 or parts[1] != "bbs":
+        return None
+    return parts[2]
+
+
+def find_board(url: str, boards: tuple[PttBoard, ...] = BOARDS) -> PttBoard:
+    """
+    :param url: url of a board page or an article
+    :param boards: registry
+    :return: registered board of the url (ptt board names are case-insensitive)
+    :raises ValueError: if the board of the url is not registered
+    """
+    board_name = board_name_of_url(url)
+    if board_name is not None:
+        for board in boards:
+            if board.board.lower() == board_name.lower():
+                return board
+    raise ValueError(f"{url} is not a page of a registered board.")
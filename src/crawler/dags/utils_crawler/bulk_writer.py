@@ -0,0 +1,221 @@
+"""
+This module contains the write stage of the crawler: inserts and article updates are collected and
+flushed to mongodb with one unordered bulk_write, or appended to the write spool (see write_spool) which replays
+them into mongodb later. New articles are upserted on article_url, which has a unique index, so an article
+crawled twice (e.g. by two dags at once) is stored once.
+"""
+import json
+import time
+import logging
+from datetime import datetime
+from loguru import logger
+from pymongo.collection import Collection
+from .write_spool import WriteSpool, to_update_one
+
+
+def build_article_update(
+    article_url: str,
+    new_data: dict,
+    new_comments: list[dict],
+    index_signal: dict | None = None,
+    recrawl_state: dict | None = None,
+    previous_num_comments: int | None = None,
+    previous_fingerprints: list[str] | None = None,
+) -> tuple[dict, dict]:
+    """
+    build the filter and update document refreshing an article's counters and appending its new comments
+    :param article_url: article url
+    :param new_data: new parsing result of the article
+    :param new_comments: comments not stored yet
+    :param index_signal: index signal of the article's row on the board index
+    :param recrawl_state: comment velocity observed by this fetch
+    :param previous_num_comments: stored comment count the new comments were parsed against; the comments are
+        only appended while it is still stored, so applying the update twice appends them once (None to not check)
+    :param previous_fingerprints: stored fingerprint tail the new comments were found against, checked instead
+        of the comment count (None if the article was stored without it)
+    :return: filter and update document
+    """
+    num_of_favor = new_data["num_of_favor"]
+    num_of_against = new_data["num_of_against"]
+    num_of_arrow = new_data["num_of_arrow"]
+    update = {
+        "$set": {
+            "article_data.last_crawled_datetime": datetime.now().timestamp(),
+            "article_data.num_of_favor": num_of_favor,
+            "article_data.num_of_against": num_of_against,
+            "article_data.num_of_arrow": num_of_arrow,
+            "article_data.num_of_comment": num_of_favor + num_of_against + num_of_arrow,
+        }
+    }
+    if index_signal is not None:
+        update["$set"]["index_signal"] = index_signal
+    if recrawl_state is not None:
+        update["$set"]["recrawl_state"] = recrawl_state
+    if "comment_fingerprints" in new_data:
+        update["$set"]["article_data.comment_fingerprints"] = new_data["comment_fingerprints"]
+    query = {"article_url": article_url}
+    if new_comments:
+        update["$push"] = {"article_data.comments": {"$each": new_comments}}
+        if previous_fingerprints is not None:
+            query["article_data.comment_fingerprints"] = previous_fingerprints
+        elif previous_num_comments is not None:
+            query["article_data.num_of_comment"] = previous_num_comments
+    return query, update
+
+
+class ArticleBulkWriter:
+    """
+    collect the writes of a window of pages and flush them with one unordered bulk_write
+    """
+
+    def __init__(
+        self,
+        collection: Collection,
+        flush_every_pages: int = 1,
+        crawling_logger: logging.Logger | None = None,
+        spool: WriteSpool | None = None,
+    ):
+        """
+        :param collection: target collection
+        :param flush_every_pages: number of pages collected before flushing
+        :param crawling_logger: logger receiving one json line per flush
+        :param spool: write spool receiving the flushes instead of mongodb (None to write to mongodb)
+        """
+        self.collection = collection
+        self.flush_every_pages = flush_every_pages
+        self.crawling_logger = crawling_logger
+        self.spool = spool
+        # write records (filter, update and upsert), turned into UpdateOne when written
+        self.operations: list[dict] = []
+        self.pages_since_flush = 0
+        self.written_operations = 0
+        self.write_seconds = 0.0
+
+    def add_inserts(self, articles: list[dict]):
+        """
+        :param articles: new article documents (ignored if their article_url is already stored)
+        """
+        self.operations.extend(
+            {
+                "filter": {"article_url": article["article_url"]},
+                "update": {"$setOnInsert": article},
+                "upsert": True,
+            }
+            for article in articles
+        )
+
+    def add_update(
+        self,
+        article_url: str,
+        new_data: dict,
+        new_comments: list[dict],
+        index_signal: dict | None = None,
+        recrawl_state: dict | None = None,
+        previous_num_comments: int | None = None,
+        previous_fingerprints: list[str] | None = None,
+    ):
+        """
+        :param article_url: article url
+        :param new_data: new parsing result of the article
+        :param new_comments: comments not stored yet
+        :param index_signal: index signal of the article's row on the board index
+        :param recrawl_state: comment velocity observed by this fetch
+        :param previous_num_comments: stored comment count the new comments were parsed against
+        :param previous_fingerprints: stored fingerprint tail the new comments were found against
+        """
+        query, update = build_article_update(
+            article_url,
+            new_data,
+            new_comments,
+            index_signal,
+            recrawl_state,
+            previous_num_comments,
+            previous_fingerprints,
+        )
+        self.operations.append({"filter": query, "update": update, "upsert": False})
+
+    def add_index_signal(
+        self,
+        article_url: str,
+        index_signal: dict | None,
+        recrawl_state: dict | None = None,
+    ):
+        """
+        :param article_url: article url of an unchanged article
+        :param index_signal: index signal of the article's row on the board index (None if fetched off the index)
+        :param recrawl_state: comment velocity observed by this fetch
+        """
+        fields = {"index_signal": index_signal, "recrawl_state": recrawl_state}
+        fields = {key: value for key, value in fields.items() if value is not None}
+        if fields:
+            self.operations.append(
+                {"filter": {"article_url": article_url}, "update": {"$set": fields}, "upsert": False}
+            )
+
+    def page_done(self):
+        """
+        mark the end of a page and flush if the window is full
+        """
+        self.pages_since_flush += 1
+        if self.pages_since_flush >= self.flush_every_pages:
+            self.flush()
+
+    def take_operations(self) -> list[dict]:
+        """
+        take the collected operations out of the writer
+        :return: operations to write
+        """
+        self.pages_since_flush = 0
+        operations, self.operations = self.operations, []
+        return operations
+
+    def write_operations(self, operations: list[dict]) -> dict:
+        """
+        write operations with one unordered bulk_write (or append them to the write spool)
+        :param operations: operations taken from the writer
+        :return: flush report (operations, inserted, modified and seconds; operations and seconds if spooled)
+        """
+        if not operations:
+            return {}
+
+        start = time.perf_counter()
+        if self.spool is not None:
+            self.spool.append(self.collection.name, operations)
+            result = None
+        else:
+            result = self.collection.bulk_write(
+                [to_update_one(operation) for operation in operations], ordered=False
+            )
+        seconds = time.perf_counter() - start
+        self.written_operations += len(operations)
+        self.write_seconds += seconds
+        flush_logs = {
+            "crawler": self.crawling_logger.name if self.crawling_logger else None,
+            "collection": self.collection.name,
+        }
+        if result is None:
+            flush_logs["spooled_operations"] = len(operations)
+            flush_logs["spooled_seconds"] = round(seconds, 4)
+        else:
+            flush_logs["bulk_write_operations"] = len(operations)
+            flush_logs["bulk_write_inserted"] = result.upserted_count
+            flush_logs["bulk_write_modified"] = result.modified_count
+            flush_logs["bulk_write_seconds"] = round(seconds, 4)
+        logger.debug(f"Bulk write: {flush_logs}")
+        if self.crawling_logger:
+            self.crawling_logger.info(json.dumps(flush_logs))
+        return flush_logs
+
+    def close(self):
+        """
+        seal the spooled writes so that the drainer replays them without waiting for the segment to age
+        """
+        if self.spool is not None:
+            self.spool.close()
+
+    def flush(self) -> dict:
+        """
+        write all collected operations
+        :return: flush report (operations, inserted, modified and seconds)
+        """
+        return self.write_operations(self.take_operations())
@@ -0,0 +1,55 @@
+"""
+This module decides from the rows of a board index page which stored articles plausibly changed.
+Each row (div.r-ent) shows the article title and nrec, the number of 推 minus the number of 噓.
+"""
+
+# nrec shows 爆 from 100 and XX from -100 on, so changes cannot be seen any more
+SATURATED_NREC = {"爆", "XX"}
+
+
+def build_index_signature(nrec: str, title: str) -> str:
+    """
+    build the signature of an index row
+    :param nrec: text of the row's nrec (push count) column
+    :param title: article title shown on the index page
+    :return: signature
+    """
+    return f"{nrec}|{title}"
+
+
+def build_index_signal(nrec: str, title: str, checked_datetime: float) -> dict:
+    """
+    build the index signal stored with an article each time it is fetched
+    :param nrec: text of the row's nrec (push count) column
+    :param title: article title shown on the index page
+    :param checked_datetime: timestamp of the fetch
+    :return: index signal
+    """
+    return {
+        "signature": build_index_signature(nrec, title),
+        "checked_datetime": checked_datetime,
+    }
+
+
+def should_refetch(
+    nrec: str,
+    title: str,
+    stored_signal: dict | None,
+    now: float,
+    max_staleness: float,
+) -> bool:
+    """
+    decide whether an article has to be downloaded again
+    :param nrec: current text of the row's nrec column
+    :param title: current title shown on the index page
+    :param stored_signal: index signal stored with the article (None if not stored yet)
+    :param now: current timestamp
+    :param max_staleness: seconds after which an article is fetched even if its row did not change
+    :return: True if the article plausibly changed
+    """
+    if stored_signal is None or nrec in SATURATED_NREC:
+        return True
+    if stored_signal.get("signature") != build_index_signature(nrec, title):
+        return True
+    # → comments and pairs of 推 and 噓 leave nrec unchanged
+    return now - stored_signal.get("checked_datetime", 0) >= max_staleness
@@ -0,0 +1,86 @@
+"""
+This module contains the fingerprints of the comments of an article. A fingerprint is a short hash of the commenter,
+the comment type, the comment time and the content, so it is the same whenever the comment is parsed. A stored
+article keeps the fingerprints of its last comments; the comments of a new fetch that come after that tail are the
+ones not stored yet, even if the comment count and the parsed comments drifted apart (e.g. rows whose time cannot be
+parsed, or comments removed from the page).
+"""
+import hashlib
+
+COMMENT_FINGERPRINT_TAIL = 16
+COMMENT_FINGERPRINT_BYTES = 6
+
+
+def comment_fingerprint(comment: dict) -> str:
+    """
+    :param comment: parsed comment (commenter_id, comment_type, comment_time and comment_content)
+    :return: fingerprint of the comment (hex)
+    """
+    comment_time = comment["comment_time"]
+    key = "\x1f".join(
+        (
+            comment["commenter_id"] or "",
+            comment["comment_type"] or "",
+            "" if comment_time is None else str(round(comment_time)),
+            comment["comment_content"] or "",
+        )
+    )
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=COMMENT_FINGERPRINT_BYTES).hexdigest()
+
+
+def locate_unseen_comments(
+    fingerprints: list[str], stored_tail: list[str], expected_first_unseen: int
+) -> int | None:
+    """
+    find where the stored tail ends among the fingerprints of parsed comments
+    :param fingerprints: fingerprints of the parsed comments, in page order
+    :param stored_tail: fingerprints of the last stored comments
+    :param expected_first_unseen: position of the first unseen comment according to the comment count
+    :return: position of the first unseen comment (None if the last stored comment is not among the parsed ones)
+    """
+    if not stored_tail:
+        return 0
+    best_end, best_length = None, 0
+    for end, fingerprint in enumerate(fingerprints):
+        if fingerprint != stored_tail[-1]:
+            continue
+        length = 1
+        while (
+            length < len(stored_tail)
+            and length <= end
+            and fingerprints[end - length] == stored_tail[-1 - length]
+        ):
+            length += 1
+        # identical comments (same commenter, time and content) match at several places: the longest match wins,
+        # then the one closest to where the comment count puts it
+        if (
+            best_end is None
+            or length > best_length
+            or (
+                length == best_length
+                and abs(end + 1 - expected_first_unseen) < abs(best_end + 1 - expected_first_unseen)
+            )
+        ):
+            best_end, best_length = end, length
+    return None if best_end is None else best_end + 1
+
+
+def split_unseen_comments(
+    comments: list[dict], stored_tail: list[str] | None, expected_first_unseen: int
+) -> tuple[list[dict], list[str]]:
+    """
+    :param comments: parsed comments, in page order (they may start with stored ones)
+    :param stored_tail: fingerprints of the last stored comments (None if the article was stored without them)
+    :param expected_first_unseen: position of the first unseen comment according to the comment count
+    :return: comments not stored yet and the fingerprint tail of the parsed comments
+    """
+    fingerprints = [comment_fingerprint(comment) for comment in comments]
+    first_unseen = (
+        locate_unseen_comments(fingerprints, stored_tail, expected_first_unseen)
+        if stored_tail is not None
+        else None
+    )
+    if first_unseen is None:
+        # articles stored before their fingerprints, or whose stored comments are gone from the page
+        first_unseen = max(expected_first_unseen, 0)
+    return comments[first_unseen:], fingerprints[-COMMENT_FINGERPRINT_TAIL:]
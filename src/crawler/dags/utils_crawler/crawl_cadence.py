@@ -0,0 +1,125 @@
+"""
+This module contains the adaptive cadence of the crawls of the latest pages of a board. Every run records the latest
+page of the board and the articles it found, so the next run knows how many pages turned over since (the pages it
+covers) and how fast articles arrive (how soon it runs). The dag checks often whether its next run is due, so a
+quiet board is crawled rarely and a busy one often, and a run that is not due yet is skipped.
+"""
+from pymongo.collection import Collection
+
+
+def plan_pages(
+    state: dict | None, latest_page: int, default_pages: int, min_pages: int, max_pages: int
+) -> int:
+    """
+    :param state: cadence state of the previous run (None before the first run)
+    :param latest_page: index of the latest page of the board
+    :param default_pages: pages covered by the first run
+    :param min_pages: fewest pages covered by a run
+    :param max_pages: most pages covered by a run
+    :return: pages covered by the run, from the latest one back to the one that was latest at the previous run
+    """
+    if state is None:
+        return default_pages
+    pages_turned = max(latest_page - state["latest_page"], 0)
+    return min(max(pages_turned + 1, min_pages), max_pages)
+
+
+def smooth(previous: float | None, observed: float, smoothing: float) -> float:
+    """
+    :param previous: smoothed rate so far (None if nothing was observed yet)
+    :param observed: rate observed by the run
+    :param smoothing: weight of the observed rate
+    :return: exponentially smoothed rate
+    """
+    return observed if previous is None else previous + smoothing * (observed - previous)
+
+
+def observe_run(
+    state: dict | None,
+    latest_page: int,
+    pages: int,
+    new_articles: int,
+    started_datetime: float,
+    smoothing: float,
+    target_articles_per_run: float,
+    min_interval: float,
+    max_interval: float,
+) -> dict:
+    """
+    update the cadence state with a run and schedule the next one
+    :param state: cadence state of the previous run (None before the first run)
+    :param latest_page: index of the latest page of the board when the run started
+    :param pages: pages covered by the run
+    :param new_articles: articles the run found for the first time
+    :param started_datetime: timestamp of the start of the run
+    :param smoothing: weight of the rates observed by the run
+    :param target_articles_per_run: new articles the next run should find
+    :param min_interval: fewest seconds between the starts of two runs
+    :param max_interval: most seconds between the starts of two runs
+    :return: cadence state (rates per minute, interval in seconds and the timestamp of the next run)
+    """
+    articles_per_minute, pages_per_minute = None, None
+    if state is not None:
+        articles_per_minute = state["articles_per_minute"]
+        pages_per_minute = state["pages_per_minute"]
+        minutes = (started_datetime - state["started_datetime"]) / 60
+        # the first run finds the articles of all its pages, which says nothing about how fast they arrive
+        if minutes > 0:
+            articles_per_minute = smooth(articles_per_minute, new_articles / minutes, smoothing)
+            pages_per_minute = smooth(
+                pages_per_minute, max(latest_page - state["latest_page"], 0) / minutes, smoothing
+            )
+
+    if articles_per_minute is None:
+        interval = min_interval
+    elif articles_per_minute <= 0:
+        interval = max_interval
+    else:
+        interval = min(max(target_articles_per_run / articles_per_minute * 60, min_interval), max_interval)
+
+    return {
+        "latest_page": latest_page,
+        "pages": pages,
+        "new_articles": new_articles,
+        "started_datetime": started_datetime,
+        "articles_per_minute": articles_per_minute,
+        "pages_per_minute": pages_per_minute,
+        "interval_seconds": interval,
+        "next_run_datetime": started_datetime + interval,
+    }
+
+
+def is_due(state: dict | None, now: float, tolerance: float) -> bool:
+    """
+    :param state: cadence state of the previous run (None before the first run)
+    :param now: current timestamp
+    :param tolerance: seconds before the next run from which it is due (the dag checks on a fixed tick)
+    :return: whether the next run is due
+    """
+    return state is None or now >= state["next_run_datetime"] - tolerance
+
+
+class CrawlCadenceStore:
+    """
+    cadence state of the crawls, one document per dag
+    """
+
+    def __init__(self, collection: Collection):
+        """
+        :param collection: collection holding the cadence states
+        """
+        self.collection = collection
+
+    def load(self, dag_id: str) -> dict | None:
+        """
+        :param dag_id: dag crawling the latest pages of a board
+        :return: cadence state of its last run (None before the first run)
+        """
+        return self.collection.find_one({"dag_id": dag_id}, {"_id": 0, "dag_id": 0})
+
+    def save(self, dag_id: str, state: dict):
+        """
+        :param dag_id: dag crawling the latest pages of a board
+        :param state: cadence state of its last run
+        """
+        self.collection.update_one({"dag_id": dag_id}, {"$set": state}, upsert=True)
@@ -0,0 +1,366 @@
+"""
+This module contains the asyncio crawl engine used by the ptt crawler.
+Requests are bounded by a semaphore and paced by a per-host token bucket instead of fixed sleeps. The rate of the
+buckets can follow an adaptive rate controller, which the responses feed back into. The state of the controllers is
+shared through a locked file or redis, so they are called in worker threads to keep the event loop fetching.
+"""
+import time
+import asyncio
+import aiohttp
+import urllib.parse
+from loguru import logger
+from typing import Callable, Any
+from .pipeline import ParseStage, StageStats
+from .rate_control import AimdRateController
+from .retry_policy import (
+    OUTCOME_OK,
+    OUTCOME_CLIENT_ERROR,
+    OUTCOME_CONNECTION_ERROR,
+    OUTCOME_OVER18_REDIRECT,
+    RetryPolicy,
+    AttemptRecorder,
+    classify_attempt,
+)
+
+
+class TokenBucket:
+    """
+    token bucket limiting the request rate towards a single host
+    """
+
+    def __init__(
+        self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param rate: tokens (requests) added per second
+        :param capacity: maximum number of tokens, i.e. the allowed burst
+        :param clock: monotonic clock in seconds
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self._last_refill = clock()
+        self._lock = asyncio.Lock()
+
+    def set_rate(self, rate: float):
+        """
+        :param rate: tokens (requests) added per second from now on
+        """
+        self._refill()
+        self.rate = rate
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._last_refill) * self.rate
+        )
+        self._last_refill = now
+
+    def try_acquire(self) -> float:
+        """
+        take one token if available
+        :return: 0 if a token was taken, otherwise seconds to wait until one is available
+        """
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """
+        wait until a token is available and take it (waiters are served in arrival order)
+        """
+        async with self._lock:
+            while (wait := self.try_acquire()) > 0:
+                await asyncio.sleep(wait)
+
+
+class HostPolitenessBudget:
+    """
+    one token bucket per host so that every host is paced independently
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        rate_controller: Callable[[str], AimdRateController] | None = None,
+    ):
+        """
+        :param rate: requests per second per host (without rate controller)
+        :param capacity: allowed burst per host
+        :param rate_controller: factory of the adaptive rate controller of a host (called with the host)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._rate_controller_factory = rate_controller
+        self._buckets: dict[str, TokenBucket] = {}
+        self.controllers: dict[str, AimdRateController] = {}
+
+    def bucket_for(self, url: str) -> TokenBucket:
+        """
+        get (or create) the token bucket of the url's host
+        :param url: requested url
+        :return: token bucket of the host
+        """
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(rate=self.rate, capacity=self.capacity)
+        return self._buckets[host]
+
+    def controller_for(self, url: str) -> AimdRateController | None:
+        """
+        get (or create) the adaptive rate controller of the url's host
+        :param url: requested url
+        :return: rate controller of the host (None without rate control)
+        """
+        if self._rate_controller_factory is None:
+            return None
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self.controllers:
+            self.controllers[host] = self._rate_controller_factory(host)
+        return self.controllers[host]
+
+
+class AsyncCrawlEngine:
+    """
+    keep a bounded number of requests in flight and parse finished responses while the next ones are pending
+    """
+
+    def __init__(
+        self,
+        user_agent_factory: Callable[[], str],
+        over18_data: dict,
+        max_in_flight: int,
+        requests_per_second: float,
+        burst: float,
+        retry_policy: RetryPolicy,
+        parse_stage: Callable[[], ParseStage] | None = None,
+        rate_controller: Callable[[str], AimdRateController] | None = None,
+        rate_sync_seconds: float = 1.0,
+    ):
+        """
+        :param user_agent_factory: callable returning a user agent string
+        :param over18_data: form data posted to pass the over18 check
+        :param max_in_flight: maximum number of concurrent requests
+        :param requests_per_second: allowed request rate per host (without rate controller)
+        :param burst: allowed burst per host
+        :param retry_policy: decides whether and when a failed request is retried
+        :param parse_stage: factory of the parse stage used while the engine is open (None to parse in threads)
+        :param rate_controller: factory of the adaptive rate controller of a host (None for a fixed rate)
+        :param rate_sync_seconds: seconds during which the share of the rate of a host is reused by the requests
+        """
+        self.user_agent_factory = user_agent_factory
+        self.over18_data = over18_data
+        self.max_in_flight = max_in_flight
+        self.retry_policy = retry_policy
+        self.recorder = AttemptRecorder()
+        self.budget = HostPolitenessBudget(
+            rate=requests_per_second, capacity=burst, rate_controller=rate_controller
+        )
+        self.rate_sync_seconds = rate_sync_seconds
+        self._share_synced: dict[str, float] = {}
+        self.headers = {"user-agent": user_agent_factory()}
+        self.fetch_stats = StageStats("fetch")
+        self.sleep_seconds = 0.0
+        self.parse_stage: ParseStage | None = None
+        self._thread_parse_stats = StageStats("parse")
+        self._parse_stage_factory = parse_stage
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._session: aiohttp.ClientSession | None = None
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_in_flight),
+            # unsafe: keep the over18 cookie for hosts given as ip addresses too
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            timeout=aiohttp.ClientTimeout(total=30),
+        )
+        if self._parse_stage_factory is not None:
+            self.parse_stage = self._parse_stage_factory()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+        if self.parse_stage is not None:
+            self.parse_stage.close()
+        for controller in self.budget.controllers.values():
+            await asyncio.to_thread(controller.leave)
+
+    @property
+    def parse_stats(self) -> StageStats:
+        """
+        :return: statistics of the parse stage (or of the parsing threads without parse stage)
+        """
+        return self.parse_stage.stats if self.parse_stage is not None else self._thread_parse_stats
+
+    def stage_stats(self) -> dict:
+        """
+        :return: statistics of the fetch stage and of the parse stage
+        """
+        return {**self.fetch_stats.snapshot(), **self.parse_stats.snapshot()}
+
+    def rate_stats(self) -> dict:
+        """
+        :return: state of the adaptive rate controller of every host
+        """
+        return {host: controller.snapshot() for host, controller in self.budget.controllers.items()}
+
+    async def _wait_for_token(self, url: str):
+        # waiting for the politeness budget counts as sleeping, not as network time
+        started = time.monotonic()
+        bucket = self.budget.bucket_for(url)
+        controller = self.budget.controller_for(url)
+        if controller is not None:
+            await self._sync_share(url, bucket, controller)
+        await bucket.acquire()
+        self.sleep_seconds += time.monotonic() - started
+
+    async def _sync_share(self, url: str, bucket: TokenBucket, controller: AimdRateController):
+        # the requests in between use the share already set on the bucket
+        host = urllib.parse.urlsplit(url).netloc
+        now = time.monotonic()
+        synced = self._share_synced.get(host)
+        if synced is not None and now - synced < self.rate_sync_seconds:
+            return
+        self._share_synced[host] = now
+        bucket.set_rate(await asyncio.to_thread(controller.share))
+
+    async def _attempt(self, url: str, attempt: int) -> tuple[str, int | None, str | None]:
+        await self._wait_for_token(url)
+        started = time.monotonic()
+        text, status, final_url, error, num_bytes = None, None, "", None, 0
+        try:
+            async with self._session.get(url, headers=self.headers) as response:
+                status, final_url = response.status, str(response.url)
+                num_bytes = len(await response.read())
+                text = await response.text()
+        # any client error (refused connection, truncated body, ...) is a failed attempt, retried as such
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = e
+        outcome = classify_attempt(status=status, final_url=final_url, error=error)
+        elapsed = time.monotonic() - started
+        self.recorder.record(url, attempt, outcome, status, elapsed, num_bytes)
+        controller = self.budget.controller_for(url)
+        if controller is not None:
+            await asyncio.to_thread(controller.observe, outcome, elapsed)
+        if error is not None:
+            logger.error(f"{error}: cannot connect to the server ({url}).")
+        return outcome, status, text
+
+    async def _pass_over18(self, url: str, attempt: int) -> str:
+        over18_url = urllib.parse.urljoin(url, "/ask/over18")
+        await self._wait_for_token(over18_url)
+        started = time.monotonic()
+        status, error, num_bytes = None, None, 0
+        try:
+            async with self._session.post(
+                over18_url, data=self.over18_data, headers=self.headers
+            ) as response:
+                status = response.status
+                num_bytes = len(await response.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = e
+        outcome = classify_attempt(status=status, error=error)
+        elapsed = time.monotonic() - started
+        self.recorder.record(over18_url, attempt, outcome, status, elapsed, num_bytes)
+        controller = self.budget.controller_for(over18_url)
+        if controller is not None:
+            await asyncio.to_thread(controller.observe, outcome, elapsed)
+        if error is not None:
+            logger.error(f"{error}: cannot pass the over18 check ({over18_url}).")
+        return outcome
+
+    async def fetch_text(self, url: str) -> str:
+        """
+        download a page once, retrying according to the retry policy
+        :param url: page url
+        :return: page html (pages answering with a client error are returned as they are)
+        """
+        _, text = await self.fetch_page(url)
+        return text
+
+    async def fetch_page(self, url: str) -> tuple[int, str]:
+        """
+        download a page once, retrying according to the retry policy
+        :param url: page url
+        :return: http status and page html (pages answering with a client error are returned as they are)
+        """
+        self.fetch_stats.enter()
+        started = time.monotonic()
+        wait_seconds = 0.0
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                # a slot is only held while requesting: the backoff of a failing url does not stall the other fetches
+                queued = time.monotonic()
+                async with self._semaphore:
+                    wait_seconds += time.monotonic() - queued
+                    outcome, status, text = await self._attempt(url, attempt)
+                    if outcome in (OUTCOME_OK, OUTCOME_CLIENT_ERROR):
+                        self.retry_policy.record_answer()
+                        return status, text
+                    if outcome == OUTCOME_OVER18_REDIRECT and self.retry_policy.should_retry(
+                        outcome, attempt
+                    ):
+                        # a failed over18 check is retried like a failed request
+                        outcome = await self._pass_over18(url, attempt)
+                        if outcome == OUTCOME_OK:
+                            continue
+                await self._back_off(url, outcome, attempt)
+        finally:
+            self.fetch_stats.leave(wait_seconds, time.monotonic() - started - wait_seconds)
+
+    async def _back_off(self, url: str, outcome: str, attempt: int):
+        if not self.retry_policy.should_retry(outcome, attempt):
+            raise ConnectionError(
+                f"{url}: gave up after {attempt} attempts (last outcome: {outcome})."
+            )
+        delay = self.retry_policy.backoff(outcome, attempt)
+        logger.warning(
+            f"{outcome}: {url} - retry in {delay:.1f} seconds (attempt {attempt})."
+        )
+        await asyncio.sleep(delay)
+        self.sleep_seconds += delay
+        if outcome == OUTCOME_CONNECTION_ERROR:
+            self.headers = {"user-agent": self.user_agent_factory()}
+
+    async def parse(self, parse: Callable[[str], Any], text: str) -> Any:
+        """
+        parse a page in the parse stage (or in a worker thread without parse stage) so the event loop keeps fetching
+        :param parse: function turning html into the parsing result (picklable with a parse stage)
+        :param text: page html
+        :return: parsing result
+        """
+        if self.parse_stage is not None:
+            return await self.parse_stage.parse(parse, text)
+        self._thread_parse_stats.enter()
+        started = time.monotonic()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, parse, text)
+        finally:
+            self._thread_parse_stats.leave(0.0, time.monotonic() - started)
+
+    async def fetch_and_parse(self, url: str, parse: Callable[[str], Any]) -> Any:
+        """
+        download a page once and parse it once
+        :param url: page url
+        :param parse: function turning html into the parsing result
+        :return: parsing result
+        """
+        text = await self.fetch_text(url)
+        return await self.parse(parse, text)
+
+    async def map_fetch_and_parse(
+        self, urls: list[str], parse: Callable[[str], Any]
+    ) -> list[Any]:
+        """
+        download and parse several pages concurrently
+        :param urls: page urls
+        :param parse: function turning html into the parsing result
+        :return: parsing results in the same order as urls
+        """
+        return await asyncio.gather(*(self.fetch_and_parse(url, parse) for url in urls))
@@ -0,0 +1,215 @@
+"""
+This module contains the raw html archive of the crawler. Every fetched article page is compressed and appended
+to a segment file once per distinct content (blobs are addressed by the sha256 of the html), and a sqlite index
+records which blob each article url had at each crawl time, so the articles can be parsed again without ptt.
+"""
+import os
+import zlib
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:  # zlib is used where zstandard is not installed
+    zstandard = None
+
+CODEC_ZSTD = "zstd"
+CODEC_ZLIB = "zlib"
+DEFAULT_CODEC = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 6
+SEGMENT_MAX_BYTES = 256 * 1024 * 1024
+INDEX_FILE_NAME = "index.sqlite"
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """
+    :param data: raw bytes
+    :param codec: CODEC_ZSTD or CODEC_ZLIB
+    :return: compressed bytes
+    """
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    """
+    :param data: compressed bytes
+    :param codec: codec the bytes were compressed with
+    :return: raw bytes
+    """
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("the archive contains zstd blobs: install zstandard to read them")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class HtmlArchive:
+    """
+    content-addressed archive of article pages: append-only segment files and a sqlite index
+    """
+
+    def __init__(
+        self,
+        archive_dir: str,
+        codec: str = DEFAULT_CODEC,
+        segment_max_bytes: int = SEGMENT_MAX_BYTES,
+    ):
+        """
+        :param archive_dir: directory of the segment files and the index
+        :param codec: codec of the blobs written by this archive
+        :param segment_max_bytes: size from which a new segment file is started
+        """
+        os.makedirs(archive_dir, exist_ok=True)
+        self.archive_dir = archive_dir
+        self.codec = codec
+        self.segment_max_bytes = segment_max_bytes
+        # every writer appends to its own segments, so task runs on several workers never share a file
+        self._segment_prefix = f"{datetime.now():%Y%m%d%H%M%S}-{os.getpid()}-{id(self):x}"
+        self._segment_number = 0
+        self._segment_file = None
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            os.path.join(archive_dir, INDEX_FILE_NAME), timeout=60, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                codec TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS fetches (
+                article_url TEXT NOT NULL,
+                crawled_datetime REAL NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (article_url, crawled_datetime)
+            );
+            CREATE INDEX IF NOT EXISTS fetches_by_crawled_datetime ON fetches (crawled_datetime);
+            """
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+            self._connection.close()
+
+    def _open_segment(self, size: int):
+        if (
+            self._segment_file is not None
+            and self._segment_file.tell() + size <= self.segment_max_bytes
+        ):
+            return
+        if self._segment_file is not None:
+            self._segment_file.close()
+        self._segment_number += 1
+        segment = f"{self._segment_prefix}-{self._segment_number:05d}.seg"
+        self._segment_file = open(os.path.join(self.archive_dir, segment), "ab")
+
+    def add(self, article_url: str, page_html: str, crawled_datetime: float) -> str:
+        """
+        archive a fetched article page (the content is only stored if it is not in the archive yet)
+        :param article_url: article url
+        :param page_html: html of the article page
+        :param crawled_datetime: timestamp of the fetch
+        :return: digest of the html
+        """
+        data = page_html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            stored = self._connection.execute(
+                "SELECT 1 FROM blobs WHERE digest = ?", (digest,)
+            ).fetchone()
+            if stored is None:
+                blob = compress(data, self.codec)
+                self._open_segment(len(blob))
+                offset = self._segment_file.tell()
+                self._segment_file.write(blob)
+                # the blob is on disk before the index points at it
+                self._segment_file.flush()
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?)",
+                    (
+                        digest,
+                        os.path.basename(self._segment_file.name),
+                        offset,
+                        len(blob),
+                        self.codec,
+                    ),
+                )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO fetches VALUES (?, ?, ?)",
+                (article_url, crawled_datetime, digest),
+            )
+            self._connection.commit()
+        return digest
+
+    def read(self, digest: str) -> str:
+        """
+        :param digest: digest of an archived html
+        :return: html
+        """
+        with self._lock:
+            segment, offset, length, codec = self._connection.execute(
+                "SELECT segment, offset, length, codec FROM blobs WHERE digest = ?", (digest,)
+            ).fetchone()
+        with open(os.path.join(self.archive_dir, segment), "rb") as file:
+            file.seek(offset)
+            return decompress(file.read(length), codec).decode("utf-8")
+
+    def latest_fetches(self, since: float | None = None) -> list[tuple[str, float, str]]:
+        """
+        get the latest archived page of every article
+        :param since: only articles fetched at or after this timestamp (None for all)
+        :return: article url, crawl timestamp and digest of the latest fetch of each article
+        """
+        with self._lock:
+            return self._connection.execute(
+                """
+                SELECT article_url, MAX(crawled_datetime), digest
+                FROM fetches
+                GROUP BY article_url
+                HAVING MAX(crawled_datetime) >= ?
+                ORDER BY article_url
+                """,
+                (since if since is not None else float("-inf"),),
+            ).fetchall()
+
+    def fetch_history(self, since: float | None = None) -> list[tuple[str, list[tuple[float, str]]]]:
+        """
+        get every archived page of the articles, so a bad latest page can fall back to an older one
+        :param since: only articles whose latest fetch is at or after this timestamp (None for all)
+        :return: article url and the crawl timestamp and digest of each distinct page of the article, latest first
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                """
+                SELECT article_url, MAX(crawled_datetime) AS latest_datetime, digest
+                FROM fetches
+                WHERE article_url IN (
+                    SELECT article_url FROM fetches GROUP BY article_url HAVING MAX(crawled_datetime) >= ?
+                )
+                GROUP BY article_url, digest
+                ORDER BY article_url, latest_datetime DESC
+                """,
+                (since if since is not None else float("-inf"),),
+            ).fetchall()
+        history = {}
+        for article_url, crawled_datetime, digest in rows:
+            history.setdefault(article_url, []).append((crawled_datetime, digest))
+        return list(history.items())
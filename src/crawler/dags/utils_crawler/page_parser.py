@@ -0,0 +1,245 @@
+"""
+This module contains the html backends of the crawler. A backend only extracts the raw strings of a ptt page
+(article meta values, the text of main-content, the spans of each comment and the rows of a board index);
+dag_crawling turns these strings into article dicts, so every backend produces identical results.
+The lxml backend queries the tree with XPath; the BeautifulSoup backend is the fallback.
+"""
+import lxml.html
+from lxml import etree
+from loguru import logger
+from bs4 import BeautifulSoup, SoupStrainer
+
+BACKEND_LXML = "lxml"
+BACKEND_SOUP = "bs4"
+
+
+def class_token_xpath(class_name: str) -> str:
+    """
+    :param class_name: one css class
+    :return: xpath predicate matching elements having the class (like BeautifulSoup's class_ argument)
+    """
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+ARTICLE_META_XPATH = f"//div[{class_token_xpath('article-metaline')}]"
+MAIN_CONTENT_XPATH = "//div[@id='main-content']"
+PUSH_XPATH = f"//div[{class_token_xpath('push')}]"
+PAGING_LINK_XPATH = "//a[normalize-space(@class)='btn wide']"
+INDEX_ROW_XPATH = f"//div[{class_token_xpath('r-ent')}]"
+ANNOUNCEMENT_XPATH = (
+    f"//div[{class_token_xpath('r-list-sep')}][1]/following::div[{class_token_xpath('r-ent')}]"
+)
+PUSH_SPAN_CLASSES = ("push-tag", "push-userid", "push-content", "push-ipdatetime")
+
+
+class PttPage:
+    """
+    raw strings of a parsed ptt page; subclasses implement one html backend
+    """
+
+    def article_meta_values(self) -> list[str]:
+        """
+        :return: texts of span.article-meta-value of each div.article-metaline (author, title and time)
+        """
+        raise NotImplementedError
+
+    def main_content_text(self) -> str | None:
+        """
+        :return: text of div#main-content (None if the page has none)
+        """
+        raise NotImplementedError
+
+    def comment_rows(self) -> list[dict]:
+        """
+        :return: one dict per div.push with is_warning and the texts of its spans
+                 (comment_type stripped, commenter_id, comment_content and commenter_info raw, None if missing)
+        """
+        raise NotImplementedError
+
+    def paging_links(self) -> list[str | None]:
+        """
+        :return: hrefs of the paging buttons of a board index (oldest, previous, next and latest)
+        """
+        raise NotImplementedError
+
+    def num_announcements(self) -> int:
+        """
+        :return: number of rows listed below the r-list-sep line of a board index
+        """
+        raise NotImplementedError
+
+    def index_rows(self) -> list[dict]:
+        """
+        :return: one dict per div.r-ent with href and title of its link (None if deleted) and its nrec
+        """
+        raise NotImplementedError
+
+
+def joined_stripped_text(texts) -> str:
+    """
+    :param texts: text nodes of an element
+    :return: text like BeautifulSoup's get_text(strip=True)
+    """
+    return "".join(text.strip() for text in texts if text.strip())
+
+
+class LxmlPttPage(PttPage):
+    """
+    ptt page parsed with lxml and queried with XPath
+    """
+
+    def __init__(self, page_html: str):
+        """
+        :param page_html: html of the page
+        :raises etree.ParserError: if lxml cannot build a document (e.g. empty html)
+        """
+        self.root = lxml.html.document_fromstring(page_html)
+
+    def article_meta_values(self) -> list[str]:
+        values = []
+        for meta in self.root.xpath(ARTICLE_META_XPATH):
+            value = meta.xpath(f".//span[{class_token_xpath('article-meta-value')}]")
+            values.append("".join(value[0].itertext()) if value else None)
+        return values
+
+    def main_content_text(self) -> str | None:
+        main_content = self.root.xpath(MAIN_CONTENT_XPATH)
+        # the whole text is built once and reused for every ending signal
+        return str(main_content[0].text_content()) if main_content else None
+
+    def comment_rows(self) -> list[dict]:
+        rows = []
+        for push in self.root.xpath(PUSH_XPATH):
+            texts = {}
+            for span in push.iter("span"):
+                for class_name in (span.get("class") or "").split():
+                    if class_name in PUSH_SPAN_CLASSES and class_name not in texts:
+                        texts[class_name] = list(span.itertext())
+            rows.append(
+                {
+                    "is_warning": "warning-box" in push.get("class").split(),
+                    "comment_type": joined_stripped_text(texts["push-tag"])
+                    if "push-tag" in texts
+                    else None,
+                    "commenter_id": "".join(texts["push-userid"])
+                    if "push-userid" in texts
+                    else None,
+                    "comment_content": "".join(texts["push-content"])
+                    if "push-content" in texts
+                    else None,
+                    "commenter_info": "".join(texts["push-ipdatetime"])
+                    if "push-ipdatetime" in texts
+                    else None,
+                }
+            )
+        return rows
+
+    def paging_links(self) -> list[str | None]:
+        return [link.get("href") for link in self.root.xpath(PAGING_LINK_XPATH)]
+
+    def num_announcements(self) -> int:
+        return len(self.root.xpath(ANNOUNCEMENT_XPATH))
+
+    def index_rows(self) -> list[dict]:
+        rows = []
+        for row in self.root.xpath(INDEX_ROW_XPATH):
+            link = next(row.iter("a"), None)
+            nrec = row.xpath(f".//div[{class_token_xpath('nrec')}]")
+            rows.append(
+                {
+                    "href": link.get("href") if link is not None else None,
+                    "title": joined_stripped_text(link.itertext())
+                    if link is not None
+                    else None,
+                    "nrec": joined_stripped_text(nrec[0].itertext()) if nrec else "",
+                }
+            )
+        return rows
+
+
+class SoupPttPage(PttPage):
+    """
+    ptt page parsed with BeautifulSoup
+    """
+
+    def __init__(self, soup: BeautifulSoup):
+        """
+        :param soup: bs4.BeautifulSoup of the page
+        """
+        self.soup = soup
+
+    def article_meta_values(self) -> list[str]:
+        values = []
+        for meta in self.soup.find_all("div", "article-metaline"):
+            value = meta.find("span", "article-meta-value")
+            values.append(value.get_text() if value else None)
+        return values
+
+    def main_content_text(self) -> str | None:
+        main_content = self.soup.find("div", id="main-content")
+        return main_content.get_text() if main_content else None
+
+    def comment_rows(self) -> list[dict]:
+        rows = []
+        for push in self.soup.find_all("div", "push"):
+            spans = {
+                class_name: push.find("span", class_=class_name)
+                for class_name in PUSH_SPAN_CLASSES
+            }
+            rows.append(
+                {
+                    "is_warning": "warning-box" in push.get("class"),
+                    "comment_type": spans["push-tag"].get_text(strip=True)
+                    if spans["push-tag"]
+                    else None,
+                    "commenter_id": spans["push-userid"].get_text()
+                    if spans["push-userid"]
+                    else None,
+                    "comment_content": spans["push-content"].get_text()
+                    if spans["push-content"]
+                    else None,
+                    "commenter_info": spans["push-ipdatetime"].get_text()
+                    if spans["push-ipdatetime"]
+                    else None,
+                }
+            )
+        return rows
+
+    def paging_links(self) -> list[str | None]:
+        return [link.get("href") for link in self.soup.find_all("a", "btn wide")]
+
+    def num_announcements(self) -> int:
+        sep_div = self.soup.find("div", class_="r-list-sep")
+        return len(sep_div.find_all_next("div", class_="r-ent")) if sep_div else 0
+
+    def index_rows(self) -> list[dict]:
+        rows = []
+        for row in self.soup.find_all("div", "r-ent"):
+            link = row.find("a")
+            nrec = row.find("div", "nrec")
+            rows.append(
+                {
+                    "href": link.get("href") if link else None,
+                    "title": link.get_text(strip=True) if link else None,
+                    "nrec": nrec.get_text(strip=True) if nrec else "",
+                }
+            )
+        return rows
+
+
+def load_page(
+    page_html: str, backend: str = BACKEND_LXML, soup_strainer: SoupStrainer | None = None
+) -> PttPage:
+    """
+    parse a ptt page with the chosen backend, falling back to BeautifulSoup if lxml cannot build a document
+    :param page_html: html of the page
+    :param backend: BACKEND_LXML or BACKEND_SOUP
+    :param soup_strainer: part of the page to build (only used by the BeautifulSoup backend)
+    :return: parsed page
+    """
+    if backend == BACKEND_LXML:
+        try:
+            return LxmlPttPage(page_html)
+        except etree.ParserError as e:
+            logger.debug(f"{e}: fall back to BeautifulSoup")
+    return SoupPttPage(BeautifulSoup(page_html, "lxml", parse_only=soup_strainer))
@@ -0,0 +1,172 @@
+"""
+This module contains the stages of the crawl pipeline next to the fetch stage of the crawl engine: a parse stage
+running the parsers in a process pool and a write stage running the bulk writes in a thread. Each stage is
+bounded, so a slow stage makes the previous one wait instead of piling up pages, and keeps timing statistics
+showing which stage limits the throughput.
+"""
+import time
+import asyncio
+from typing import Callable, Any
+from concurrent.futures import Executor, ProcessPoolExecutor
+from .bulk_writer import ArticleBulkWriter
+
+
+class StageStats:
+    """
+    items, busy and waiting seconds and queue depth of a pipeline stage
+    """
+
+    def __init__(self, name: str):
+        """
+        :param name: name of the stage (prefix of the statistics)
+        """
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.depth = 0
+        self.max_depth = 0
+
+    def enter(self):
+        """
+        an item is queued for the stage
+        """
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+
+    def leave(self, wait_seconds: float, busy_seconds: float):
+        """
+        an item went through the stage
+        :param wait_seconds: seconds the item waited for the stage
+        :param busy_seconds: seconds the stage worked on the item
+        """
+        self.depth -= 1
+        self.items += 1
+        self.wait_seconds += wait_seconds
+        self.busy_seconds += busy_seconds
+
+    def snapshot(self) -> dict:
+        """
+        :return: statistics prefixed with the stage name
+        """
+        return {
+            f"{self.name}_items": self.items,
+            f"{self.name}_busy_seconds": round(self.busy_seconds, 3),
+            f"{self.name}_wait_seconds": round(self.wait_seconds, 3),
+            f"{self.name}_queue_depth": self.depth,
+            f"{self.name}_max_queue_depth": self.max_depth,
+        }
+
+
+class ParseStage:
+    """
+    run parsers in a pool of processes, with at most max_pending pages handed over at once
+    """
+
+    def __init__(self, workers: int, max_pending: int, executor: Executor | None = None):
+        """
+        :param workers: number of parsing processes
+        :param max_pending: pages queued or being parsed before the fetchers have to wait
+        :param executor: executor replacing the process pool (e.g. in tests)
+        """
+        self.executor = executor or ProcessPoolExecutor(max_workers=workers)
+        self.stats = StageStats("parse")
+        self._slots = asyncio.Semaphore(max_pending)
+
+    async def parse(self, parse: Callable[[str], Any], page_html: str) -> Any:
+        """
+        :param parse: picklable function turning html into the parsing result
+        :param page_html: html of the page
+        :return: parsing result
+        """
+        self.stats.enter()
+        queued = time.monotonic()
+        async with self._slots:
+            started = time.monotonic()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.executor, parse, page_html
+                )
+            finally:
+                self.stats.leave(started - queued, time.monotonic() - started)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class WriteStage:
+    """
+    run the bulk writes of an ArticleBulkWriter in a thread while the next pages are crawled. once a write fails, the
+    batches queued after it are neither written nor called back (their callbacks would mark as done pages that come
+    after an unwritten one), and the stage raises the error instead of taking more pages
+    """
+
+    def __init__(self, writer: ArticleBulkWriter, max_pending_batches: int = 2):
+        """
+        :param writer: writer collecting the operations of the pages
+        :param max_pending_batches: batches queued or being written before the crawl has to wait
+        """
+        self.writer = writer
+        self.stats = StageStats("write")
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending_batches)
+        self._on_written: Callable[[], Any] | None = None
+        self._error: BaseException | None = None
+        self._consumer: asyncio.Task | None = None
+
+    async def __aenter__(self):
+        self._consumer = asyncio.create_task(self._consume())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # what was crawled before a failure is written as well
+        try:
+            await self.flush()
+        finally:
+            self._consumer.cancel()
+
+    async def _consume(self):
+        while True:
+            operations, on_written, queued = await self._queue.get()
+            started = time.monotonic()
+            try:
+                if self._error is None:
+                    if operations:
+                        await asyncio.to_thread(self.writer.write_operations, operations)
+                    if on_written is not None:
+                        await asyncio.to_thread(on_written)
+            except Exception as e:
+                self._error = e
+            finally:
+                self.stats.leave(started - queued, time.monotonic() - started)
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    async def _submit(self):
+        self._raise_error()
+        on_written, self._on_written = self._on_written, None
+        self.stats.enter()
+        await self._queue.put((self.writer.take_operations(), on_written, time.monotonic()))
+
+    async def page_done(self, on_written: Callable[[], Any] | None = None):
+        """
+        mark the end of a page and hand the window over to the writing thread if it is full
+        :param on_written: called once the operations up to this page are written (replaces the previous one)
+        """
+        self._raise_error()
+        self._on_written = on_written or self._on_written
+        self.writer.pages_since_flush += 1
+        if self.writer.pages_since_flush >= self.writer.flush_every_pages:
+            await self._submit()
+
+    async def flush(self):
+        """
+        hand over the remaining operations and wait until everything is written
+        """
+        self._raise_error()
+        if self.writer.operations or self._on_written is not None:
+            await self._submit()
+        await self._queue.join()
+        self._raise_error()
@@ -0,0 +1,119 @@
+"""
+This module contains the conversion of ptt times (the article time and the MM/DD HH:MM of the comments) into
+epoch seconds. Well-formed times are converted with integer arithmetic from the start of their day in Taipei,
+which is looked up once per day; any other input goes through datetime.strptime and pytz as before, so
+malformed times are accepted or rejected exactly as they used to be.
+"""
+import re
+import calendar
+import functools
+import pytz
+from datetime import date, datetime
+
+TAIPEI_TIMEZONE = pytz.timezone("Asia/Taipei")
+ARTICLE_TIME_FORMAT = "%a %b %d %H:%M:%S %Y"
+COMMENT_TIME_FORMAT = "%Y-%m-%d %H:%M"
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+ARTICLE_TIME_PATTERN = re.compile(
+    r"([A-Za-z]{3})\s+([A-Za-z]{3})\s+([0-9]{1,2})\s+([0-9]{1,2}):([0-9]{1,2}):([0-9]{1,2})\s+([0-9]{4})"
+)
+COMMENT_YEAR_PATTERN = re.compile(r"[0-9]{4}")
+COMMENT_DATE_PART_PATTERN = re.compile(r"[0-9]{1,2}")
+COMMENT_TIME_PATTERN = re.compile(r"([0-9]{1,2}):([0-9]{1,2})")
+# names of the locale, as datetime.strptime uses them
+WEEKDAY_ABBREVIATIONS = frozenset(calendar.day_abbr)
+MONTH_NUMBERS = {name: number for number, name in enumerate(calendar.month_abbr) if name}
+
+
+@functools.lru_cache(maxsize=4096)
+def taipei_day_start(year: int, month: int, day: int) -> int | None:
+    """
+    :param year: year
+    :param month: month
+    :param day: day of the month
+    :return: epoch seconds of 00:00 of the day in Taipei (None if the utc offset changes during the day)
+    :raises ValueError: if the date does not exist
+    """
+    first_minute = TAIPEI_TIMEZONE.localize(datetime(year, month, day))
+    last_minute = TAIPEI_TIMEZONE.localize(datetime(year, month, day, 23, 59))
+    if first_minute.utcoffset() != last_minute.utcoffset():
+        return None
+    days = date(year, month, day).toordinal() - EPOCH_ORDINAL
+    return days * 86400 - int(first_minute.utcoffset().total_seconds())
+
+
+def taipei_timestamp(
+    year: int, month: int, day: int, hour: int, minute: int, second: int = 0
+) -> float:
+    """
+    :return: epoch seconds of a wall clock time in Taipei (same as TAIPEI_TIMEZONE.localize(...).timestamp())
+    :raises ValueError: if the date does not exist
+    """
+    day_start = taipei_day_start(year, month, day)
+    if day_start is None:
+        return TAIPEI_TIMEZONE.localize(
+            datetime(year, month, day, hour, minute, second)
+        ).timestamp()
+    return float(day_start + hour * 3600 + minute * 60 + second)
+
+
+def _strptime_article_time(article_time: str) -> tuple[datetime, float]:
+    article_datetime = datetime.strptime(article_time, ARTICLE_TIME_FORMAT)
+    return article_datetime, TAIPEI_TIMEZONE.localize(article_datetime).timestamp()
+
+
+def parse_article_time(article_time: str) -> tuple[datetime, float]:
+    """
+    :param article_time: article time, e.g. Fri Sep  8 10:26:08 2023
+    :return: naive datetime of the article time and its epoch seconds in Taipei
+    :raises ValueError: if datetime.strptime cannot parse the article time
+    """
+    match = ARTICLE_TIME_PATTERN.fullmatch(article_time)
+    if (
+        match is None
+        or match[1] not in WEEKDAY_ABBREVIATIONS
+        or match[2] not in MONTH_NUMBERS
+    ):
+        return _strptime_article_time(article_time)
+
+    day, hour, minute, second, year = (int(value) for value in match.groups()[2:])
+    if not (1 <= day <= 31 and hour <= 23 and minute <= 59 and second <= 59):
+        return _strptime_article_time(article_time)
+    month = MONTH_NUMBERS[match[2]]
+    return (
+        datetime(year, month, day, hour, minute, second),
+        taipei_timestamp(year, month, day, hour, minute, second),
+    )
+
+
+def _strptime_comment_time(year: str, month: str, day: str, comment_time: str) -> float:
+    comment_datetime = datetime.strptime(
+        f"{year}-{month}-{day} {comment_time}", COMMENT_TIME_FORMAT
+    )
+    return TAIPEI_TIMEZONE.localize(comment_datetime).timestamp()
+
+
+def parse_comment_time(year: str, month: str, day: str, comment_time: str) -> float:
+    """
+    :param year: year of the article (the comments do not show it)
+    :param month: month shown by the comment
+    :param day: day shown by the comment
+    :param comment_time: HH:MM shown by the comment
+    :return: epoch seconds of the comment minute in Taipei
+    :raises ValueError: if datetime.strptime cannot parse the comment time
+    """
+    time_match = COMMENT_TIME_PATTERN.fullmatch(comment_time)
+    if (
+        time_match is None
+        or COMMENT_YEAR_PATTERN.fullmatch(year) is None
+        or COMMENT_DATE_PART_PATTERN.fullmatch(month) is None
+        or COMMENT_DATE_PART_PATTERN.fullmatch(day) is None
+    ):
+        return _strptime_comment_time(year, month, day, comment_time)
+
+    month_number, day_number = int(month), int(day)
+    hour, minute = int(time_match[1]), int(time_match[2])
+    if not (1 <= month_number <= 12 and 1 <= day_number <= 31 and hour <= 23 and minute <= 59):
+        return _strptime_comment_time(year, month, day, comment_time)
+    return taipei_timestamp(int(year), month_number, day_number, hour, minute)
@@ -0,0 +1,234 @@
+"""
+This module contains the adaptive rate control of the crawler. The request rate towards a host grows additively
+while responses are healthy. It is cut multiplicatively on server errors, throttling, connection errors or
+latency spikes (AIMD). The state of a host is a small json file (or a redis key, to share it between machines),
+so all the crawl tasks share one rate and each one gets a share of it in proportion to its weight.
+"""
+import os
+import json
+import time
+import fcntl
+import socket
+import threading
+from typing import Callable
+from loguru import logger
+from .retry_policy import (
+    OUTCOME_OK,
+    OUTCOME_CLIENT_ERROR,
+    OUTCOME_SERVER_ERROR,
+    OUTCOME_THROTTLED,
+    OUTCOME_CONNECTION_ERROR,
+)
+
+SIGNAL_LATENCY_SPIKE = "latency_spike"
+CONGESTION_OUTCOMES = {OUTCOME_SERVER_ERROR, OUTCOME_THROTTLED, OUTCOME_CONNECTION_ERROR}
+HEALTHY_OUTCOMES = {OUTCOME_OK, OUTCOME_CLIENT_ERROR}
+LATENCY_SMOOTHING = 0.1
+MEMBER_TTL = 60.0
+MAX_LOGGED_BACKOFFS = 20
+
+
+class AimdRateController:
+    """
+    additive increase, multiplicative decrease of the request rate towards one host
+    """
+
+    def __init__(
+        self,
+        initial_rate: float,
+        min_rate: float,
+        max_rate: float,
+        increase_per_second: float,
+        decrease_factor: float,
+        decrease_cooldown: float,
+        latency_spike_factor: float,
+        latency_spike_min_seconds: float,
+        state_path: str | None = None,
+        clock: Callable[[], float] = time.time,
+        weight: float = 1.0,
+        redis_client=None,
+        redis_key: str | None = None,
+    ):
+        """
+        :param initial_rate: requests per second of the host when no task has a state yet
+        :param min_rate: lowest requests per second of the host
+        :param max_rate: highest requests per second of the host
+        :param increase_per_second: requests per second added for every second of healthy responses
+        :param decrease_factor: factor applied to the rate on congestion (e.g. 0.5 halves it)
+        :param decrease_cooldown: seconds after a decrease during which congestion does not cut the rate again
+        :param latency_spike_factor: a response slower than this many times the usual latency is a spike
+        :param latency_spike_min_seconds: responses faster than this are never a spike
+        :param state_path: json file shared by the tasks of the machine (None to keep the state in memory)
+        :param clock: wall clock in seconds (shared by the processes)
+        :param weight: share of the rate this task gets relative to the other active tasks
+        :param redis_client: redis client holding the state shared by the tasks of all the machines (instead of state_path)
+        :param redis_key: key of the state in redis
+        """
+        self.initial_rate = min(max(initial_rate, min_rate), max_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_per_second = increase_per_second
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.latency_spike_factor = latency_spike_factor
+        self.latency_spike_min_seconds = latency_spike_min_seconds
+        self.state_path = state_path
+        self.weight = weight
+        self.redis_client = redis_client
+        self.redis_key = redis_key
+        self.member_id = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self.increases = 0
+        self.decreases = 0
+        self.backoffs: list[dict] = []
+        self._clock = clock
+        self._state: dict | None = None
+        # the crawl engine calls the controller from worker threads
+        self._lock = threading.Lock()
+        if state_path is not None:
+            os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+
+    def _initial_state(self) -> dict:
+        return {"rate": self.initial_rate, "latency": None, "last_decrease": None, "members": {}}
+
+    def _load_state(self, content: str | None) -> dict:
+        try:
+            return json.loads(content) if content else self._initial_state()
+        except json.JSONDecodeError:
+            return self._initial_state()
+
+    def _update(self, change: Callable[[dict, float], object]) -> object:
+        with self._lock:
+            return self._locked_update(change)
+
+    def _locked_update(self, change: Callable[[dict, float], object]) -> object:
+        now = self._clock()
+        if self.redis_client is not None:
+
+            def change_watched_state(pipeline) -> object:
+                state = self._load_state(pipeline.get(self.redis_key))
+                result = change(state, now)
+                pipeline.multi()
+                pipeline.set(self.redis_key, json.dumps(state))
+                return result
+
+            # the change runs again if another task changed the state in the meantime
+            return self.redis_client.transaction(
+                change_watched_state, self.redis_key, value_from_callable=True
+            )
+
+        if self.state_path is None:
+            if self._state is None:
+                self._state = self._initial_state()
+            return change(self._state, now)
+
+        with open(self.state_path, "a+", encoding="utf-8") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            file.seek(0)
+            state = self._load_state(file.read())
+            result = change(state, now)
+            file.seek(0)
+            file.truncate()
+            file.write(json.dumps(state))
+        return result
+
+    def share(self) -> float:
+        """
+        register this task as crawling the host
+        :return: requests per second this task may send (the rate of the host split among its active tasks
+            in proportion to their weights)
+        """
+
+        def take_share(state: dict, now: float) -> float:
+            members = state["members"]
+            members[self.member_id] = {"seen": now, "weight": self.weight}
+            for member_id, member in list(members.items()):
+                # members registered before weights were shared (a bare timestamp) register again on their next share
+                if not isinstance(member, dict) or now - member["seen"] > MEMBER_TTL:
+                    del members[member_id]
+            total_weight = sum(member["weight"] for member in members.values())
+            return state["rate"] * self.weight / total_weight
+
+        return self._update(take_share)
+
+    def leave(self):
+        """
+        stop counting this task among the tasks crawling the host
+        """
+        self._update(lambda state, now: state["members"].pop(self.member_id, None))
+
+    def observe(self, outcome: str, latency: float) -> str | None:
+        """
+        adapt the rate to the outcome of a request
+        :param outcome: one of the OUTCOME_* constants
+        :param latency: seconds the request took
+        :return: congestion signal that cut the rate (None if the rate was not cut)
+        """
+        if outcome in CONGESTION_OUTCOMES:
+            signal = outcome
+        elif outcome in HEALTHY_OUTCOMES:
+            signal = None
+        else:
+            # e.g. the over18 redirect says nothing about the health of the host
+            return None
+
+        def adapt(state: dict, now: float) -> str | None:
+            usual_latency = state["latency"]
+            if (
+                signal is None
+                and usual_latency is not None
+                and latency > max(self.latency_spike_min_seconds, usual_latency * self.latency_spike_factor)
+            ):
+                congestion = SIGNAL_LATENCY_SPIKE
+            else:
+                congestion = signal
+
+            if congestion is None:
+                state["latency"] = (
+                    latency
+                    if usual_latency is None
+                    else usual_latency + LATENCY_SMOOTHING * (latency - usual_latency)
+                )
+                # every response adds increase_per_second / rate, i.e. increase_per_second per second
+                state["rate"] = min(
+                    self.max_rate, state["rate"] + self.increase_per_second / state["rate"]
+                )
+                self.increases += 1
+                return None
+
+            # the responses of the requests in flight reflect the same congestion: cut once per cooldown
+            last_decrease = state["last_decrease"]
+            if last_decrease is not None and now - last_decrease < self.decrease_cooldown:
+                return None
+            previous_rate = state["rate"]
+            state["rate"] = max(self.min_rate, previous_rate * self.decrease_factor)
+            state["last_decrease"] = now
+            self.decreases += 1
+            backoff = {
+                "signal": congestion,
+                "latency": round(latency, 3),
+                "rate_before": round(previous_rate, 3),
+                "rate_after": round(state["rate"], 3),
+            }
+            if len(self.backoffs) < MAX_LOGGED_BACKOFFS:
+                self.backoffs.append(backoff)
+            logger.warning(f"Rate control back-off: {backoff}")
+            return congestion
+
+        return self._update(adapt)
+
+    def snapshot(self) -> dict:
+        """
+        :return: current rate of the host, active tasks and the increases and back-offs made by this task
+        """
+
+        def read(state: dict, now: float) -> dict:
+            return {"rate": state["rate"], "members": len(state["members"])}
+
+        state = self._update(read)
+        return {
+            "rate_requests_per_second": round(state["rate"], 3),
+            "rate_active_tasks": state["members"],
+            "rate_increases": self.increases,
+            "rate_decreases": self.decreases,
+            "rate_backoffs": self.backoffs,
+        }
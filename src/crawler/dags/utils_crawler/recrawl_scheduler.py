@@ -0,0 +1,136 @@
+"""
+This module contains the recrawl scheduler. Every fetch of an article records how fast its comments grow
+(comments per hour, smoothed over the fetches). The velocity decays with a half-life, so the priority of an
+article is the number of comments it is expected to have received since its last fetch, whatever page it is on.
+"""
+import math
+import heapq
+
+VELOCITY_SMOOTHING = 0.5
+MIN_OBSERVATION_HOURS = 1 / 60
+
+
+def decayed_velocity(recrawl_state: dict, now: float, half_life: float) -> float:
+    """
+    :param recrawl_state: recrawl state stored with the article
+    :param now: current timestamp
+    :param half_life: seconds after which the observed velocity counts half
+    :return: comments per hour expected now
+    """
+    elapsed = max(now - recrawl_state["observed_datetime"], 0)
+    return recrawl_state["velocity"] * 0.5 ** (elapsed / half_life)
+
+
+def observe_velocity(
+    recrawl_state: dict | None,
+    num_of_comment: int,
+    observed_datetime: float,
+    article_time: float | None,
+    half_life: float,
+) -> dict:
+    """
+    build the recrawl state of an article that has just been fetched
+    :param recrawl_state: recrawl state stored with the article (None if it was never observed)
+    :param num_of_comment: number of comments now
+    :param observed_datetime: timestamp of the fetch
+    :param article_time: timestamp of the article (None if it could not be parsed)
+    :param half_life: seconds after which an observed velocity counts half
+    :return: recrawl state (velocity in comments per hour, number of comments and timestamp of the observation)
+    """
+    if recrawl_state is None:
+        # first observation: the comments were written since the article was posted
+        if article_time is None:
+            velocity = 0.0
+        else:
+            hours = max((observed_datetime - article_time) / 3600, MIN_OBSERVATION_HOURS)
+            velocity = num_of_comment / hours
+    else:
+        hours = max(
+            (observed_datetime - recrawl_state["observed_datetime"]) / 3600,
+            MIN_OBSERVATION_HOURS,
+        )
+        new_comments = max(num_of_comment - recrawl_state["num_of_comment"], 0)
+        velocity = VELOCITY_SMOOTHING * new_comments / hours + (
+            1 - VELOCITY_SMOOTHING
+        ) * decayed_velocity(recrawl_state, observed_datetime, half_life)
+
+    return {
+        "velocity": velocity,
+        "num_of_comment": num_of_comment,
+        "observed_datetime": observed_datetime,
+    }
+
+
+def recrawl_priority(recrawl_state: dict, now: float, half_life: float) -> float:
+    """
+    :param recrawl_state: recrawl state stored with the article
+    :param now: current timestamp
+    :param half_life: seconds after which an observed velocity counts half
+    :return: number of comments expected since the last fetch (the decaying velocity integrated over the time)
+    """
+    elapsed = max(now - recrawl_state["observed_datetime"], 0)
+    return (
+        recrawl_state["velocity"]
+        * half_life
+        / 3600
+        / math.log(2)
+        * (1 - 0.5 ** (elapsed / half_life))
+    )
+
+
+class RecrawlScheduler:
+    """
+    priority queue of articles handing out a fixed request budget per run to the highest priorities
+    """
+
+    def __init__(
+        self,
+        request_budget: int,
+        half_life: float,
+        max_article_age: float,
+        min_expected_comments: float = 1.0,
+    ):
+        """
+        :param request_budget: number of articles recrawled per run
+        :param half_life: seconds after which an observed velocity counts half
+        :param max_article_age: seconds after posting from which articles are not recrawled any more
+        :param min_expected_comments: articles expected to have fewer new comments are not recrawled
+        """
+        self.request_budget = request_budget
+        self.half_life = half_life
+        self.max_article_age = max_article_age
+        self.min_expected_comments = min_expected_comments
+        self._queue: list[tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def push(
+        self, article_url: str, recrawl_state: dict, article_time: float | None, now: float
+    ) -> float:
+        """
+        queue an article if it is worth a request
+        :param article_url: article url
+        :param recrawl_state: recrawl state stored with the article
+        :param article_time: timestamp of the article (None if it could not be parsed)
+        :param now: current timestamp
+        :return: priority of the article (0 if it was not queued)
+        """
+        if article_time is not None and now - article_time > self.max_article_age:
+            return 0.0
+        priority = recrawl_priority(recrawl_state, now, self.half_life)
+        if priority < self.min_expected_comments:
+            return 0.0
+        heapq.heappush(self._queue, (-priority, article_url))
+        return priority
+
+    def pop_batch(self) -> list[tuple[str, float]]:
+        """
+        take the articles of this run
+        :return: article urls and priorities, highest priority first, at most request_budget of them
+        """
+        batch = []
+        while self._queue and len(batch) < self.request_budget:
+            negative_priority, article_url = heapq.heappop(self._queue)
+            batch.append((article_url, -negative_priority))
+        return batch
@@ -0,0 +1,141 @@
+"""
+This module contains the reparse job: the latest archived page of every article is parsed again with a process
+pool and the new article_data is set on the stored article, so a parser fix is applied to history without crawling.
+A page that does not parse as an article (e.g. the error page of an article deleted since) is passed over for an
+older page of the article, and articles without any such page are left as they are.
+Run from src/crawler/dags with: python -m utils_crawler.reparse --board gossip
+"""
+import os
+import time
+import argparse
+from typing import Callable
+from loguru import logger
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from concurrent.futures import ProcessPoolExecutor
+from .html_archive import HtmlArchive
+
+REPARSE_CHUNK_SIZE = 200
+REPARSE_WRITE_BATCH = 1000
+
+_worker_archive: HtmlArchive | None = None
+_worker_parse: Callable[[str], dict] | None = None
+
+
+def _init_worker(archive_dir: str, parse: Callable[[str], dict]):
+    global _worker_archive, _worker_parse
+    _worker_archive = HtmlArchive(archive_dir)
+    _worker_parse = parse
+
+
+def is_article_data(article_data: dict) -> bool:
+    """
+    :param article_data: parsing result of an archived page
+    :return: whether the page parsed as an article (it has a title and a time)
+    """
+    return bool(article_data.get("title")) and article_data.get("time") is not None
+
+
+def _reparse_chunk(
+    fetch_history: list[tuple[str, list[tuple[float, str]]]]
+) -> list[tuple[str, dict | None]]:
+    """
+    :param fetch_history: article url and the crawl timestamp and digest of its archived pages, latest first
+    :return: article url and article_data of its latest page parsing as an article (None if no page does)
+    """
+    results = []
+    for article_url, fetches in fetch_history:
+        result = None
+        for crawled_datetime, digest in fetches:
+            article_data = _worker_parse(_worker_archive.read(digest))
+            if is_article_data(article_data):
+                # the data is as old as the page it was parsed from
+                article_data["last_crawled_datetime"] = crawled_datetime
+                result = article_data
+                break
+        results.append((article_url, result))
+    return results
+
+
+def reparse_archive(
+    archive_dir: str,
+    collection: Collection,
+    parse: Callable[[str], dict],
+    since: float | None = None,
+    workers: int | None = None,
+    chunk_size: int = REPARSE_CHUNK_SIZE,
+    write_batch: int = REPARSE_WRITE_BATCH,
+) -> dict:
+    """
+    rebuild the article_data of the archived articles and set it on the stored articles (no article is created)
+    :param archive_dir: directory of the html archive
+    :param collection: collection of the board
+    :param parse: function turning an article page into article_data (picklable, e.g. parse_article_html)
+    :param since: only articles fetched at or after this timestamp (None for all)
+    :param workers: number of processes (None for the number of cpus)
+    :param chunk_size: articles parsed per task of the pool
+    :param write_batch: updates written with one bulk_write
+    :return: reparse report (articles, skipped articles without a page parsing as an article, matched, modified and
+        seconds)
+    """
+    start = time.perf_counter()
+    with HtmlArchive(archive_dir) as archive:
+        fetch_history = archive.fetch_history(since=since)
+    chunks = [fetch_history[i: i + chunk_size] for i in range(0, len(fetch_history), chunk_size)]
+
+    report = {"articles": len(fetch_history), "skipped": 0, "matched": 0, "modified": 0}
+    operations = []
+
+    def write():
+        result = collection.bulk_write(operations, ordered=False)
+        report["matched"] += result.matched_count
+        report["modified"] += result.modified_count
+        operations.clear()
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(archive_dir, parse)
+    ) as executor:
+        for results in executor.map(_reparse_chunk, chunks):
+            for article_url, article_data in results:
+                if article_data is None:
+                    report["skipped"] += 1
+                    logger.warning(f"No archived page of {article_url} parses as an article, it is left as it is.")
+                    continue
+                # the crawl state (page index, index signal and recrawl state) only exists on crawled articles
+                operations.append(
+                    UpdateOne(
+                        {"article_url": article_url},
+                        {"$set": {"article_data": article_data}},
+                        upsert=False,
+                    )
+                )
+            if len(operations) >= write_batch:
+                write()
+    if operations:
+        write()
+
+    report["seconds"] = round(time.perf_counter() - start, 2)
+    logger.info(f"Reparse of {archive_dir} into {collection.name}: {report}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="parse the archived ptt pages again")
+    parser.add_argument("--board", required=True, help="collection of the board (gossip or politics)")
+    parser.add_argument("--archive-dir", default=os.getenv("PTT_HTML_ARCHIVE_DIR"))
+    parser.add_argument("--since", type=float, default=None, help="timestamp of the oldest fetch")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    if not args.archive_dir:
+        parser.error("--archive-dir or PTT_HTML_ARCHIVE_DIR is required")
+
+    from dag_crawling import get_db, parse_article_html, setup_task_logging
+
+    setup_task_logging()
+    reparse_archive(
+        args.archive_dir,
+        get_db()[args.board],
+        parse_article_html,
+        since=args.since,
+        workers=args.workers,
+    )
@@ -0,0 +1,210 @@
+"""
+This module contains the retry policies of the crawl engine and the records of every request attempt.
+"""
+import random
+from collections import Counter
+
+OUTCOME_OK = "ok"
+OUTCOME_CLIENT_ERROR = "client_error"
+OUTCOME_SERVER_ERROR = "server_error"
+OUTCOME_THROTTLED = "throttled"
+OUTCOME_CONNECTION_ERROR = "connection_error"
+OUTCOME_OVER18_REDIRECT = "over18_redirect"
+
+RETRYABLE_OUTCOMES = {
+    OUTCOME_SERVER_ERROR,
+    OUTCOME_THROTTLED,
+    OUTCOME_CONNECTION_ERROR,
+    OUTCOME_OVER18_REDIRECT,
+}
+
+
+def classify_attempt(
+    status: int | None = None, final_url: str = "", error: Exception | None = None
+) -> str:
+    """
+    classify the outcome of one request attempt
+    :param status: http status code (None if no response was received)
+    :param final_url: url after redirects
+    :param error: exception raised by the attempt
+    :return: one of the OUTCOME_* constants
+    """
+    if error is not None or status is None:
+        return OUTCOME_CONNECTION_ERROR
+    if "over18" in final_url:
+        return OUTCOME_OVER18_REDIRECT
+    if status >= 500:
+        return OUTCOME_SERVER_ERROR
+    if status == 429:
+        return OUTCOME_THROTTLED
+    if status >= 400:
+        return OUTCOME_CLIENT_ERROR
+    return OUTCOME_OK
+
+
+class RetryBudget:
+    """
+    retries a task run may spend: a reserve refilled by a fraction of a retry per answered request, so a struggling
+    server is not hammered page after page while a long run keeps retrying its occasional failures
+    """
+
+    def __init__(self, retry_ratio: float, reserve: float):
+        """
+        :param retry_ratio: retries earned by every answered request
+        :param reserve: retries available at the start of the run, and the most that can be saved up
+        """
+        self.retry_ratio = retry_ratio
+        self.reserve = reserve
+        self.tokens = reserve
+        self.spent = 0
+
+    def deposit(self):
+        """
+        earn the retries of one answered request
+        """
+        self.tokens = min(self.reserve, self.tokens + self.retry_ratio)
+
+    def try_spend(self) -> bool:
+        """
+        spend one retry
+        :return: True if the budget allowed it, False if it is exhausted
+        """
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        self.spent += 1
+        return True
+
+
+class RetryPolicy:
+    """
+    base retry policy: never retry
+    """
+
+    def should_retry(self, outcome: str, attempt: int) -> bool:
+        """
+        :param outcome: outcome of the failed attempt
+        :param attempt: number of attempts made so far (starting at 1)
+        :return: True if another attempt should be made
+        """
+        return False
+
+    def record_answer(self):
+        """
+        called for every request answered by the server (ok or client error)
+        """
+
+    def backoff(self, outcome: str, attempt: int) -> float:
+        """
+        :param outcome: outcome of the failed attempt
+        :param attempt: number of attempts made so far (starting at 1)
+        :return: seconds to wait before the next attempt
+        """
+        return 0.0
+
+
+class ExponentialBackoffRetryPolicy(RetryPolicy):
+    """
+    retry retryable outcomes with exponential backoff, full jitter and a shared retry budget
+    """
+
+    def __init__(
+        self,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+        budget: RetryBudget,
+        rng: random.Random | None = None,
+    ):
+        """
+        :param max_attempts: maximum attempts per url
+        :param base_delay: backoff of the first retry in seconds
+        :param max_delay: upper bound of the backoff in seconds
+        :param budget: retry budget shared by the task run
+        :param rng: random generator used for the jitter
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.rng = rng or random.Random()
+
+    def should_retry(self, outcome: str, attempt: int) -> bool:
+        if outcome not in RETRYABLE_OUTCOMES or attempt >= self.max_attempts:
+            return False
+        # passing the over18 check is part of the normal flow, not a failure
+        if outcome == OUTCOME_OVER18_REDIRECT:
+            return True
+        return self.budget.try_spend()
+
+    def record_answer(self):
+        self.budget.deposit()
+
+    def backoff(self, outcome: str, attempt: int) -> float:
+        if outcome == OUTCOME_OVER18_REDIRECT:
+            return 0.0
+        return self.rng.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+
+
+class AttemptRecorder:
+    """
+    keep the outcome of every request attempt of a task run
+    """
+
+    def __init__(self):
+        self.attempts: list[dict] = []
+
+    def record(
+        self,
+        url: str,
+        attempt: int,
+        outcome: str,
+        status: int | None,
+        elapsed: float,
+        num_bytes: int = 0,
+    ):
+        """
+        :param url: requested url
+        :param attempt: attempt number of the url (starting at 1)
+        :param outcome: one of the OUTCOME_* constants
+        :param status: http status code (None if no response was received)
+        :param elapsed: seconds spent on the attempt
+        :param num_bytes: size of the response body
+        """
+        self.attempts.append(
+            {
+                "url": url,
+                "attempt": attempt,
+                "outcome": outcome,
+                "status": status,
+                "elapsed": elapsed,
+                "bytes": num_bytes,
+            }
+        )
+
+    def summary(self, since: int = 0) -> dict:
+        """
+        summarize attempts recorded after a given position
+        :param since: position returned by len(recorder.attempts) earlier
+        :return: number of requests, retries and outcomes
+        """
+        attempts = self.attempts[since:]
+        return {
+            "requests": len(attempts),
+            "retries": sum(1 for attempt in attempts if attempt["attempt"] > 1),
+            "outcomes": dict(Counter(attempt["outcome"] for attempt in attempts)),
+        }
+
+    def traffic(self, since: int = 0) -> dict:
+        """
+        sum the network time and the downloaded bytes of attempts recorded after a given position
+        :param since: position returned by len(recorder.attempts) earlier
+        :return: seconds spent on requests and bytes downloaded
+        """
+        attempts = self.attempts[since:]
+        return {
+            "seconds": sum(attempt["elapsed"] for attempt in attempts),
+            "bytes": sum(attempt["bytes"] for attempt in attempts),
+        }
@@ -0,0 +1,327 @@
+"""
+This module contains the crawl telemetry: the time every page spent on the network, sleeping (politeness waits
+and retry backoffs), parsing and in mongodb, with the bytes downloaded, the retries and the db operations. Pages
+are observed into histograms that are accumulated across task runs in a metrics directory and rendered in the
+prometheus text format, which the metrics server below exposes to the monitoring agent.
+Serve the metrics from src/crawler/dags with: python -m utils_crawler.telemetry --metrics-dir ../metrics
+"""
+import os
+import json
+import time
+import fcntl
+import bisect
+import argparse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .crawl_engine import AsyncCrawlEngine
+from .bulk_writer import ArticleBulkWriter
+
+STAGE_NETWORK = "network"
+STAGE_SLEEP = "sleep"
+STAGE_PARSE = "parse"
+STAGE_MONGO = "mongo"
+STAGES = (STAGE_NETWORK, STAGE_SLEEP, STAGE_PARSE, STAGE_MONGO)
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+BYTES_BUCKETS = (16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+METRIC_PAGE_SECONDS = "ptt_crawler_page_seconds"
+METRIC_PAGE_BYTES = "ptt_crawler_page_bytes"
+METRIC_PAGE_RETRIES = "ptt_crawler_page_retries"
+METRIC_PAGE_DB_OPERATIONS = "ptt_crawler_page_db_operations"
+METRIC_HELP = {
+    METRIC_PAGE_SECONDS: "Seconds a board page spent in each crawl stage, summed over concurrent requests "
+    "(stage=page for the wall clock time of the page).",
+    METRIC_PAGE_BYTES: "Bytes downloaded for a board page and its articles.",
+    METRIC_PAGE_RETRIES: "Retried requests of a board page.",
+    METRIC_PAGE_DB_OPERATIONS: "Mongodb operations of a board page.",
+}
+METRICS_FILE_NAME = "ptt_crawler.prom"
+STATE_FILE_SUFFIX = ".json"
+LOCK_FILE_NAME = ".lock"
+METRICS_SERVER_PORT = 9464
+
+
+class Histogram:
+    """
+    prometheus style histogram: counts per upper bound, sum and count of the observed values
+    """
+
+    def __init__(self, buckets: tuple, counts: list[int] | None = None, total: float = 0.0):
+        """
+        :param buckets: increasing upper bounds (values above the last one only count in +Inf)
+        :param counts: observations per bucket (not cumulative), +Inf last
+        :param total: sum of the observed values
+        """
+        self.buckets = tuple(buckets)
+        self.counts = list(counts) if counts is not None else [0] * (len(self.buckets) + 1)
+        self.total = total
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def merge(self, other: "Histogram"):
+        """
+        :param other: histogram with the same buckets
+        """
+        if other.buckets != self.buckets:
+            raise ValueError(f"cannot merge buckets {other.buckets} into {self.buckets}")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+
+    def to_dict(self) -> dict:
+        return {"buckets": list(self.buckets), "counts": self.counts, "sum": self.total}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        return cls(data["buckets"], data["counts"], data["sum"])
+
+    def exposition(self, name: str, labels: dict[str, str]) -> list[str]:
+        """
+        :param name: metric name
+        :param labels: labels of the series
+        :return: lines of the series in the prometheus text format
+        """
+        lines, cumulative = [], 0
+        for bound, count in zip([*self.buckets, "+Inf"], self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{format_labels({**labels, 'le': bound})} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labels)} {self.total}")
+        lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+        return lines
+
+
+def format_labels(labels: dict) -> str:
+    """
+    :param labels: label names and values
+    :return: labels in the prometheus text format
+    """
+    escaped = {
+        key: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for key, value in labels.items()
+    }
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped.items()) + "}"
+
+
+def series_key(metric: str, **labels: str) -> str:
+    """
+    :return: key of a series in the histograms of a CrawlTelemetry (metric name and sorted labels)
+    """
+    return json.dumps([metric, dict(sorted(labels.items()))])
+
+
+class CrawlTelemetry:
+    """
+    measure every page of a task run from the counters of the crawl engine and of the writer
+    """
+
+    def __init__(
+        self,
+        crawler: str,
+        engine: AsyncCrawlEngine,
+        writer: ArticleBulkWriter | None = None,
+        clock=time.monotonic,
+    ):
+        """
+        :param crawler: name of the crawler (label of the series)
+        :param engine: crawl engine of the task run
+        :param writer: writer of the task run (None if the run does not write)
+        :param clock: monotonic clock in seconds
+        """
+        self.crawler = crawler
+        self.engine = engine
+        self.writer = writer
+        self.pages = 0
+        self.histograms: dict[str, Histogram] = {}
+        self.run_totals = Counter()
+        self._clock = clock
+        self._page = Counter()
+        self._position = self._counters()
+
+    def _counters(self) -> dict:
+        attempts = len(self.engine.recorder.attempts)
+        return {
+            "time": self._clock(),
+            "attempts": attempts,
+            "sleep_seconds": self.engine.sleep_seconds,
+            "parse_seconds": self.engine.parse_stats.busy_seconds,
+            "write_seconds": self.writer.write_seconds if self.writer else 0.0,
+            "db_writes": self.writer.written_operations if self.writer else 0,
+        }
+
+    def _take_window(self) -> dict:
+        position, self._position = self._position, self._counters()
+        summary = self.engine.recorder.summary(since=position["attempts"])
+        traffic = self.engine.recorder.traffic(since=position["attempts"])
+        window = {
+            "page_seconds": self._position["time"] - position["time"],
+            f"{STAGE_NETWORK}_seconds": traffic["seconds"],
+            f"{STAGE_SLEEP}_seconds": self._position["sleep_seconds"] - position["sleep_seconds"],
+            f"{STAGE_PARSE}_seconds": self._position["parse_seconds"] - position["parse_seconds"],
+            f"{STAGE_MONGO}_seconds": self._position["write_seconds"]
+            - position["write_seconds"]
+            + self._page["read_seconds"],
+            "bytes": traffic["bytes"],
+            "requests": summary["requests"],
+            "retries": summary["retries"],
+            "db_reads": self._page["db_reads"],
+            "db_writes": self._position["db_writes"] - position["db_writes"],
+        }
+        self._page.clear()
+        return window
+
+    def add_db_read(self, seconds: float, operations: int = 1):
+        """
+        :param seconds: seconds spent on a mongodb query of the current page
+        :param operations: number of queries
+        """
+        self._page["read_seconds"] += seconds
+        self._page["db_reads"] += operations
+
+    def _observe(self, metric: str, buckets: tuple, value: float, **labels: str):
+        key = series_key(metric, crawler=self.crawler, **labels)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram(buckets)
+        self.histograms[key].observe(value)
+
+    def page_done(self) -> dict:
+        """
+        close the current page (everything since the previous page, so the first page includes opening the board)
+        writes run by a write stage are counted in the page during which they finished
+        :return: measures of the page
+        """
+        page = self._take_window()
+        self.pages += 1
+        self.run_totals.update(page)
+        self._observe(METRIC_PAGE_SECONDS, SECONDS_BUCKETS, page["page_seconds"], stage="page")
+        for stage in STAGES:
+            self._observe(METRIC_PAGE_SECONDS, SECONDS_BUCKETS, page[f"{stage}_seconds"], stage=stage)
+        self._observe(METRIC_PAGE_BYTES, BYTES_BUCKETS, page["bytes"])
+        self._observe(METRIC_PAGE_RETRIES, COUNT_BUCKETS, page["retries"])
+        self._observe(METRIC_PAGE_DB_OPERATIONS, COUNT_BUCKETS, page["db_reads"], operation="read")
+        self._observe(METRIC_PAGE_DB_OPERATIONS, COUNT_BUCKETS, page["db_writes"], operation="write")
+        return rounded(page)
+
+    def run_summary(self) -> dict:
+        """
+        totals of the task run, including what happened after the last page (e.g. the last writes)
+        :return: measures of the run prefixed with run_
+        """
+        self.run_totals.update(self._take_window())
+        totals = rounded(self.run_totals)
+        totals["seconds"] = totals.pop("page_seconds", 0)
+        return {"run_pages": self.pages, **{f"run_{key}": value for key, value in totals.items()}}
+
+
+def rounded(measures: dict) -> dict:
+    return {key: round(value, 3) if isinstance(value, float) else value for key, value in measures.items()}
+
+
+def render_prometheus(histograms: dict[str, Histogram]) -> str:
+    """
+    :param histograms: histograms by series key
+    :return: histograms in the prometheus text format (one HELP and TYPE per metric)
+    """
+    by_metric: dict[str, list[tuple[dict, Histogram]]] = {}
+    for key, histogram in sorted(histograms.items()):
+        metric, labels = json.loads(key)
+        by_metric.setdefault(metric, []).append((labels, histogram))
+
+    lines = []
+    for metric, series in by_metric.items():
+        lines.append(f"# HELP {metric} {METRIC_HELP.get(metric, metric)}")
+        lines.append(f"# TYPE {metric} histogram")
+        for labels, histogram in series:
+            lines.extend(histogram.exposition(metric, labels))
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomically(path: str, content: str):
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(temporary_path, path)
+
+
+def load_histograms(metrics_dir: str) -> dict[str, Histogram]:
+    """
+    :param metrics_dir: metrics directory
+    :return: histograms accumulated by all the crawlers
+    """
+    histograms = {}
+    for file_name in sorted(os.listdir(metrics_dir)):
+        if file_name.endswith(STATE_FILE_SUFFIX):
+            with open(os.path.join(metrics_dir, file_name), encoding="utf-8") as file:
+                for key, data in json.load(file).items():
+                    histograms[key] = Histogram.from_dict(data)
+    return histograms
+
+
+def export_telemetry(metrics_dir: str, telemetry: CrawlTelemetry):
+    """
+    add the histograms of a task run to the ones of its crawler and render the metrics file of all crawlers
+    :param metrics_dir: metrics directory (shared by the task runs, e.g. a docker volume)
+    :param telemetry: telemetry of the task run
+    """
+    os.makedirs(metrics_dir, exist_ok=True)
+    state_path = os.path.join(metrics_dir, f"{telemetry.crawler}{STATE_FILE_SUFFIX}")
+    # task runs of several workers update the directory one at a time
+    with open(os.path.join(metrics_dir, LOCK_FILE_NAME), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        histograms = {}
+        if os.path.exists(state_path):
+            with open(state_path, encoding="utf-8") as file:
+                histograms = {key: Histogram.from_dict(data) for key, data in json.load(file).items()}
+        for key, histogram in telemetry.histograms.items():
+            if key in histograms:
+                histograms[key].merge(histogram)
+            else:
+                histograms[key] = Histogram(histogram.buckets, histogram.counts, histogram.total)
+        _write_atomically(
+            state_path, json.dumps({key: histogram.to_dict() for key, histogram in histograms.items()})
+        )
+        _write_atomically(
+            os.path.join(metrics_dir, METRICS_FILE_NAME), render_prometheus(load_histograms(metrics_dir))
+        )
+
+
+def serve_metrics(metrics_dir: str, port: int = METRICS_SERVER_PORT):
+    """
+    expose the metrics file at /metrics for the prometheus receiver of the monitoring agent
+    :param metrics_dir: metrics directory
+    :param port: port of the metrics server
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            try:
+                with open(os.path.join(metrics_dir, METRICS_FILE_NAME), "rb") as file:
+                    body = file.read()
+            except FileNotFoundError:
+                body = b""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    ThreadingHTTPServer(("", port), MetricsHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="serve the crawl telemetry in the prometheus text format")
+    parser.add_argument("--metrics-dir", default=os.getenv("PTT_METRICS_DIR"))
+    parser.add_argument("--port", type=int, default=METRICS_SERVER_PORT)
+    args = parser.parse_args()
+    if not args.metrics_dir:
+        parser.error("--metrics-dir or PTT_METRICS_DIR is required")
+    serve_metrics(args.metrics_dir, args.port)
@@ -0,0 +1,136 @@
+"""
+This module contains the url frontier shared by the workers crawling one board range. The index pages of the range
+and the articles found on them are queued in redis, ordered by priority; a set of the urls seen by the run makes
+every url queued once. A worker leases a batch of urls and acknowledges them once they are written. The lease of a
+url is a redis key expiring after the visibility timeout, so the urls of a worker that died are leased again by
+the others. Every operation is a single redis command or transaction, so any number of workers share the frontier.
+"""
+import json
+
+FRONTIER_KEY_PREFIX = "ptt:frontier"
+FRONTIER_TTL_SECONDS = 7 * 24 * 60 * 60
+ITEM_KIND_INDEX = "index"
+ITEM_KIND_ARTICLE = "article"
+
+
+class UrlFrontier:
+    """
+    queue of the urls of a crawl run, leased to the workers with a visibility timeout
+    """
+
+    def __init__(
+        self,
+        client,
+        name: str,
+        worker_id: str,
+        lease_seconds: int,
+        ttl_seconds: int = FRONTIER_TTL_SECONDS,
+    ):
+        """
+        :param client: redis client (created with decode_responses=True)
+        :param name: name of the crawl run (e.g. board, dag id and run id)
+        :param worker_id: id of the worker, stored in its leases
+        :param lease_seconds: seconds after which a url leased and not acknowledged is leased again
+        :param ttl_seconds: seconds after the last push from which redis deletes the frontier
+        """
+        self.client = client
+        self.name = name
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.ttl_seconds = ttl_seconds
+        prefix = f"{FRONTIER_KEY_PREFIX}:{name}"
+        self._queue_key = f"{prefix}:queue"
+        self._seen_key = f"{prefix}:seen"
+        self._items_key = f"{prefix}:items"
+        self._lease_prefix = f"{prefix}:lease:"
+
+    def push(self, items: list[dict]) -> int:
+        """
+        queue the items whose url was never queued by the run
+        :param items: items with their url, priority (lowest first) and what the worker needs to crawl them
+        :return: number of items queued
+        """
+        if not items:
+            return 0
+        items_by_url = {item["url"]: item for item in items}
+        seen = self.client.smismember(self._seen_key, list(items_by_url))
+        new_items = [item for item, is_seen in zip(items_by_url.values(), seen) if not is_seen]
+        if not new_items:
+            return 0
+        # a url pushed by two workers at once is still queued once: the queue is a sorted set
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.sadd(self._seen_key, *(item["url"] for item in new_items))
+        pipeline.hset(
+            self._items_key,
+            mapping={item["url"]: json.dumps(item, ensure_ascii=False) for item in new_items},
+        )
+        pipeline.zadd(
+            self._queue_key, {item["url"]: item["priority"] for item in new_items}, nx=True
+        )
+        for key in (self._queue_key, self._seen_key, self._items_key):
+            pipeline.expire(key, self.ttl_seconds)
+        pipeline.execute()
+        return len(new_items)
+
+    def lease(self, count: int) -> list[dict]:
+        """
+        lease the queued items of lowest priority that no worker holds
+        :param count: maximum number of items
+        :return: leased items (empty if every queued item is leased or the frontier is drained)
+        """
+        leased_urls: list[str] = []
+        start = 0
+        while len(leased_urls) < count:
+            urls = self.client.zrange(self._queue_key, start, start + count - len(leased_urls) - 1)
+            if not urls:
+                break
+            start += len(urls)
+            pipeline = self.client.pipeline(transaction=False)
+            for url in urls:
+                pipeline.set(self._lease_prefix + url, self.worker_id, nx=True, ex=self.lease_seconds)
+            leased_urls.extend(url for url, leased in zip(urls, pipeline.execute()) if leased)
+        if not leased_urls:
+            return []
+        # acknowledged by another worker since they were listed
+        return [
+            json.loads(item)
+            for item in self.client.hmget(self._items_key, leased_urls)
+            if item is not None
+        ]
+
+    def ack(self, urls: list[str]):
+        """
+        remove crawled urls from the frontier (they stay seen, so they are not queued again)
+        :param urls: urls leased by this worker
+        """
+        if not urls:
+            return
+        # the leases are left to expire: a worker that listed the urls before they were removed cannot lease them
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.zrem(self._queue_key, *urls)
+        pipeline.hdel(self._items_key, *urls)
+        pipeline.execute()
+
+    def release(self, urls: list[str]):
+        """
+        give leased urls back before their lease expires (e.g. when the worker fails)
+        :param urls: urls leased by this worker
+        """
+        if urls:
+            self.client.delete(*(self._lease_prefix + url for url in urls))
+
+    def is_drained(self) -> bool:
+        """
+        :return: whether every queued url was acknowledged
+        """
+        return self.client.zcard(self._queue_key) == 0
+
+    def stats(self) -> dict:
+        """
+        :return: number of urls seen by the run, still queued (leased or not) and done
+        """
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.scard(self._seen_key)
+        pipeline.zcard(self._queue_key)
+        seen, queued = pipeline.execute()
+        return {"frontier_seen": seen, "frontier_queued": queued, "frontier_done": seen - queued}
@@ -0,0 +1,301 @@
+"""
+This module contains the write-ahead spool of the crawler. The writes of a task run are appended as json lines to
+local segment files instead of going to mongodb, so the crawl does not wait for (or fail with) the database; a
+drainer replays the segments into mongodb with large unordered bulk writes and deletes them once written. The
+spooled writes are idempotent (articles are upserted on article_url and comments are only appended while the
+stored comment fingerprint tail, or count, is the one they were parsed against), so a segment can be replayed after
+a partial failure.
+"""
+import os
+import json
+import time
+import fcntl
+import argparse
+import threading
+from datetime import datetime
+from collections import defaultdict
+from bson import json_util
+from loguru import logger
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+SEGMENT_MAX_SECONDS = 60.0
+OPEN_SEGMENT_SUFFIX = ".open"
+SEALED_SEGMENT_SUFFIX = ".jsonl"
+REJECTED_DIR_NAME = "rejected"
+DRAIN_BATCH_OPERATIONS = 5000
+DRAIN_INTERVAL_SECONDS = 5.0
+DUPLICATE_KEY_ERROR = 11000
+
+
+def to_update_one(record: dict) -> UpdateOne:
+    """
+    :param record: write record (filter, update and upsert)
+    :return: pymongo operation of the record
+    """
+    return UpdateOne(record["filter"], record["update"], upsert=record["upsert"])
+
+
+class WriteSpool:
+    """
+    append-only segment files of write records; a segment is sealed when it is full, old or closed
+    """
+
+    def __init__(
+        self,
+        spool_dir: str,
+        segment_max_bytes: int = SEGMENT_MAX_BYTES,
+        segment_max_seconds: float = SEGMENT_MAX_SECONDS,
+        clock=time.monotonic,
+    ):
+        """
+        :param spool_dir: directory of the segment files
+        :param segment_max_bytes: size from which the segment is sealed
+        :param segment_max_seconds: age from which the segment is sealed (so the drainer gets the writes soon)
+        :param clock: monotonic clock in seconds
+        """
+        os.makedirs(spool_dir, exist_ok=True)
+        self.spool_dir = spool_dir
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_seconds = segment_max_seconds
+        # every writer appends to its own segments, so task runs never share a file
+        self._segment_prefix = f"{datetime.now():%Y%m%d%H%M%S}-{os.getpid()}-{id(self):x}"
+        self._segment_number = 0
+        self._segment_file = None
+        self._segment_opened = 0.0
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _open_segment(self):
+        self._segment_number += 1
+        segment = f"{self._segment_prefix}-{self._segment_number:05d}{OPEN_SEGMENT_SUFFIX}"
+        self._segment_file = open(os.path.join(self.spool_dir, segment), "ab")
+        # held while the segment is written: the drainer takes open segments only once their writer is gone
+        fcntl.flock(self._segment_file, fcntl.LOCK_EX)
+        self._segment_opened = self._clock()
+
+    def _seal_segment(self):
+        if self._segment_file is None:
+            return
+        open_path = self._segment_file.name
+        # renamed while locked, so a drainer never takes the segment under its open name
+        os.replace(open_path, open_path[: -len(OPEN_SEGMENT_SUFFIX)] + SEALED_SEGMENT_SUFFIX)
+        self._segment_file.close()
+        self._segment_file = None
+
+    def append(self, collection: str, records: list[dict]):
+        """
+        append write records and make them durable before returning
+        :param collection: collection the records are written to
+        :param records: write records (filter, update and upsert)
+        """
+        if not records:
+            return
+        data = b"".join(
+            json_util.dumps({"collection": collection, **record}, ensure_ascii=False).encode("utf-8")
+            + b"\n"
+            for record in records
+        )
+        with self._lock:
+            if self._segment_file is not None and (
+                self._segment_file.tell() + len(data) > self.segment_max_bytes
+                or self._clock() - self._segment_opened >= self.segment_max_seconds
+            ):
+                self._seal_segment()
+            if self._segment_file is None:
+                self._open_segment()
+            self._segment_file.write(data)
+            self._segment_file.flush()
+            os.fsync(self._segment_file.fileno())
+
+    def seal(self):
+        """
+        seal the current segment so that the drainer can replay it
+        """
+        with self._lock:
+            self._seal_segment()
+
+    def close(self):
+        self.seal()
+
+
+def read_segment(path: str) -> list[dict]:
+    """
+    :param path: segment file
+    :return: write records of the segment (a line cut short by a crash is skipped)
+    """
+    records = []
+    with open(path, "rb") as file:
+        for line_number, line in enumerate(file, 1):
+            try:
+                records.append(json_util.loads(line))
+            except ValueError:
+                logger.warning(f"Write spool: skip the unreadable line {line_number} of {path}")
+    return records
+
+
+def claim_segments(spool_dir: str) -> list[tuple[str, object]]:
+    """
+    lock the segments that can be replayed: the sealed ones and the open ones whose writer is gone
+    :param spool_dir: directory of the segment files
+    :return: paths and locked files of the segments, oldest first
+    """
+    claimed = []
+    for name in sorted(os.listdir(spool_dir)):
+        if not name.endswith((SEALED_SEGMENT_SUFFIX, OPEN_SEGMENT_SUFFIX)):
+            continue
+        path = os.path.join(spool_dir, name)
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:  # replayed by another drainer in the meantime
+            continue
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:  # still written, or replayed by another drainer
+            file.close()
+            continue
+        if not os.path.exists(path):
+            file.close()
+            continue
+        claimed.append((path, file))
+    return claimed
+
+
+def drain_spool(
+    spool_dir: str, database, batch_operations: int = DRAIN_BATCH_OPERATIONS
+) -> dict:
+    """
+    replay the claimable segments into mongodb and delete them once written
+    :param spool_dir: directory of the segment files
+    :param database: mongodb database (collections are looked up by name)
+    :param batch_operations: operations per bulk write
+    :return: drain report (segments, operations, inserted, modified, rejected segments and seconds)
+    """
+    report = {
+        "spool_segments": 0,
+        "spool_operations": 0,
+        "spool_inserted": 0,
+        "spool_modified": 0,
+        "spool_rejected_segments": 0,
+        "spool_seconds": 0.0,
+    }
+    start = time.perf_counter()
+    claimed = claim_segments(spool_dir)
+    try:
+        pending_paths: list[str] = []
+        pending_records: dict[str, list[dict]] = defaultdict(list)
+        for index, (path, _) in enumerate(claimed):
+            pending_paths.append(path)
+            for record in read_segment(path):
+                pending_records[record.pop("collection")].append(record)
+            last_segment = index == len(claimed) - 1
+            # small segments are replayed together so that a bulk write carries a full batch
+            if not last_segment and sum(map(len, pending_records.values())) < batch_operations:
+                continue
+            if not _write_segments(
+                spool_dir, database, pending_paths, pending_records, batch_operations, report
+            ):
+                break
+            pending_paths, pending_records = [], defaultdict(list)
+    finally:
+        for _, file in claimed:
+            file.close()
+    report["spool_seconds"] = round(time.perf_counter() - start, 4)
+    return report
+
+
+def _write_segments(
+    spool_dir: str,
+    database,
+    paths: list[str],
+    records_by_collection: dict[str, list[dict]],
+    batch_operations: int,
+    report: dict,
+) -> bool:
+    """
+    :return: whether the database was reachable (the segments are kept for the next drain if it was not)
+    """
+    retry, rejected = False, False
+    for collection, records in records_by_collection.items():
+        for first in range(0, len(records), batch_operations):
+            batch = records[first : first + batch_operations]
+            try:
+                result = database[collection].bulk_write(
+                    [to_update_one(record) for record in batch], ordered=False
+                )
+            except BulkWriteError as e:
+                # the other operations of an unordered bulk write are applied
+                details = e.details
+                result = None
+                report["spool_inserted"] += details.get("nUpserted", 0)
+                report["spool_modified"] += details.get("nModified", 0)
+                write_errors = details.get("writeErrors", [])
+                codes = {error.get("code") for error in write_errors}
+                logger.error(f"Write spool: {len(write_errors)} write errors {codes} in {collection}")
+                # two upserts of an article raced: replaying them updates the stored article
+                retry = retry or DUPLICATE_KEY_ERROR in codes
+                rejected = rejected or bool(codes - {DUPLICATE_KEY_ERROR})
+            except PyMongoError as e:
+                logger.warning(f"Write spool: {e}: {len(paths)} segments are kept for the next drain.")
+                return False
+            if result is not None:
+                report["spool_inserted"] += result.upserted_count
+                report["spool_modified"] += result.modified_count
+            report["spool_operations"] += len(batch)
+
+    if retry:
+        return True
+    for path in paths:
+        if rejected:
+            # kept aside for inspection instead of blocking the spool
+            rejected_dir = os.path.join(spool_dir, REJECTED_DIR_NAME)
+            os.makedirs(rejected_dir, exist_ok=True)
+            os.replace(path, os.path.join(rejected_dir, os.path.basename(path)))
+        else:
+            os.remove(path)
+    report["spool_segments"] += len(paths)
+    report["spool_rejected_segments"] += len(paths) if rejected else 0
+    return True
+
+
+def spool_backlog(spool_dir: str) -> dict:
+    """
+    :param spool_dir: directory of the segment files
+    :return: number and bytes of the segments not replayed yet
+    """
+    sizes = [
+        os.path.getsize(os.path.join(spool_dir, name))
+        for name in os.listdir(spool_dir)
+        if name.endswith((SEALED_SEGMENT_SUFFIX, OPEN_SEGMENT_SUFFIX))
+    ]
+    return {"spool_backlog_segments": len(sizes), "spool_backlog_bytes": sum(sizes)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="replay the write spool of the crawler into mongodb")
+    parser.add_argument("--spool-dir", default=os.getenv("PTT_WRITE_SPOOL_DIR"))
+    parser.add_argument("--interval", type=float, default=DRAIN_INTERVAL_SECONDS)
+    parser.add_argument("--batch-operations", type=int, default=DRAIN_BATCH_OPERATIONS)
+    parser.add_argument("--once", action="store_true", help="drain once and exit")
+    args = parser.parse_args()
+    if not args.spool_dir:
+        parser.error("--spool-dir or PTT_WRITE_SPOOL_DIR is required")
+
+    from dag_crawling import get_db, setup_task_logging
+
+    setup_task_logging()
+    os.makedirs(args.spool_dir, exist_ok=True)
+    while True:
+        drain_report = drain_spool(args.spool_dir, get_db(), args.batch_operations)
+        if drain_report["spool_segments"]:
+            logger.info(json.dumps({**drain_report, **spool_backlog(args.spool_dir)}))
+        if args.once:
+            break
+        time.sleep(args.interval)
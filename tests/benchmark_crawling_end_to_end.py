@@ -0,0 +1,148 @@
+"""
+Crawl a local ptt stand-in (tests/ptt_replay_server.py) with set_range_and_crawl and report the throughput.
+Not collected by default; run with: python -m pytest tests/benchmark_crawling_end_to_end.py -s
+
+Articles are written to the database ptt_replay of REPLAY_MONGO_URI (default mongodb://localhost:27017);
+the test is skipped if it cannot be reached. The crawl is configured with environment variables:
+REPLAY_PAGES, REPLAY_ARTICLES_PER_PAGE, REPLAY_LATENCY, REPLAY_ERROR_RATE, REPLAY_SERVER_REQUESTS_PER_SECOND,
+REPLAY_MAX_REQUESTS_IN_FLIGHT and REPLAY_REQUESTS_PER_SECOND.
+"""
+import os
+import json
+import time
+import logging
+import pytest
+from collections import Counter
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from ptt_replay_server import PttReplayServer, ReplayBoard
+import src.crawler.dags.dag_crawling as dag_crawling
+
+MONGO_URI = os.getenv("REPLAY_MONGO_URI", "mongodb://localhost:27017")
+PAGES = int(os.getenv("REPLAY_PAGES", "5"))
+ARTICLES_PER_PAGE = int(os.getenv("REPLAY_ARTICLES_PER_PAGE", "20"))
+LATENCY = float(os.getenv("REPLAY_LATENCY", "0.05"))
+ERROR_RATE = float(os.getenv("REPLAY_ERROR_RATE", "0.02"))
+SERVER_REQUESTS_PER_SECOND = float(os.getenv("REPLAY_SERVER_REQUESTS_PER_SECOND", "0")) or None
+MAX_REQUESTS_IN_FLIGHT = int(
+    os.getenv("REPLAY_MAX_REQUESTS_IN_FLIGHT", str(dag_crawling.MAX_REQUESTS_IN_FLIGHT))
+)
+REQUESTS_PER_SECOND = float(os.getenv("REPLAY_REQUESTS_PER_SECOND", "20"))
+PTT_BOARD = "gossip"
+
+
+class CrawlingLogCollector(logging.Handler):
+    """
+    sum up the json lines written to a crawling logger (page logs and bulk write logs)
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.totals = Counter()
+
+    def emit(self, record: logging.LogRecord):
+        for key, value in json.loads(record.getMessage()).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.totals[key] += value
+
+
+def run_crawl(base_url: str, server: PttReplayServer, db) -> dict:
+    """
+    crawl the PAGES latest pages of the replay server once
+    :param base_url: url of the board's latest index page on the replay server
+    :param server: replay server (for its request counts)
+    :param db: database receiving the articles
+    :return: throughput report
+    """
+    dag_crawling.db = db
+    # every crawl starts from REQUESTS_PER_SECOND instead of the rate adapted by previous crawls
+    dag_crawling.RATE_CONTROL_DIR = None
+    crawling_logger = logging.getLogger("logger_replay_benchmark")
+    # outside airflow nothing configures the logging, and the report is built from the info records
+    crawling_logger.setLevel(logging.INFO)
+    collector = CrawlingLogCollector()
+    crawling_logger.addHandler(collector)
+    server.stats.clear()
+
+    start = time.perf_counter()
+    try:
+        dag_crawling.set_range_and_crawl(
+            base_url,
+            PTT_BOARD,
+            crawling_logger,
+            1,
+            PAGES + 1,
+            max_requests_in_flight=MAX_REQUESTS_IN_FLIGHT,
+            requests_per_second=REQUESTS_PER_SECOND,
+        )
+    finally:
+        crawling_logger.removeHandler(collector)
+    minutes = (time.perf_counter() - start) / 60
+
+    totals = collector.totals
+    articles = (
+        totals["crawling_data_insert"]
+        + totals["crawling_data_update"]
+        + totals["crawling_data_ignore"]
+    )
+    return {
+        "seconds": round(minutes * 60, 2),
+        "pages_per_minute": round(PAGES / minutes, 1),
+        "articles_per_minute": round(articles / minutes, 1),
+        "articles_fetched": articles,
+        "articles_skipped": totals["crawling_data_skip"],
+        "crawler_requests": totals["crawling_requests"],
+        "crawler_index_requests": totals["crawling_index_requests"],
+        "crawler_requests_per_page": round(totals["run_requests"] / PAGES, 1),
+        "crawler_retries": totals["crawling_retries"],
+        "server_requests": dict(server.stats),
+        "mongo_write_operations": totals["bulk_write_operations"],
+        "mongo_inserted": totals["bulk_write_inserted"],
+        "mongo_modified": totals["bulk_write_modified"],
+        "mongo_write_seconds": round(totals["bulk_write_seconds"], 3),
+    }
+
+
+@pytest.fixture
+def replay_db():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        pytest.skip(f"{MONGO_URI} cannot be reached: {e}")
+    db = client.ptt_replay
+    db[PTT_BOARD].drop()
+    yield db
+    db[PTT_BOARD].drop()
+    client.close()
+
+
+@pytest.fixture
+def replay_server():
+    server = PttReplayServer(
+        board=ReplayBoard(articles_per_page=ARTICLES_PER_PAGE),
+        latency=LATENCY,
+        latency_jitter=LATENCY,
+        error_rate=ERROR_RATE,
+        requests_per_second=SERVER_REQUESTS_PER_SECOND,
+    )
+    base_url = server.start_in_background()
+    yield server, base_url
+    server.stop()
+
+
+def test_crawl_replay_board(replay_server, replay_db):
+    server, base_url = replay_server
+    db_before = dag_crawling.db
+
+    try:
+        first_crawl = run_crawl(base_url, server, replay_db)
+        recrawl = run_crawl(base_url, server, replay_db)
+    finally:
+        dag_crawling.db = db_before
+
+    print(f"\nfirst crawl: {json.dumps(first_crawl, indent=2)}")
+    print(f"recrawl: {json.dumps(recrawl, indent=2)}")
+    assert first_crawl["mongo_inserted"] == PAGES * ARTICLES_PER_PAGE
+    assert replay_db[PTT_BOARD].count_documents({}) == PAGES * ARTICLES_PER_PAGE
+    assert recrawl["mongo_inserted"] == 0
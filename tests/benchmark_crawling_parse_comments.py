@@ -0,0 +1,56 @@
+"""
+Compare full and incremental parse time of large articles, and the html backends.
+Not collected by default; run with: python -m pytest tests/benchmark_crawling_parse_comments.py -s
+"""
+import timeit
+import pytest
+from mock_ptt_pages import build_article_page, build_comments
+from utils_crawler.page_parser import BACKEND_LXML, BACKEND_SOUP
+import src.crawler.dags.dag_crawling as dag_crawling
+from src.crawler.dags.dag_crawling import parse_article_html, parse_article_update
+
+NEW_COMMENTS_PER_RECRAWL = 20
+REPEAT = 5
+
+
+@pytest.mark.parametrize("num_comments", [500, 3000, 10000])
+def test_incremental_parse_is_faster_than_full_parse(num_comments: int):
+    article_page = build_article_page(build_comments(num_comments))
+    previous_num_comments = num_comments - NEW_COMMENTS_PER_RECRAWL
+
+    full_seconds = min(
+        timeit.repeat(lambda: parse_article_html(article_page), number=1, repeat=REPEAT)
+    )
+    incremental_seconds = min(
+        timeit.repeat(
+            lambda: parse_article_update(article_page, previous_num_comments),
+            number=1,
+            repeat=REPEAT,
+        )
+    )
+
+    print(
+        f"\n{num_comments} comments: full {full_seconds * 1000:.1f} ms, "
+        f"incremental {incremental_seconds * 1000:.1f} ms "
+        f"({full_seconds / incremental_seconds:.1f}x)"
+    )
+    assert incremental_seconds < full_seconds
+
+
+@pytest.mark.parametrize("num_comments", [500, 3000])
+def test_lxml_backend_is_faster_than_soup_backend(num_comments: int, monkeypatch):
+    article_page = build_article_page(build_comments(num_comments))
+
+    backend_seconds = {}
+    for backend in [BACKEND_SOUP, BACKEND_LXML]:
+        monkeypatch.setattr(dag_crawling, "HTML_PARSER_BACKEND", backend)
+        backend_seconds[backend] = min(
+            timeit.repeat(lambda: parse_article_html(article_page), number=1, repeat=REPEAT)
+        )
+
+    print(
+        f"\n{num_comments} comments: bs4 {backend_seconds[BACKEND_SOUP] * 1000:.1f} ms, "
+        f"lxml {backend_seconds[BACKEND_LXML] * 1000:.1f} ms "
+        f"({backend_seconds[BACKEND_SOUP] / backend_seconds[BACKEND_LXML]:.1f}x)"
+    )
+    assert backend_seconds[BACKEND_LXML] < backend_seconds[BACKEND_SOUP]
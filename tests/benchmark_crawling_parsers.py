@@ -0,0 +1,139 @@
+"""
+Measure the parsers on the recorded pages of tests/ptt_pages for every html backend.
+Not collected by default; run with: python -m pytest tests/benchmark_crawling_parsers.py -s
+
+The first run records the timings in PTT_PARSER_BENCHMARK_BASELINE (default tests/ptt_pages/benchmark_baseline.json,
+which is machine specific and not committed). Later runs fail if a function gets slower than the baseline times
+PTT_PARSER_BENCHMARK_THRESHOLD (default 1.3). Set PTT_PARSER_BENCHMARK_UPDATE=1 to record a new baseline.
+"""
+import os
+import json
+import timeit
+import pytest
+from loguru import logger
+from bs4 import BeautifulSoup
+from mock_ptt_pages import PTT_PAGES_DIR, load_ptt_pages
+from utils_crawler.page_parser import BACKEND_LXML, BACKEND_SOUP, load_page
+import src.crawler.dags.dag_crawling as dag_crawling
+
+BASELINE_PATH = os.getenv(
+    "PTT_PARSER_BENCHMARK_BASELINE", os.path.join(PTT_PAGES_DIR, "benchmark_baseline.json")
+)
+THRESHOLD = float(os.getenv("PTT_PARSER_BENCHMARK_THRESHOLD", "1.3"))
+UPDATE_BASELINE = os.getenv("PTT_PARSER_BENCHMARK_UPDATE") == "1"
+BACKENDS = [BACKEND_SOUP, BACKEND_LXML]
+REPEAT = 5
+
+ARTICLE_PAGES = [page_html for _, page_html in load_ptt_pages("article")]
+INDEX_PAGES = [page_html for _, page_html in load_ptt_pages("index")]
+
+
+@pytest.fixture(autouse=True)
+def silence_parser_logs():
+    # the recorded edge cases log exceptions, which would dominate the timings
+    logger.disable(dag_crawling.__name__)
+    yield
+    logger.enable(dag_crawling.__name__)
+
+
+def measure(function) -> float:
+    """
+    :param function: function without arguments
+    :return: seconds per call of the fastest of REPEAT runs (each run lasts at least 0.2 seconds)
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number
+
+
+def build_page(page_html: str, backend: str):
+    # the soup backend is measured through the functions taking a soup, as the dag used them
+    if backend == BACKEND_SOUP:
+        return BeautifulSoup(page_html, "lxml")
+    return load_page(page_html, backend=backend)
+
+
+def parse_all_comments(pages: list, backend: str):
+    for page in pages:
+        if backend == BACKEND_SOUP:
+            basic_info = dag_crawling.parse_basic_info(page.find_all("div", "article-metaline"))
+            dag_crawling.parse_comments(page, basic_info[2], basic_info[3])
+        else:
+            basic_info = dag_crawling.parse_article_meta_values(page.article_meta_values())
+            dag_crawling.parse_comment_rows(page.comment_rows(), basic_info[2], basic_info[3])
+
+
+def create_all_page_idx(pages: list, backend: str):
+    for page in pages:
+        if backend == BACKEND_SOUP:
+            dag_crawling.create_page_idx(page, 1)
+        else:
+            dag_crawling.create_page_idx_from_links(page.paging_links(), 1)
+
+
+def exclude_all_announcements(pages: list, backend: str):
+    for page in pages:
+        if backend == BACKEND_SOUP:
+            dag_crawling.exclude_announcements_from_titles(
+                page.find_all("div", "r-ent"), dag_crawling.get_num_announcements(page)
+            )
+        else:
+            dag_crawling.exclude_announcements_from_titles(
+                page.index_rows(), page.num_announcements()
+            )
+
+
+def measure_backend(backend: str, monkeypatch) -> dict[str, float]:
+    """
+    :param backend: html backend
+    :return: seconds spent by each function on the whole corpus
+    """
+    monkeypatch.setattr(dag_crawling, "HTML_PARSER_BACKEND", backend)
+    article_pages = [build_page(page_html, backend) for page_html in ARTICLE_PAGES]
+    index_pages = [build_page(page_html, backend) for page_html in INDEX_PAGES]
+    return {
+        "parse_article": measure(
+            lambda: [dag_crawling.parse_article_html(page_html) for page_html in ARTICLE_PAGES]
+        ),
+        "parse_comments": measure(lambda: parse_all_comments(article_pages, backend)),
+        "create_page_idx": measure(lambda: create_all_page_idx(index_pages, backend)),
+        "exclude_announcements": measure(lambda: exclude_all_announcements(index_pages, backend)),
+    }
+
+
+def report(timings: dict[str, dict[str, float]]):
+    print(f"\n{len(ARTICLE_PAGES)} articles and {len(INDEX_PAGES)} index pages")
+    for backend, backend_timings in timings.items():
+        articles_per_second = len(ARTICLE_PAGES) / backend_timings["parse_article"]
+        print(f"{backend}: {articles_per_second:.1f} articles/sec")
+        for function_name, seconds in backend_timings.items():
+            print(f"  {function_name}: {seconds * 1000:.2f} ms")
+
+
+def test_parsers_do_not_regress(monkeypatch):
+    timings = {backend: measure_backend(backend, monkeypatch) for backend in BACKENDS}
+    report(timings)
+
+    if UPDATE_BASELINE or not os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "w", encoding="utf-8") as file:
+            json.dump(timings, file, indent=2)
+        pytest.skip(f"baseline recorded in {BASELINE_PATH}")
+
+    with open(BASELINE_PATH, "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+    regressions = [
+        f"{backend} {function_name}: {seconds * 1000:.2f} ms "
+        f"(baseline {baseline[backend][function_name] * 1000:.2f} ms)"
+        for backend, backend_timings in timings.items()
+        for function_name, seconds in backend_timings.items()
+        if function_name in baseline.get(backend, {})
+        and seconds > baseline[backend][function_name] * THRESHOLD
+    ]
+    assert not regressions, f"slower than {THRESHOLD}x the baseline: {regressions}"
+
+
+def test_lxml_backend_parses_articles_faster_than_soup_backend(monkeypatch):
+    timings = {
+        backend: measure_backend(backend, monkeypatch)["parse_article"] for backend in BACKENDS
+    }
+    assert timings[BACKEND_LXML] < timings[BACKEND_SOUP]
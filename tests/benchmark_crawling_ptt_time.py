@@ -0,0 +1,75 @@
+"""
+Compare the ptt time conversion with the strptime and pytz path it replaces.
+Not collected by default; run with: python -m pytest tests/benchmark_crawling_ptt_time.py -s
+"""
+import timeit
+import pytz
+from datetime import datetime, timedelta
+from mock_ptt_pages import build_article_page, build_comments
+from utils_crawler.ptt_time import parse_article_time, parse_comment_time
+from src.crawler.dags.dag_crawling import parse_article_html
+
+TAIPEI_TIMEZONE = pytz.timezone("Asia/Taipei")
+NUM_COMMENTS = 10000
+REPEAT = 5
+
+COMMENT_TIMES = [
+    (
+        "2023",
+        f"{comment_datetime:%m}",
+        f"{comment_datetime:%d}",
+        f"{comment_datetime:%H:%M}",
+    )
+    for comment_datetime in (
+        datetime(2023, 9, 21, 0, 21) + timedelta(minutes=i) for i in range(NUM_COMMENTS)
+    )
+]
+
+
+def strptime_comment_time(year: str, month: str, day: str, comment_time: str) -> float:
+    comment_datetime = datetime.strptime(f"{year}-{month}-{day} {comment_time}", "%Y-%m-%d %H:%M")
+    return TAIPEI_TIMEZONE.localize(comment_datetime).timestamp()
+
+
+def strptime_article_time(article_time: str) -> tuple[datetime, float]:
+    article_datetime = datetime.strptime(article_time, "%a %b %d %H:%M:%S %Y")
+    return article_datetime, TAIPEI_TIMEZONE.localize(article_datetime).timestamp()
+
+
+def measure(function) -> float:
+    return min(timeit.repeat(function, number=1, repeat=REPEAT))
+
+
+def test_comment_time_conversion_is_faster_than_strptime():
+    legacy_seconds = measure(lambda: [strptime_comment_time(*fields) for fields in COMMENT_TIMES])
+    seconds = measure(lambda: [parse_comment_time(*fields) for fields in COMMENT_TIMES])
+
+    print(
+        f"\n{NUM_COMMENTS} comment times: strptime {legacy_seconds * 1000:.1f} ms, "
+        f"ptt_time {seconds * 1000:.1f} ms ({legacy_seconds / seconds:.1f}x)"
+    )
+    assert seconds < legacy_seconds
+
+
+def test_article_time_conversion_is_faster_than_strptime():
+    article_times = ["Fri Sep  8 10:26:08 2023"] * 1000
+    legacy_seconds = measure(lambda: [strptime_article_time(value) for value in article_times])
+    seconds = measure(lambda: [parse_article_time(value) for value in article_times])
+
+    print(
+        f"\n1000 article times: strptime {legacy_seconds * 1000:.1f} ms, "
+        f"ptt_time {seconds * 1000:.1f} ms ({legacy_seconds / seconds:.1f}x)"
+    )
+    assert seconds < legacy_seconds
+
+
+def test_share_of_comment_times_in_article_parsing():
+    article_page = build_article_page(build_comments(NUM_COMMENTS))
+    parse_seconds = measure(lambda: parse_article_html(article_page))
+    legacy_seconds = measure(lambda: [strptime_comment_time(*fields) for fields in COMMENT_TIMES])
+    seconds = measure(lambda: [parse_comment_time(*fields) for fields in COMMENT_TIMES])
+
+    print(
+        f"\n{NUM_COMMENTS} comments: article parse {parse_seconds * 1000:.1f} ms, "
+        f"time conversion was {legacy_seconds * 1000:.1f} ms, now {seconds * 1000:.1f} ms"
+    )
@@ -0,0 +1,127 @@
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakePipeline:
+    """
+    commands run at once until multi() (as in a redis-py transaction), then queued until execute()
+    """
+
+    def __init__(self, client, buffered: bool):
+        self.client = client
+        self.buffered = buffered
+        self.commands = []
+
+    def multi(self):
+        self.buffered = True
+
+    def execute(self):
+        results = [command() for command in self.commands]
+        self.commands = []
+        return results
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def run(*args, **kwargs):
+            if not self.buffered:
+                return method(*args, **kwargs)
+            self.commands.append(lambda: method(*args, **kwargs))
+            return self
+
+        return run
+
+
+class FakeRedis:
+    """
+    in-memory redis with the commands of the url frontier and the rate control (decode_responses=True)
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock or FakeClock()
+        self.data = {}
+        self.expires = {}
+
+    def _get(self, name, default):
+        if name in self.expires and self.expires[name] <= self.clock():
+            del self.data[name], self.expires[name]
+        return self.data.setdefault(name, default) if default is not None else self.data.get(name)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self, buffered=True)
+
+    def transaction(self, func, *watches, value_from_callable=False):
+        pipeline = FakePipeline(self, buffered=False)
+        result = func(pipeline)
+        results = pipeline.execute()
+        return result if value_from_callable else results
+
+    def get(self, name):
+        return self._get(name, None)
+
+    def set(self, name, value, nx=False, ex=None):
+        if nx and self._get(name, None) is not None:
+            return None
+        self.data[name] = str(value)
+        self.expires.pop(name, None)
+        if ex is not None:
+            self.expires[name] = self.clock() + ex
+        return True
+
+    def delete(self, *names):
+        return sum(self.data.pop(name, None) is not None for name in names)
+
+    def expire(self, name, seconds):
+        self.expires[name] = self.clock() + seconds
+        return True
+
+    def sadd(self, name, *values):
+        members = self._get(name, set())
+        added = len(set(values) - members)
+        members.update(values)
+        return added
+
+    def smismember(self, name, values):
+        members = self._get(name, set())
+        return [int(value in members) for value in values]
+
+    def scard(self, name):
+        return len(self._get(name, set()))
+
+    def hset(self, name, mapping):
+        self._get(name, {}).update(mapping)
+        return len(mapping)
+
+    def hmget(self, name, keys):
+        fields = self._get(name, {})
+        return [fields.get(key) for key in keys]
+
+    def hdel(self, name, *keys):
+        fields = self._get(name, {})
+        return sum(fields.pop(key, None) is not None for key in keys)
+
+    def zadd(self, name, mapping, nx=False):
+        scores = self._get(name, {})
+        added = 0
+        for member, score in mapping.items():
+            if member not in scores:
+                added += 1
+            elif nx:
+                continue
+            scores[member] = score
+        return added
+
+    def zrange(self, name, start, end):
+        members = sorted(self._get(name, {}).items(), key=lambda item: (item[1], item[0]))
+        return [member for member, _ in members[start : end + 1]]
+
+    def zrem(self, name, *members):
+        scores = self._get(name, {})
+        return sum(scores.pop(member, None) is not None for member in members)
+
+    def zcard(self, name):
+        return len(self._get(name, {}))
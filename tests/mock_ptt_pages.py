@@ -0,0 +1,153 @@
+import os
+import json
+import html
+from datetime import datetime, timedelta
+
+PTT_PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ptt_pages")
+PUSH_TAG_CLASSES = {"推": "hl push-tag", "噓": "f1 hl push-tag", "→": "f1 hl push-tag"}
+
+
+def build_index_page(
+    board: str, page_idx: int, articles: list[dict], announcements: list[dict] = ()
+) -> str:
+    """
+    build a board index page like https://www.ptt.cc/bbs/Gossiping/index.html
+    :param board: board name
+    :param page_idx: index of the page
+    :param articles: dicts with article_id, title, author and nrec
+    :param announcements: dicts like articles listed below the r-list-sep line
+    :return: html
+    """
+
+    def build_row(article: dict) -> str:
+        return (
+            '<div class="r-ent">\n'
+            f'<div class="nrec"><span class="hl f2">{article.get("nrec", "")}</span></div>\n'
+            '<div class="title">\n'
+            f'<a href="/bbs/{board}/{article["article_id"]}.html">{html.escape(article["title"])}</a>\n'
+            "</div>\n"
+            '<div class="meta">'
+            f'<div class="author">{article["author"]}</div>'
+            '<div class="article">\n</div>'
+            '<div class="date"> 9/21</div>'
+            '<div class="mark"></div>'
+            "</div>\n"
+            "</div>\n"
+        )
+
+    rows = "".join(build_row(article) for article in articles)
+    if announcements:
+        rows += '<div class="r-list-sep"></div>\n'
+        rows += "".join(build_row(announcement) for announcement in announcements)
+
+    return (
+        "<html><body>\n"
+        '<div class="btn-group btn-group-paging">\n'
+        f'<a class="btn wide" href="/bbs/{board}/index1.html">最舊</a>\n'
+        f'<a class="btn wide" href="/bbs/{board}/index{page_idx - 1}.html">&lsaquo; 上頁</a>\n'
+        f'<a class="btn wide" href="/bbs/{board}/index{page_idx + 1}.html">下頁 &rsaquo;</a>\n'
+        f'<a class="btn wide" href="/bbs/{board}/index.html">最新</a>\n'
+        "</div>\n"
+        f'<div class="r-list-container action-bar-margin bbs-screen">\n{rows}</div>\n'
+        "</body></html>\n"
+    )
+
+
+def build_comments(
+    num_comments: int, first_comment_time: datetime = datetime(2023, 9, 21, 0, 21)
+) -> list[dict]:
+    """
+    build comments rotating through 推, → and 噓, one minute apart
+    :param num_comments: number of comments
+    :param first_comment_time: time of the first comment
+    :return: dicts with comment_type, commenter_id, comment_content, commenter_ip and comment_time
+    """
+    comment_types = ["推", "→", "噓"]
+    return [
+        {
+            "comment_type": comment_types[i % 3],
+            "commenter_id": f"commenter{i % 97}",
+            "comment_content": f"第{i}則留言 https://i.imgur.com/Lcc76qV.jpg",
+            "commenter_ip": f"1.200.{i % 256}.97",
+            "comment_time": first_comment_time + timedelta(minutes=i),
+        }
+        for i in range(num_comments)
+    ]
+
+
+def build_push_div(comment: dict) -> str:
+    """
+    :param comment: dict built by build_comments
+    :return: html of one div.push
+    """
+    ip_datetime = comment.get("ip_datetime") or (
+        f'{comment["commenter_ip"]} {comment["comment_time"].strftime("%m/%d %H:%M")}'
+    )
+    return (
+        '<div class="push">'
+        f'<span class="{PUSH_TAG_CLASSES[comment["comment_type"]]}">{comment["comment_type"]} </span>'
+        f'<span class="f3 hl push-userid">{comment["commenter_id"]}</span>'
+        f'<span class="f3 push-content">: {html.escape(comment["comment_content"])}</span>'
+        f'<span class="push-ipdatetime"> {ip_datetime}\n</span>'
+        "</div>"
+    )
+
+
+def build_article_page(
+    comments: list[dict],
+    board: str = "Gossiping",
+    article_id: str = "M.1695226745.A.B50",
+    author: str = "chun0303 (chun)",
+    title: str = "[新聞] 高雄2023萬年季國慶連假登場 重頭戲300",
+    article_time: str = "Thu Sep 21 00:19:03 2023",
+    content: str = "\n1.媒體來源:\n\n自由時報\n\n",
+    ip: str = "111.71.78.224",
+    ending: str | None = None,
+) -> str:
+    """
+    build an article page like https://www.ptt.cc/bbs/Gossiping/M.1695226745.A.B50.html
+    :param comments: dicts built by build_comments
+    :param ending: html between the content and the comments (default: the usual 發信站 line)
+    :return: html
+    """
+    if ending is None:
+        ending = (
+            "--\n"
+            f'<span class="f2">※ 發信站: 批踢踢實業坊(ptt.cc), 來自: {ip} (臺灣)\n</span>'
+            f'<span class="f2">※ 文章網址: <a href="https://www.ptt.cc/bbs/{board}/{article_id}.html" '
+            'target="_blank" rel="noopener noreferrer nofollow">'
+            f"https://www.ptt.cc/bbs/{board}/{article_id}.html</a>\n</span>"
+        )
+    return (
+        '<html><body><div id="main-container">'
+        '<div id="main-content" class="bbs-screen bbs-content">'
+        '<div class="article-metaline"><span class="article-meta-tag">作者</span>'
+        f'<span class="article-meta-value">{author}</span></div>'
+        '<div class="article-metaline-right"><span class="article-meta-tag">看板</span>'
+        f'<span class="article-meta-value">{board}</span></div>'
+        '<div class="article-metaline"><span class="article-meta-tag">標題</span>'
+        f'<span class="article-meta-value">{html.escape(title)}</span></div>'
+        '<div class="article-metaline"><span class="article-meta-tag">時間</span>'
+        f'<span class="article-meta-value">{article_time}</span></div>'
+        f"{html.escape(content)}\n"
+        f"{ending}"
+        f'{"".join(build_push_div(comment) for comment in comments)}'
+        "</div></div></body></html>\n"
+    )
+
+
+def load_ptt_pages(kind: str) -> list[tuple[dict, str]]:
+    """
+    load the recorded pages listed in tests/ptt_pages/manifest.json
+    :param kind: "article" or "index"
+    :return: manifest entries (file, url, case and expected results) with the html of each page
+    """
+    with open(os.path.join(PTT_PAGES_DIR, "manifest.json"), "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+
+    pages = []
+    for entry in manifest:
+        if entry["kind"] == kind:
+            with open(os.path.join(PTT_PAGES_DIR, entry["file"]), "r", encoding="utf-8") as file:
+                pages.append((entry, file.read()))
+    return pages
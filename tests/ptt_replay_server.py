@@ -0,0 +1,232 @@
+"""
+Local stand-in for ptt.cc serving a board built from the recorded pages of tests/ptt_pages.
+Index pages list generated article ids whose html is taken from the recorded articles in turn.
+Run with: python tests/ptt_replay_server.py --port 8765
+and crawl http://127.0.0.1:8765/bbs/Gossiping/index.html
+"""
+import random
+import asyncio
+import argparse
+import threading
+from collections import Counter
+from aiohttp import web
+from mock_ptt_pages import build_index_page, load_ptt_pages
+from utils_crawler.crawl_engine import TokenBucket
+
+
+class ReplayBoard:
+    """
+    board with latest_page index pages of articles_per_page articles each
+    """
+
+    def __init__(self, board: str = "Gossiping", latest_page: int = 39211, articles_per_page: int = 20):
+        """
+        :param board: board name used in the urls
+        :param latest_page: index of the latest page (also served as index.html)
+        :param articles_per_page: number of articles listed on every index page
+        """
+        self.board = board
+        self.latest_page = latest_page
+        self.articles_per_page = articles_per_page
+        self.recorded_articles = load_ptt_pages("article")
+
+    def article_ids(self, page_idx: int) -> list[str]:
+        """
+        :param page_idx: index of the page
+        :return: ids of the articles listed on the page
+        """
+        return [
+            f"M.{1600000000 + page_idx * 100 + position}.A.{position:03X}"
+            for position in range(self.articles_per_page)
+        ]
+
+    def recorded_article(self, article_id: str) -> tuple[dict, str]:
+        """
+        :param article_id: generated article id
+        :return: manifest entry and html of the recorded article served for the id
+        """
+        page_idx, position = divmod(int(article_id.split(".")[1]) - 1600000000, 100)
+        return self.recorded_articles[(page_idx + position) % len(self.recorded_articles)]
+
+    def index_html(self, page_idx: int) -> str:
+        """
+        :param page_idx: index of the page
+        :return: html of the index page
+        """
+        articles = []
+        for article_id in self.article_ids(page_idx):
+            entry, _ = self.recorded_article(article_id)
+            num_of_comment = entry["expected"]["num_of_comment"]
+            articles.append(
+                {
+                    "article_id": article_id,
+                    "title": f"[問卦] {entry['case']}",
+                    "author": "replay",
+                    "nrec": "爆" if num_of_comment >= 100 else str(num_of_comment),
+                }
+            )
+        return build_index_page(self.board, page_idx, articles)
+
+    def article_html(self, article_id: str) -> str:
+        """
+        :param article_id: generated article id
+        :return: html of the article
+        """
+        return self.recorded_article(article_id)[1]
+
+
+class PttReplayServer:
+    """
+    aiohttp app serving a ReplayBoard with the over18 cookie flow, latency, server errors and throttling
+    """
+
+    def __init__(
+        self,
+        board: ReplayBoard,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        requests_per_second: float | None = None,
+        burst: float = 5,
+        throttle_status: int = 503,
+        seed: int = 0,
+    ):
+        """
+        :param board: board to serve
+        :param latency: seconds added to every response
+        :param latency_jitter: maximum random seconds added on top of latency
+        :param error_rate: probability of answering 503 instead of the page
+        :param requests_per_second: requests allowed per second before throttling (None for no throttling)
+        :param burst: requests allowed at once before throttling
+        :param throttle_status: status code answered to throttled requests
+        :param seed: seed of the random latency and errors
+        """
+        self.board = board
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.throttle_status = throttle_status
+        self.bucket = (
+            TokenBucket(rate=requests_per_second, capacity=burst)
+            if requests_per_second
+            else None
+        )
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+        self._runner: web.AppRunner | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/ask/over18", self.handle_over18_form)
+        app.router.add_post("/ask/over18", self.handle_over18)
+        app.router.add_get("/bbs/{board}/index.html", self.handle_latest_index)
+        app.router.add_get(r"/bbs/{board}/index{page_idx:\d+}.html", self.handle_index)
+        app.router.add_get(r"/bbs/{board}/{article_id:M\.[^/]+}.html", self.handle_article)
+        return app
+
+    async def respond(self, request: web.Request, kind: str, build_html) -> web.Response:
+        """
+        answer a board page like ptt does: redirect to the over18 form first, then maybe fail, then serve
+        :param request: request
+        :param kind: "index" or "article" (for the stats)
+        :param build_html: callable building the page html
+        :return: response
+        """
+        self.stats["requests"] += 1
+        if request.cookies.get("over18") != "1":
+            self.stats["over18_redirects"] += 1
+            raise web.HTTPFound(f"/ask/over18?from={request.path}")
+
+        if self.bucket is not None and self.bucket.try_acquire() > 0:
+            self.stats["throttled"] += 1
+            return web.Response(status=self.throttle_status, text="Too many requests")
+
+        await asyncio.sleep(self.latency + self.rng.uniform(0, self.latency_jitter))
+        if self.rng.random() < self.error_rate:
+            self.stats["server_errors"] += 1
+            return web.Response(status=503, text="Service Unavailable")
+
+        self.stats[f"{kind}_pages"] += 1
+        return web.Response(text=build_html(), content_type="text/html")
+
+    async def handle_over18_form(self, request: web.Request) -> web.Response:
+        self.stats["requests"] += 1
+        return web.Response(text="<form action='/ask/over18' method='post'></form>", content_type="text/html")
+
+    async def handle_over18(self, request: web.Request) -> web.Response:
+        self.stats["requests"] += 1
+        self.stats["over18_handshakes"] += 1
+        form = await request.post()
+        response = web.Response(text="ok")
+        if form.get("yes") == "yes":
+            response.set_cookie("over18", "1", path="/")
+        return response
+
+    async def handle_latest_index(self, request: web.Request) -> web.Response:
+        return await self.respond(
+            request, "index", lambda: self.board.index_html(self.board.latest_page)
+        )
+
+    async def handle_index(self, request: web.Request) -> web.Response:
+        page_idx = int(request.match_info["page_idx"])
+        if not 1 <= page_idx <= self.board.latest_page:
+            raise web.HTTPNotFound()
+        return await self.respond(request, "index", lambda: self.board.index_html(page_idx))
+
+    async def handle_article(self, request: web.Request) -> web.Response:
+        return await self.respond(
+            request, "article", lambda: self.board.article_html(request.match_info["article_id"])
+        )
+
+    def start_in_background(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        serve from a daemon thread with its own event loop, so the crawler can call asyncio.run
+        :param host: host to bind
+        :param port: port to bind (0 for a free port)
+        :return: url of the board's latest index page
+        """
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            self._runner = web.AppRunner(self.create_app())
+            self._loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, host, port)
+            self._loop.run_until_complete(site.start())
+            started.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=serve, daemon=True).start()
+        started.wait()
+        bound_port = self._runner.addresses[0][1]
+        return f"http://{host}:{bound_port}/bbs/{self.board.board}/index.html"
+
+    def stop(self):
+        """
+        stop a server started with start_in_background
+        """
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="serve a recorded ptt board locally")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--board", default="Gossiping")
+    parser.add_argument("--latest-page", type=int, default=39211)
+    parser.add_argument("--articles-per-page", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--requests-per-second", type=float, default=None)
+    args = parser.parse_args()
+
+    server = PttReplayServer(
+        board=ReplayBoard(args.board, args.latest_page, args.articles_per_page),
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        requests_per_second=args.requests_per_second,
+    )
+    web.run_app(server.create_app(), port=args.port)
@@ -0,0 +1,26 @@
+"""
+Record the pages listed in tests/ptt_pages/manifest.json again from ptt.cc.
+Run from the repository root: python tests/record_ptt_pages.py
+The expected results in the manifest have to be checked after recording.
+"""
+import os
+import time
+import requests
+from loguru import logger
+from fake_useragent import UserAgent
+from mock_ptt_pages import PTT_PAGES_DIR, load_ptt_pages
+
+ua = UserAgent()
+current_session = requests.session()
+current_session.cookies.set("over18", "1", domain="www.ptt.cc")
+
+for kind in ["article", "index"]:
+    for entry, _ in load_ptt_pages(kind):
+        response = current_session.get(entry["url"], headers={"user-agent": ua.random})
+        if response.status_code == 200:
+            with open(os.path.join(PTT_PAGES_DIR, entry["file"]), "w", encoding="utf-8") as file:
+                file.write(response.text)
+            logger.info(f"Recorded: {entry['url']} -> {entry['file']}")
+        else:
+            logger.error(f"Failed to record {entry['url']}: HTTP Status Code {response.status_code}")
+        time.sleep(1)
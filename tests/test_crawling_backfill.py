@@ -0,0 +1,51 @@
+from utils_crawler.backfill import next_page_idx, plan_shards, summarize_progress
+
+LATEST_PAGE = 39211
+
+
+def build_checkpoint(first_page_idx, last_page_idx, last_completed_page_idx, started_datetime=0):
+    return {
+        "first_page_idx": first_page_idx,
+        "last_page_idx": last_page_idx,
+        "last_completed_page_idx": last_completed_page_idx,
+        "started_datetime": started_datetime,
+    }
+
+
+def test_plan_shards_covers_range_with_absolute_page_indices():
+    shards = plan_shards(LATEST_PAGE, 5, 5000, pages_per_shard=1000)
+    assert shards[0] == {"shard": 0, "first_page_idx": 39207, "last_page_idx": 38208}
+    assert shards[-1] == {"shard": 4, "first_page_idx": 35207, "last_page_idx": 34213}
+    assert sum(s["first_page_idx"] - s["last_page_idx"] + 1 for s in shards) == 5000 - 5
+
+
+def test_plan_shards_stops_at_first_page_of_board():
+    shards = plan_shards(LATEST_PAGE, 5000, 40000, pages_per_shard=1000)
+    assert shards[-1]["last_page_idx"] == 1
+    assert sum(s["first_page_idx"] - s["last_page_idx"] + 1 for s in shards) == 34212
+
+
+def test_next_page_idx_resumes_after_checkpoint():
+    assert next_page_idx(build_checkpoint(100, 51, None)) == 100
+    assert next_page_idx(build_checkpoint(100, 51, 80)) == 79
+
+
+def test_summarize_progress_reports_throughput_and_eta():
+    checkpoints = [
+        build_checkpoint(100, 51, 71),
+        build_checkpoint(50, 1, 1),
+        build_checkpoint(0, -49, None, started_datetime=60),
+    ]
+    progress = summarize_progress(checkpoints, now=600)
+    assert progress["backfill_shards"] == 3
+    assert progress["backfill_shards_completed"] == 1
+    assert progress["backfill_pages_total"] == 150
+    assert progress["backfill_pages_done"] == 80
+    assert progress["backfill_pages_per_minute"] == 8.0
+    assert progress["backfill_eta_minutes"] == 8.8
+
+
+def test_summarize_progress_without_pages_done_has_no_eta():
+    progress = summarize_progress([build_checkpoint(100, 51, None)], now=600)
+    assert progress["backfill_pages_done"] == 0
+    assert progress["backfill_eta_minutes"] is None
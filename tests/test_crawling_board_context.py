@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+from utils_crawler.retry_policy import OUTCOME_OK, AttemptRecorder
+from utils_crawler.board_context import BoardCrawlContext, classify_request
+
+BASE_URL = "https://www.ptt.cc/bbs/Gossiping/index.html"
+LATEST_PAGE = 39211
+
+
+def build_board(urls: list[str] = ()) -> BoardCrawlContext:
+    recorder = AttemptRecorder()
+    for url in urls:
+        recorder.record(url, 1, OUTCOME_OK, 200, 0.1)
+    return BoardCrawlContext(SimpleNamespace(recorder=recorder), BASE_URL, LATEST_PAGE)
+
+
+def test_classify_request():
+    assert classify_request(BASE_URL) == "index"
+    assert classify_request("https://www.ptt.cc/bbs/Gossiping/index39210.html") == "index"
+    assert classify_request("https://www.ptt.cc/bbs/Gossiping/M.1695226745.A.B50.html") == "article"
+    assert classify_request("https://www.ptt.cc/ask/over18") == "over18"
+
+
+def test_generation_and_page_idx_are_inverse():
+    board = build_board()
+    assert board.page_idx(1) == LATEST_PAGE
+    assert board.page_idx(5) == LATEST_PAGE - 4
+    assert board.generation(board.page_idx(5000)) == 5000
+
+
+def test_page_url_uses_board_url_for_latest_page():
+    board = build_board()
+    assert board.page_url(LATEST_PAGE) == BASE_URL
+    assert board.page_url(27975) == "https://www.ptt.cc/bbs/Gossiping/index27975.html"
+
+
+def test_request_counts_by_kind():
+    board = build_board(
+        [
+            BASE_URL,
+            "https://www.ptt.cc/ask/over18",
+            "https://www.ptt.cc/bbs/Gossiping/index39210.html",
+            "https://www.ptt.cc/bbs/Gossiping/M.1695226745.A.B50.html",
+            "https://www.ptt.cc/bbs/Gossiping/M.1695226746.A.B51.html",
+        ]
+    )
+    assert board.request_counts() == {"index": 2, "article": 2, "over18": 1}
+    assert board.request_counts(since=3) == {"index": 0, "article": 2, "over18": 0}
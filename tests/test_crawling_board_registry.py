@@ -0,0 +1,52 @@
+import pytest
+from datetime import timedelta
+from utils_crawler.board_registry import (
+    CRAWL_FROM_LATEST_TO_MIDDLE,
+    CRAWL_FROM_MIDDLE_TO_ANCIENT,
+    CRAWL_FROM_ANCIENT_TO_EARLIEST,
+    CRAWL_RECRAWL_BY_VELOCITY,
+    PttBoard,
+    find_board,
+)
+
+
+def test_find_board_by_board_page_or_article_url():
+    assert find_board("https://www.ptt.cc/bbs/Gossiping/index.html").collection == "gossip"
+    assert find_board("https://www.ptt.cc/bbs/gossiping/index39000.html").collection == "gossip"
+    assert find_board("http://127.0.0.1:8080/bbs/HatePolitics/M.1695225366.A.8F4.html").collection == "politics"
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://www.ptt.cc/bbs/Stock/index.html",
+        "https://www.ptt.cc/ask/over18",
+        "https://www.ptt.cc/bbs/",
+    ],
+)
+def test_find_board_rejects_unregistered_boards(url: str):
+    with pytest.raises(ValueError):
+        find_board(url)
+
+
+def test_board_names_keep_the_dag_ids_and_loggers():
+    gossip = find_board("https://www.ptt.cc/bbs/Gossiping/index.html")
+    assert gossip.url == "https://www.ptt.cc/bbs/Gossiping/index.html"
+    assert gossip.dag_id(CRAWL_FROM_MIDDLE_TO_ANCIENT) == "crawl_ptt_gossips_from_middle_to_ancient"
+    assert gossip.dag_id(CRAWL_RECRAWL_BY_VELOCITY) == "recrawl_ptt_gossips_by_velocity"
+    assert gossip.logger_name_of(CRAWL_RECRAWL_BY_VELOCITY) == "logger_gossip_recrawl_by_velocity"
+
+
+def test_board_generations_and_schedules():
+    board = PttBoard(
+        board="Stock",
+        collection="stock",
+        dag_name="stock",
+        logger_name="stock",
+        schedules={CRAWL_FROM_ANCIENT_TO_EARLIEST: None},
+        page_generations=(1, 3, 100, 200),
+    )
+    assert board.generations(CRAWL_FROM_LATEST_TO_MIDDLE) == (1, 3)
+    assert board.generations(CRAWL_FROM_ANCIENT_TO_EARLIEST) == (100, 200)
+    assert board.schedules[CRAWL_FROM_MIDDLE_TO_ANCIENT] == timedelta(days=1)
+    assert board.schedules[CRAWL_FROM_ANCIENT_TO_EARLIEST] is None
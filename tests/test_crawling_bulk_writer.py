@@ -0,0 +1,88 @@
+from pymongo import UpdateOne
+from pymongo.results import BulkWriteResult
+from utils_crawler.bulk_writer import ArticleBulkWriter, build_article_update
+from mock_data import mock_new_data_for_checking_updating
+
+ARTICLE_URL = "https://www.ptt.cc/bbs/Gossiping/M.1695226745.A.B50.html"
+
+
+class RecordingCollection:
+    name = "testing_collection"
+
+    def __init__(self):
+        self.calls = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.calls.append((operations, ordered))
+        upserts = [is_article_upsert(op) for op in operations]
+        return BulkWriteResult(
+            {
+                "nUpserted": sum(upserts),
+                "nModified": upserts.count(False),
+                "upserted": [
+                    {"index": index, "_id": index} for index, upsert in enumerate(upserts) if upsert
+                ],
+            },
+            True,
+        )
+
+
+def is_article_upsert(operation: UpdateOne) -> bool:
+    return "$setOnInsert" in operation._doc
+
+
+def test_build_article_update_pushes_all_new_comments_at_once():
+    new_comments = mock_new_data_for_checking_updating["comments"][2:]
+    query, update = build_article_update(
+        ARTICLE_URL, mock_new_data_for_checking_updating, new_comments
+    )
+    assert query == {"article_url": ARTICLE_URL}
+    assert update["$set"]["article_data.num_of_comment"] == 7
+    assert update["$push"] == {"article_data.comments": {"$each": new_comments}}
+
+
+def test_build_article_update_without_new_comments_only_sets_counters():
+    _, update = build_article_update(ARTICLE_URL, mock_new_data_for_checking_updating, [])
+    assert "$push" not in update
+
+
+def test_writer_flushes_page_window_with_one_unordered_bulk_write():
+    collection = RecordingCollection()
+    writer = ArticleBulkWriter(collection, flush_every_pages=2)
+
+    writer.add_inserts([{"article_url": "a"}, {"article_url": "b"}])
+    writer.add_update(ARTICLE_URL, mock_new_data_for_checking_updating, [])
+    writer.page_done()
+    assert collection.calls == []
+
+    writer.page_done()
+    assert len(collection.calls) == 1
+    operations, ordered = collection.calls[0]
+    assert len(operations) == 3
+    assert ordered is False
+
+
+def test_flush_reports_counts():
+    collection = RecordingCollection()
+    writer = ArticleBulkWriter(collection)
+    writer.add_inserts([{"article_url": "a"}])
+    writer.add_update(ARTICLE_URL, mock_new_data_for_checking_updating, [])
+
+    report = writer.flush()
+    assert report["bulk_write_operations"] == 2
+    assert report["bulk_write_inserted"] == 1
+    assert report["bulk_write_modified"] == 1
+    assert writer.flush() == {}
+
+
+def test_inserts_are_upserts_keyed_on_article_url():
+    collection = RecordingCollection()
+    writer = ArticleBulkWriter(collection)
+    article = {"article_url": "a", "article_data": {"title": "t"}}
+    writer.add_inserts([article])
+    writer.flush()
+
+    operation = collection.calls[0][0][0]
+    assert operation._filter == {"article_url": "a"}
+    assert operation._doc == {"$setOnInsert": article}
+    assert operation._upsert is True
@@ -0,0 +1,44 @@
+from utils_crawler.change_detection import (
+    build_index_signal,
+    build_index_signature,
+    should_refetch,
+)
+
+TITLE = "[新聞] 高雄2023萬年季國慶連假登場 重頭戲300"
+MAX_STALENESS = 3600
+
+
+def test_refetch_if_article_has_no_stored_signal():
+    assert should_refetch("5", TITLE, None, now=0, max_staleness=MAX_STALENESS)
+
+
+def test_skip_if_row_is_unchanged_and_recently_checked():
+    stored_signal = build_index_signal("5", TITLE, checked_datetime=1000)
+    assert not should_refetch(
+        "5", TITLE, stored_signal, now=1600, max_staleness=MAX_STALENESS
+    )
+
+
+def test_refetch_if_push_count_or_title_changed():
+    stored_signal = build_index_signal("5", TITLE, checked_datetime=1000)
+    assert should_refetch("6", TITLE, stored_signal, now=1600, max_staleness=MAX_STALENESS)
+    assert should_refetch(
+        "5", f"Re: {TITLE}", stored_signal, now=1600, max_staleness=MAX_STALENESS
+    )
+
+
+def test_refetch_if_push_count_is_saturated():
+    stored_signal = build_index_signal("爆", TITLE, checked_datetime=1000)
+    assert should_refetch("爆", TITLE, stored_signal, now=1001, max_staleness=MAX_STALENESS)
+    assert should_refetch("XX", TITLE, stored_signal, now=1001, max_staleness=MAX_STALENESS)
+
+
+def test_refetch_if_signal_is_stale():
+    stored_signal = build_index_signal("5", TITLE, checked_datetime=1000)
+    assert should_refetch(
+        "5", TITLE, stored_signal, now=1000 + MAX_STALENESS, max_staleness=MAX_STALENESS
+    )
+
+
+def test_signature_contains_push_count_and_title():
+    assert build_index_signature("", TITLE) != build_index_signature("1", TITLE)
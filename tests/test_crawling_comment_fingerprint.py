@@ -0,0 +1,79 @@
+from mock_ptt_pages import build_article_page, build_comments
+from src.crawler.dags.dag_crawling import parse_article_html, parse_article_update
+from utils_crawler.bulk_writer import build_article_update
+from utils_crawler.comment_fingerprint import (
+    COMMENT_FINGERPRINT_TAIL,
+    comment_fingerprint,
+    locate_unseen_comments,
+)
+
+ARTICLE_URL = "https://www.ptt.cc/bbs/Gossiping/M.1695226745.A.B50.html"
+COMMENTS = build_comments(50)
+
+
+def stored_tail(num_stored_comments: int) -> list[str]:
+    return parse_article_html(build_article_page(COMMENTS[:num_stored_comments]))[
+        "comment_fingerprints"
+    ]
+
+
+def test_fingerprints_tell_comments_apart_and_survive_a_new_parse():
+    comments = parse_article_html(build_article_page(COMMENTS))["comments"]
+    fingerprints = [comment_fingerprint(comment) for comment in comments]
+    assert len(set(fingerprints)) == 50
+    assert fingerprints == [
+        comment_fingerprint(comment)
+        for comment in parse_article_html(build_article_page(COMMENTS))["comments"]
+    ]
+    assert comment_fingerprint({**comments[0], "comment_content": "噓"}) != fingerprints[0]
+
+
+def test_new_comments_start_after_the_stored_tail_when_the_count_drifted():
+    full_result = parse_article_html(build_article_page(COMMENTS))
+    # the stored count says 43 but the first 45 comments are stored
+    update_result = parse_article_update(
+        build_article_page(COMMENTS), previous_num_comments=43, stored_fingerprints=stored_tail(45)
+    )
+    assert update_result["comments"] == full_result["comments"][45:]
+    assert update_result["comment_fingerprints"] == full_result["comment_fingerprints"]
+    assert len(update_result["comment_fingerprints"]) == COMMENT_FINGERPRINT_TAIL
+
+
+def test_a_removed_comment_does_not_hide_a_new_one():
+    tail = stored_tail(45)
+    page = build_article_page(COMMENTS[:10] + COMMENTS[11:])
+
+    update_result = parse_article_update(page, previous_num_comments=45, stored_fingerprints=tail)
+    assert [comment["comment_content"] for comment in update_result["comments"]] == [
+        comment["comment_content"] for comment in COMMENTS[45:]
+    ]
+
+
+def test_articles_without_a_tail_are_updated_by_comment_count():
+    full_result = parse_article_html(build_article_page(COMMENTS))
+    update_result = parse_article_update(build_article_page(COMMENTS), previous_num_comments=45)
+    assert update_result["comments"] == full_result["comments"][45:]
+    assert update_result["comment_fingerprints"] == full_result["comment_fingerprints"]
+
+
+def test_identical_comments_are_matched_where_the_count_expects_them():
+    assert locate_unseen_comments(["x", "a", "a", "a"], ["x", "a", "a"], 3) == 3
+    assert locate_unseen_comments(["a", "a"], ["a"], 1) == 1
+    assert locate_unseen_comments(["b", "c"], ["a"], 1) is None
+    assert locate_unseen_comments(["b", "c"], [], 0) == 0
+
+
+def test_comments_are_appended_against_the_stored_tail():
+    new_data = parse_article_update(
+        build_article_page(COMMENTS), previous_num_comments=45, stored_fingerprints=stored_tail(45)
+    )
+    query, update = build_article_update(
+        ARTICLE_URL,
+        new_data,
+        new_data["comments"],
+        previous_num_comments=45,
+        previous_fingerprints=stored_tail(45),
+    )
+    assert query == {"article_url": ARTICLE_URL, "article_data.comment_fingerprints": stored_tail(45)}
+    assert len(update["$push"]["article_data.comments"]["$each"]) == 5
+    assert update["$set"]["article_data.comment_fingerprints"] == new_data["comment_fingerprints"]
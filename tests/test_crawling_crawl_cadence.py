@@ -0,0 +1,57 @@
+from utils_crawler.crawl_cadence import is_due, observe_run, plan_pages
+
+CADENCE = {
+    "smoothing": 0.5,
+    "target_articles_per_run": 40,
+    "min_interval": 120,
+    "max_interval": 3600,
+}
+
+
+def state_after(latest_page: int, new_articles: int, started_datetime: float, state: dict | None = None) -> dict:
+    return observe_run(state, latest_page, 4, new_articles, started_datetime, **CADENCE)
+
+
+def test_runs_cover_the_pages_turned_over_since_the_previous_one():
+    assert plan_pages(None, 1000, default_pages=4, min_pages=2, max_pages=20) == 4
+    state = state_after(1000, 80, 0)
+    assert plan_pages(state, 1000, default_pages=4, min_pages=2, max_pages=20) == 2
+    assert plan_pages(state, 1005, default_pages=4, min_pages=2, max_pages=20) == 6
+    assert plan_pages(state, 1100, default_pages=4, min_pages=2, max_pages=20) == 20
+
+
+def test_the_first_run_does_not_measure_the_arrival_rate():
+    state = state_after(1000, 80, 0)
+    assert state["articles_per_minute"] is None
+    assert state["next_run_datetime"] == 120
+
+
+def test_busy_boards_run_often_and_quiet_ones_rarely():
+    first = state_after(1000, 80, 0)
+    busy = state_after(1010, 200, 600, first)
+    assert busy["articles_per_minute"] == 20
+    assert busy["pages_per_minute"] == 1
+    assert busy["interval_seconds"] == 120
+
+    quiet = state_after(1000, 0, 600, first)
+    assert quiet["interval_seconds"] == 3600
+
+    # 40 articles wanted per run at 4 articles per minute
+    steady = state_after(1002, 40, 600, first)
+    assert steady["interval_seconds"] == 600
+
+
+def test_arrival_rates_are_smoothed_across_runs():
+    first = state_after(1000, 80, 0)
+    second = state_after(1002, 40, 600, first)
+    third = state_after(1004, 160, 1200, second)
+    assert third["articles_per_minute"] == 4 + 0.5 * (16 - 4)
+    assert third["interval_seconds"] == 40 / 10 * 60
+    assert third["next_run_datetime"] == 1200 + 240
+
+
+def test_runs_are_due_from_the_next_run_datetime():
+    state = state_after(1002, 40, 600, state_after(1000, 80, 0))
+    assert is_due(None, now=0, tolerance=30)
+    assert not is_due(state, now=1169, tolerance=30)
+    assert is_due(state, now=1170, tolerance=30)
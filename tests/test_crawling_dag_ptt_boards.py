@@ -0,0 +1,105 @@
+import os
+import sys
+import subprocess
+from utils_crawler.board_registry import (
+    BOARDS,
+    CRAWL_FROM_MIDDLE_TO_ANCIENT,
+    CRAWL_FROM_ANCIENT_TO_EARLIEST,
+    PttBoard,
+)
+from src.crawler.dags import dag_ptt_boards
+
+DAGS_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "crawler", "dags")
+
+
+def test_dags_are_generated_for_every_registered_board():
+    dag_ids = {
+        board.dag_id(crawl) for board in BOARDS for crawl, schedule in board.schedules.items() if schedule
+    }
+    assert "crawl_ptt_politic_from_latest_to_middle" in dag_ids
+    for dag_id in dag_ids:
+        assert getattr(dag_ptt_boards, dag_id).dag_id == dag_id
+
+
+def test_boards_without_a_schedule_get_no_dag():
+    board = PttBoard(
+        board="Stock",
+        collection="stock",
+        dag_name="stock",
+        logger_name="stock",
+        schedules={CRAWL_FROM_MIDDLE_TO_ANCIENT: None, CRAWL_FROM_ANCIENT_TO_EARLIEST: None},
+        rate_weight=0.5,
+    )
+    dags = dag_ptt_boards.create_board_dags(board)
+    assert [dag.dag_id for dag in dags] == [
+        "crawl_ptt_stock_from_latest_to_middle",
+        "recrawl_ptt_stock_by_velocity",
+    ]
+    assert dags[0].get_task("crawl").op_kwargs["rate_weight"] == 0.5
+
+
+def test_latest_pages_are_crawled_when_their_cadence_is_due():
+    dag = getattr(dag_ptt_boards, "crawl_ptt_politic_from_latest_to_middle")
+    check_cadence = dag.get_task("check_cadence")
+    assert check_cadence.op_args == [dag.dag_id]
+    assert dag.get_task("crawl").upstream_task_ids == {"ensure_unique_article_url"}
+    assert dag.get_task("ensure_unique_article_url").upstream_task_ids == {"check_cadence"}
+    assert dag.get_task("crawl").op_args[3] == dag.dag_id
+    assert dag.max_active_runs == 1
+
+
+def test_backfills_of_boards_with_frontier_workers_pull_from_the_frontier():
+    board = PttBoard(
+        board="Stock", collection="stock", dag_name="stock", logger_name="stock", frontier_workers=3
+    )
+    dags = {dag.dag_id: dag for dag in dag_ptt_boards.create_board_dags(board)}
+
+    backfill = dags["crawl_ptt_stock_from_middle_to_ancient"]
+    assert backfill.get_task("plan_frontier").op_args[-1] == 3
+    assert backfill.has_task("crawl_frontier")
+    assert dags["crawl_ptt_stock_from_latest_to_middle"].has_task("crawl")
+
+def test_gossiping_backfills_pull_from_the_frontier_only_when_enabled():
+    script = (
+        "import dag_ptt_boards; "
+        "print(dag_ptt_boards.crawl_ptt_gossips_from_middle_to_ancient.has_task('plan_frontier'))"
+    )
+    environment = {
+        key: value for key, value in os.environ.items() if key != "PTT_GOSSIPING_FRONTIER_WORKERS"
+    }
+    for frontier_workers, pulls_from_frontier in ((None, "False"), ("4", "True")):
+        if frontier_workers is not None:
+            environment["PTT_GOSSIPING_FRONTIER_WORKERS"] = frontier_workers
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=DAGS_DIR,
+            env=environment,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert result.stdout.strip().splitlines()[-1] == pulls_from_frontier
+
+
+def test_parsing_the_dags_does_not_import_the_crawler():
+    heavy_modules = ["dag_crawling", "pymongo", "bs4", "aiohttp", "fake_useragent", "google.cloud.logging"]
+    script = (
+        "import sys, dag_ptt_boards; "
+        f"print([module for module in {heavy_modules!r} if module in sys.modules])"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=DAGS_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_crawler_tasks_get_the_context_they_take():
+    task = dag_ptt_boards.crawler_task("decide_ptt_board")
+    collection = task(
+        "https://www.ptt.cc/bbs/Gossiping/index.html", run_id="manual", ti=None, rate_weight=1.0
+    )
+    assert collection == "gossip"
@@ -1,5 +1,13 @@
+import pytest
+from pymongo.errors import DuplicateKeyError
 from config import db, TARGET_COLLECTION
-from src.crawler.dags.dag_crawling import delete_duplicates
+from src.crawler.dags.dag_crawling import (
+    delete_duplicates,
+    ensure_article_url_index,
+    has_article_url_index,
+)
+
+UNIQUE_INDEX_COLLECTION = "testing_collection_unique_article_url"
 
 
 def test_delete_duplicates_with_duplicates():
@@ -70,3 +78,30 @@ def test_delete_duplicates_no_duplicates():
         == 1
     )
     db[TARGET_COLLECTION].delete_many({"_id": {"$regex": "^not_duplicate_"}})
+
+
+def test_ensure_article_url_index_deletes_duplicates_and_builds_index():
+    db[UNIQUE_INDEX_COLLECTION].drop()
+    db[UNIQUE_INDEX_COLLECTION].insert_many(
+        [
+            {"_id": "unique_1", "article_url": "https://www.ptt.cc/bbs/HatePolitics/M.1695225784.A.A25.html"},
+            {"_id": "unique_2", "article_url": "https://www.ptt.cc/bbs/HatePolitics/M.1695225784.A.A25.html"},
+            {"_id": "unique_3", "article_url": "https://www.ptt.cc/bbs/HatePolitics/M.1695225784.A.A99.html"},
+        ]
+    )
+    assert not has_article_url_index(UNIQUE_INDEX_COLLECTION)
+
+    ensure_article_url_index(UNIQUE_INDEX_COLLECTION)
+    assert has_article_url_index(UNIQUE_INDEX_COLLECTION)
+    assert sorted(document["_id"] for document in db[UNIQUE_INDEX_COLLECTION].find()) == [
+        "unique_1",
+        "unique_3",
+    ]
+    with pytest.raises(DuplicateKeyError):
+        db[UNIQUE_INDEX_COLLECTION].insert_one(
+            {"article_url": "https://www.ptt.cc/bbs/HatePolitics/M.1695225784.A.A25.html"}
+        )
+
+    # afterwards only the index is checked
+    ensure_article_url_index(UNIQUE_INDEX_COLLECTION)
+    db[UNIQUE_INDEX_COLLECTION].drop()
@@ -0,0 +1,30 @@
+from config import db, TARGET_COLLECTION
+from src.crawler.dags.dag_crawling import get_articles_num_of_comments
+from mock_data import mock_data_for_checking_getting_num_comments
+
+
+ARTICLE_URL = mock_data_for_checking_getting_num_comments["article_url"]
+MISSING_ARTICLE_URL = "https://www.ptt.cc/bbs/Gossiping/M.1695226745.A.B51.html"
+
+
+def test_get_articles_num_of_comments():
+    db[TARGET_COLLECTION].insert_one(mock_data_for_checking_getting_num_comments)
+
+    result = get_articles_num_of_comments(
+        article_urls=[ARTICLE_URL, MISSING_ARTICLE_URL],
+        target_collection=TARGET_COLLECTION,
+    )
+    assert result == {
+        ARTICLE_URL: mock_data_for_checking_getting_num_comments["article_data"][
+            "num_of_comment"
+        ]
+    }
+
+    db[TARGET_COLLECTION].delete_one({"_id": "getting_num_comments"})
+
+
+def test_get_articles_num_of_comments_without_existing_articles():
+    result = get_articles_num_of_comments(
+        article_urls=[MISSING_ARTICLE_URL], target_collection=TARGET_COLLECTION
+    )
+    assert result == {}
@@ -0,0 +1,104 @@
+import os
+from pymongo.results import BulkWriteResult
+from mock_ptt_pages import load_ptt_pages
+from utils_crawler.html_archive import CODEC_ZLIB, HtmlArchive
+from utils_crawler.reparse import reparse_archive
+from src.crawler.dags.dag_crawling import parse_article_html
+
+ARTICLE_URL = "https://www.ptt.cc/bbs/Gossiping/M.1695226745.A.B50.html"
+
+
+class RecordingCollection:
+    name = "testing_collection"
+
+    def __init__(self):
+        self.operations = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.operations.extend(operations)
+        return BulkWriteResult(
+            {"nMatched": len(operations), "nModified": 0, "upserted": []}, True
+        )
+
+
+def test_archive_round_trip_and_deduplicates_content(tmp_path):
+    with HtmlArchive(str(tmp_path), codec=CODEC_ZLIB) as archive:
+        digest = archive.add(ARTICLE_URL, "<html>推</html>", crawled_datetime=1)
+        assert archive.add(ARTICLE_URL, "<html>推</html>", crawled_datetime=2) == digest
+        assert archive.read(digest) == "<html>推</html>"
+        assert archive.latest_fetches() == [(ARTICLE_URL, 2, digest)]
+
+    segments = [name for name in os.listdir(tmp_path) if name.endswith(".seg")]
+    assert len(segments) == 1
+
+
+def test_archive_starts_new_segment_when_full(tmp_path):
+    with HtmlArchive(str(tmp_path), codec=CODEC_ZLIB, segment_max_bytes=1) as archive:
+        first = archive.add("a", "<html>a</html>", crawled_datetime=1)
+        second = archive.add("b", "<html>b</html>", crawled_datetime=1)
+        assert archive.read(first) == "<html>a</html>"
+        assert archive.read(second) == "<html>b</html>"
+
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".seg")]) == 2
+
+
+def test_latest_fetches_since(tmp_path):
+    with HtmlArchive(str(tmp_path), codec=CODEC_ZLIB) as archive:
+        archive.add("a", "<html>a1</html>", crawled_datetime=1)
+        archive.add("a", "<html>a2</html>", crawled_datetime=5)
+        archive.add("b", "<html>b</html>", crawled_datetime=2)
+        fetches = archive.latest_fetches(since=3)
+
+        assert [(url, crawled_datetime) for url, crawled_datetime, _ in fetches] == [("a", 5)]
+        assert archive.read(fetches[0][2]) == "<html>a2</html>"
+
+
+def test_fetch_history_lists_distinct_pages_latest_first(tmp_path):
+    with HtmlArchive(str(tmp_path), codec=CODEC_ZLIB) as archive:
+        first = archive.add("a", "<html>a1</html>", crawled_datetime=1)
+        second = archive.add("a", "<html>a2</html>", crawled_datetime=3)
+        archive.add("a", "<html>a1</html>", crawled_datetime=4)
+        archive.add("b", "<html>b</html>", crawled_datetime=2)
+
+        assert archive.fetch_history(since=3) == [("a", [(4, first), (3, second)])]
+
+
+def test_reparse_sets_article_data_from_archive(tmp_path):
+    pages = load_ptt_pages("article")[:4]
+    with HtmlArchive(str(tmp_path)) as archive:
+        for entry, page_html in pages:
+            archive.add(entry["url"], page_html, crawled_datetime=100)
+
+    collection = RecordingCollection()
+    report = reparse_archive(
+        str(tmp_path), collection, parse_article_html, workers=2, chunk_size=1, write_batch=3
+    )
+
+    assert report["articles"] == 4
+    assert report["matched"] == 4
+    operations = {operation._filter["article_url"]: operation for operation in collection.operations}
+    for entry, page_html in pages:
+        article_data = operations[entry["url"]]._doc["$set"]["article_data"]
+        assert article_data["last_crawled_datetime"] == 100
+        assert article_data["num_of_comment"] == parse_article_html(page_html)["num_of_comment"]
+        assert operations[entry["url"]]._upsert is False
+
+
+def test_reparse_passes_over_pages_that_are_not_articles(tmp_path):
+    (entry, page_html), (deleted_entry, deleted_html) = load_ptt_pages("article")[:2]
+    not_found_html = "<html><body><div class='bbs-screen'>404 - Not Found.</div></body></html>"
+    with HtmlArchive(str(tmp_path)) as archive:
+        archive.add(entry["url"], page_html, crawled_datetime=100)
+        archive.add(entry["url"], not_found_html, crawled_datetime=200)
+        archive.add(deleted_entry["url"], not_found_html, crawled_datetime=200)
+
+    collection = RecordingCollection()
+    report = reparse_archive(str(tmp_path), collection, parse_article_html, workers=1)
+
+    assert report["articles"] == 2
+    assert report["skipped"] == 1
+    [operation] = collection.operations
+    assert operation._filter == {"article_url": entry["url"]}
+    article_data = operation._doc["$set"]["article_data"]
+    assert article_data["last_crawled_datetime"] == 100
+    assert article_data["title"] == parse_article_html(page_html)["title"]
@@ -0,0 +1,89 @@
+import pytest
+from bs4 import BeautifulSoup
+from mock_ptt_pages import build_article_page, build_comments, build_index_page
+from utils_crawler.page_parser import (
+    BACKEND_LXML,
+    BACKEND_SOUP,
+    LxmlPttPage,
+    SoupPttPage,
+    load_page,
+)
+import src.crawler.dags.dag_crawling as dag_crawling
+
+
+def build_edge_case_comments() -> list[dict]:
+    comments = build_comments(8)
+    comments[1]["comment_content"] = "a & b <c>"
+    comments[2]["ip_datetime"] = "1.2.3.4 09/21 0"
+    comments[3]["ip_datetime"] = "09/21 00:25"
+    comments[4]["ip_datetime"] = "1.2.3.4 13/45 00:27"
+    return comments
+
+
+ARTICLE_PAGES = [
+    build_article_page([]),
+    build_article_page(build_comments(30)),
+    build_article_page(build_edge_case_comments()).replace(
+        '<div class="push">', '<div class="push warning-box">', 1
+    ),
+    build_article_page(
+        build_comments(3),
+        ending="--\n※ 編輯: someone (1.2.3.4 臺灣), 09/21/2023 00:30:00\n",
+    ),
+    build_article_page(build_comments(3), ending="no ending at all\n"),
+]
+
+
+@pytest.mark.parametrize("page_html", ARTICLE_PAGES)
+def test_backends_extract_identical_strings(page_html: str):
+    lxml_page = LxmlPttPage(page_html)
+    soup_page = SoupPttPage(BeautifulSoup(page_html, "lxml"))
+
+    assert lxml_page.article_meta_values() == soup_page.article_meta_values()
+    assert lxml_page.main_content_text() == soup_page.main_content_text()
+    assert lxml_page.comment_rows() == soup_page.comment_rows()
+
+
+@pytest.mark.parametrize("page_html", ARTICLE_PAGES)
+def test_backends_parse_identical_articles(page_html: str, monkeypatch):
+    monkeypatch.setattr(dag_crawling, "HTML_PARSER_BACKEND", BACKEND_LXML)
+    lxml_article = dag_crawling.parse_article_html(page_html)
+    monkeypatch.setattr(dag_crawling, "HTML_PARSER_BACKEND", BACKEND_SOUP)
+    soup_article = dag_crawling.parse_article_html(page_html)
+
+    lxml_article.pop("last_crawled_datetime")
+    soup_article.pop("last_crawled_datetime")
+    assert lxml_article == soup_article
+
+
+def test_backends_extract_identical_index_rows():
+    articles = [
+        {"article_id": "M.1695226745.A.B50", "title": "[問卦] a & b", "author": "a", "nrec": "爆"},
+        {"article_id": "M.1695226746.A.B51", "title": "Re: [新聞] x", "author": "b", "nrec": ""},
+    ]
+    announcements = [
+        {"article_id": "M.1695226747.A.B52", "title": "[公告] x", "author": "c", "nrec": "5"}
+    ]
+    page_html = build_index_page("Gossiping", 39001, articles, announcements)
+    lxml_page = load_page(page_html, backend=BACKEND_LXML)
+    soup_page = load_page(page_html, backend=BACKEND_SOUP)
+
+    assert isinstance(lxml_page, LxmlPttPage)
+    assert lxml_page.paging_links() == soup_page.paging_links()
+    assert lxml_page.num_announcements() == soup_page.num_announcements() == 1
+    assert lxml_page.index_rows() == soup_page.index_rows()
+    assert lxml_page.index_rows()[0] == {
+        "href": "/bbs/Gossiping/M.1695226745.A.B50.html",
+        "title": "[問卦] a & b",
+        "nrec": "爆",
+    }
+    assert dag_crawling.create_page_idx_from_links(lxml_page.paging_links(), 3) == (
+        39001,
+        38999,
+    )
+
+
+def test_load_page_falls_back_to_soup_for_empty_html():
+    page = load_page("", backend=BACKEND_LXML)
+    assert isinstance(page, SoupPttPage)
+    assert page.comment_rows() == []
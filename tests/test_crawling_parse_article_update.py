@@ -0,0 +1,43 @@
+from bs4 import BeautifulSoup
+from mock_ptt_pages import build_article_page, build_comments
+from src.crawler.dags.dag_crawling import (
+    parse_article_html,
+    parse_article_update,
+    parse_comments,
+)
+
+ARTICLE_PAGE = build_article_page(build_comments(50))
+COUNTER_KEYS = ["num_of_comment", "num_of_favor", "num_of_against", "num_of_arrow"]
+
+
+def test_update_returns_only_comments_after_stored_ones():
+    full_result = parse_article_html(ARTICLE_PAGE)
+    update_result = parse_article_update(ARTICLE_PAGE, previous_num_comments=45)
+
+    assert update_result["comments"] == full_result["comments"][45:]
+    for key in COUNTER_KEYS:
+        assert update_result[key] == full_result[key]
+
+
+def test_update_without_stored_comments_returns_all_comments():
+    full_result = parse_article_html(ARTICLE_PAGE)
+    update_result = parse_article_update(ARTICLE_PAGE, previous_num_comments=0)
+    assert update_result["comments"] == full_result["comments"]
+
+
+def test_update_without_new_comments():
+    update_result = parse_article_update(ARTICLE_PAGE, previous_num_comments=50)
+    assert update_result["comments"] == []
+    assert update_result["num_of_comment"] == 50
+
+
+def test_incomplete_comment_time_falls_back_to_skipped_comment():
+    comments = build_comments(3)
+    comments[2]["ip_datetime"] = f'{comments[2]["commenter_ip"]} 09/21 00:2'
+    soup = BeautifulSoup(build_article_page(comments), "lxml")
+
+    _, _, _, all_comments = parse_comments(soup, "Thu Sep 21 00:19:03 2023", None)
+    _, _, _, new_comments = parse_comments(
+        soup, "Thu Sep 21 00:19:03 2023", None, start_from=2
+    )
+    assert new_comments == all_comments[2:]
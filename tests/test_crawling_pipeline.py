@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.results import BulkWriteResult
+from utils_crawler.bulk_writer import ArticleBulkWriter
+from utils_crawler.pipeline import ParseStage, StageStats, WriteStage
+
+
+class RecordingCollection:
+    name = "testing_collection"
+
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.threads = set()
+        self.fail = fail
+
+    def bulk_write(self, operations, ordered=True):
+        self.threads.add(threading.get_ident())
+        if self.fail:
+            raise RuntimeError("bulk write failed")
+        self.calls.append(operations)
+        return BulkWriteResult(
+            {"nUpserted": len(operations), "nModified": 0, "upserted": []}, True
+        )
+
+
+def test_stage_stats_snapshot_is_prefixed_with_stage_name():
+    stats = StageStats("fetch")
+    stats.enter()
+    stats.enter()
+    stats.leave(wait_seconds=0.5, busy_seconds=1.25)
+
+    assert stats.snapshot() == {
+        "fetch_items": 1,
+        "fetch_busy_seconds": 1.25,
+        "fetch_wait_seconds": 0.5,
+        "fetch_queue_depth": 1,
+        "fetch_max_queue_depth": 2,
+    }
+
+
+def test_parse_stage_never_hands_over_more_than_max_pending_pages():
+    running, peak = 0, 0
+    lock = threading.Lock()
+
+    def parse(page_html):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        threading.Event().wait(0.02)
+        with lock:
+            running -= 1
+        return page_html.upper()
+
+    async def run():
+        stage = ParseStage(workers=4, max_pending=2, executor=ThreadPoolExecutor(4))
+        try:
+            return stage, await asyncio.gather(*(stage.parse(parse, f"p{i}") for i in range(6)))
+        finally:
+            stage.close()
+
+    stage, results = asyncio.run(run())
+    assert results == [f"P{i}" for i in range(6)]
+    assert peak <= 2
+    assert stage.stats.snapshot()["parse_items"] == 6
+
+
+def test_write_stage_writes_windows_off_the_event_loop_and_calls_back_after_writing():
+    collection = RecordingCollection()
+    writer = ArticleBulkWriter(collection, flush_every_pages=2)
+    written = []
+
+    async def run():
+        loop_thread = threading.get_ident()
+        async with WriteStage(writer, max_pending_batches=1) as stage:
+            for page in range(5):
+                writer.add_inserts([{"article_url": f"{page}"}])
+                await stage.page_done(on_written=lambda page=page: written.append(page))
+        return loop_thread
+
+    loop_thread = asyncio.run(run())
+    # two full windows and the last page written on exit
+    assert [len(operations) for operations in collection.calls] == [2, 2, 1]
+    assert written == [1, 3, 4]
+    assert loop_thread not in collection.threads
+    assert writer.operations == []
+
+
+def test_write_stage_raises_write_errors_to_the_crawl():
+    writer = ArticleBulkWriter(RecordingCollection(fail=True), flush_every_pages=1)
+    written = []
+
+    async def run():
+        async with WriteStage(writer) as stage:
+            writer.add_inserts([{"article_url": "a"}])
+            await stage.page_done(on_written=lambda: written.append("a"))
+
+    with pytest.raises(RuntimeError, match="bulk write failed"):
+        asyncio.run(run())
+    assert written == []
+
+
+def test_write_stage_does_not_write_or_call_back_the_batches_after_a_failed_one():
+    class FailingSecondWriteCollection(RecordingCollection):
+        attempts = 0
+
+        def bulk_write(self, operations, ordered=True):
+            self.attempts += 1
+            if self.attempts == 2:
+                # the next pages are queued meanwhile
+                threading.Event().wait(0.05)
+                raise RuntimeError("bulk write failed")
+            return super().bulk_write(operations, ordered)
+
+    collection = FailingSecondWriteCollection()
+    writer = ArticleBulkWriter(collection, flush_every_pages=1)
+    written, handed_over = [], []
+
+    async def run():
+        async with WriteStage(writer, max_pending_batches=3) as stage:
+            for page in range(4):
+                writer.add_inserts([{"article_url": f"{page}"}])
+                await stage.page_done(on_written=lambda page=page: written.append(page))
+                handed_over.append(page)
+
+    with pytest.raises(RuntimeError, match="bulk write failed"):
+        asyncio.run(run())
+    assert len(handed_over) > 2
+    assert written == [0]
+    assert len(collection.calls) == 1
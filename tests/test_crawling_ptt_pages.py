@@ -0,0 +1,37 @@
+import pytest
+from mock_ptt_pages import load_ptt_pages
+from utils_crawler.page_parser import BACKEND_LXML, BACKEND_SOUP, load_page
+import src.crawler.dags.dag_crawling as dag_crawling
+
+ARTICLE_PAGES = load_ptt_pages("article")
+INDEX_PAGES = load_ptt_pages("index")
+
+
+@pytest.mark.parametrize(
+    "entry, page_html", ARTICLE_PAGES, ids=[entry["file"] for entry, _ in ARTICLE_PAGES]
+)
+@pytest.mark.parametrize("backend", [BACKEND_LXML, BACKEND_SOUP])
+def test_parses_recorded_articles(entry: dict, page_html: str, backend: str, monkeypatch):
+    monkeypatch.setattr(dag_crawling, "HTML_PARSER_BACKEND", backend)
+    article = dag_crawling.parse_article_html(page_html)
+
+    assert article["ipaddress"] == entry["expected"]["ipaddress"]
+    assert article["num_of_comment"] == entry["expected"]["num_of_comment"]
+    assert len(article["comments"]) == entry["expected"]["num_of_parsed_comments"]
+
+
+@pytest.mark.parametrize(
+    "entry, page_html", INDEX_PAGES, ids=[entry["file"] for entry, _ in INDEX_PAGES]
+)
+@pytest.mark.parametrize("backend", [BACKEND_LXML, BACKEND_SOUP])
+def test_parses_recorded_index_pages(entry: dict, page_html: str, backend: str):
+    page = load_page(page_html, backend=backend)
+    latest_page, _ = dag_crawling.create_page_idx_from_links(page.paging_links(), 1)
+    num_announcements = page.num_announcements()
+    titles = dag_crawling.exclude_announcements_from_titles(
+        page.index_rows(), num_announcements
+    )
+
+    assert latest_page == entry["expected"]["latest_page"]
+    assert num_announcements == entry["expected"]["num_announcements"]
+    assert len([title for title in titles if title["href"]]) == entry["expected"]["num_articles"]
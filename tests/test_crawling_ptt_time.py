@@ -0,0 +1,88 @@
+import pytz
+import pytest
+from datetime import datetime
+from utils_crawler.ptt_time import parse_article_time, parse_comment_time, taipei_timestamp
+
+TAIPEI_TIMEZONE = pytz.timezone("Asia/Taipei")
+
+
+def strptime_article_time(article_time: str):
+    article_datetime = datetime.strptime(article_time, "%a %b %d %H:%M:%S %Y")
+    return article_datetime, TAIPEI_TIMEZONE.localize(article_datetime).timestamp()
+
+
+def strptime_comment_time(year: str, month: str, day: str, comment_time: str):
+    comment_datetime = datetime.strptime(f"{year}-{month}-{day} {comment_time}", "%Y-%m-%d %H:%M")
+    return TAIPEI_TIMEZONE.localize(comment_datetime).timestamp()
+
+
+def outcome(function, *args):
+    try:
+        return function(*args)
+    except ValueError:
+        return ValueError
+
+
+@pytest.mark.parametrize(
+    "article_time",
+    [
+        "Wed Sep 20 21:40:47 2023",
+        "Fri Sep  8 10:26:08 2023",
+        "Fri Sep 8 10:26:08 2023",
+        "Thu Feb 29 00:00:00 2024",
+        "Sat Sep  9 9:5:7 2023",
+        "Mon Jan 01 00:00:00 2024",
+        # the weekday is not checked against the date
+        "Mon Sep 20 21:40:47 2023",
+        "wed sep 20 21:40:47 2023",
+        "Wed Sep 20 21:40:60 2023",
+        "Wed Sep 20 24:40:47 2023",
+        "Wed Feb 30 21:40:47 2023",
+        "Wed Sep 00 21:40:47 2023",
+        "Wed Sep 20 21:40:47 23",
+        "Wed Sep 20 21:40:47 2023 ",
+        "Wed Sep 20 21:40:47",
+        "Sun Sep 30 23:30:00 1979",
+        "",
+    ],
+)
+def test_article_time_matches_strptime(article_time: str):
+    assert outcome(parse_article_time, article_time) == outcome(
+        strptime_article_time, article_time
+    )
+
+
+@pytest.mark.parametrize(
+    "year, month, day, comment_time",
+    [
+        ("2023", "09", "21", "00:21"),
+        ("2023", "9", "1", "0:1"),
+        ("2023", "12", "31", "23:59"),
+        ("2024", "02", "29", "12:00"),
+        ("2023", "02", "29", "12:00"),
+        ("2023", "13", "01", "12:00"),
+        ("2023", "00", "01", "12:00"),
+        ("2023", "09", "32", "12:00"),
+        ("2023", "09", "21", "24:00"),
+        ("2023", "09", "21", "12:60"),
+        ("2023", "09", "21", "02:l1"),
+        ("2023", "09", "21", "1:5"),
+        ("2023", "09", "21", "12:3\n"),
+        ("2023", "09", "21", ""),
+        ("2023", "09", "21", "１２:３４"),
+        ("023)", "09", "21", "12:34"),
+        ("1979", "07", "01", "00:30"),
+        ("1979", "09", "30", "23:30"),
+        ("1979", "08", "15", "12:00"),
+    ],
+)
+def test_comment_time_matches_strptime(year: str, month: str, day: str, comment_time: str):
+    assert outcome(parse_comment_time, year, month, day, comment_time) == outcome(
+        strptime_comment_time, year, month, day, comment_time
+    )
+
+
+def test_taipei_timestamp_is_a_float_of_epoch_seconds():
+    timestamp = taipei_timestamp(2023, 9, 21, 0, 21)
+    assert isinstance(timestamp, float)
+    assert timestamp == 1695226860
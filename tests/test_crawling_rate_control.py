@@ -0,0 +1,130 @@
+import pytest
+from utils_crawler.rate_control import SIGNAL_LATENCY_SPIKE, AimdRateController
+from utils_crawler.retry_policy import (
+    OUTCOME_OK,
+    OUTCOME_SERVER_ERROR,
+    OUTCOME_THROTTLED,
+    OUTCOME_OVER18_REDIRECT,
+)
+from fake_redis import FakeRedis
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def create_controller(clock, state_path=None, initial_rate=2.0, weight=1.0, redis_client=None):
+    return AimdRateController(
+        initial_rate=initial_rate,
+        min_rate=0.5,
+        max_rate=4.0,
+        increase_per_second=1.0,
+        decrease_factor=0.5,
+        decrease_cooldown=10.0,
+        latency_spike_factor=4.0,
+        latency_spike_min_seconds=1.0,
+        state_path=state_path,
+        clock=clock,
+        weight=weight,
+        redis_client=redis_client,
+        redis_key="ptt:rate_control:www.ptt.cc",
+    )
+
+
+def test_healthy_responses_raise_the_rate_additively_up_to_the_ceiling():
+    controller = create_controller(FakeClock())
+    controller.observe(OUTCOME_OK, 0.1)
+    assert controller.share() == pytest.approx(2.5)
+
+    for _ in range(20):
+        controller.observe(OUTCOME_OK, 0.1)
+    assert controller.share() == 4.0
+
+
+def test_congestion_cuts_the_rate_once_per_cooldown():
+    clock = FakeClock()
+    controller = create_controller(clock)
+
+    assert controller.observe(OUTCOME_SERVER_ERROR, 0.1) == OUTCOME_SERVER_ERROR
+    assert controller.observe(OUTCOME_THROTTLED, 0.1) is None
+    assert controller.share() == 1.0
+
+    clock.now += 10
+    assert controller.observe(OUTCOME_THROTTLED, 0.1) == OUTCOME_THROTTLED
+    clock.now += 10
+    controller.observe(OUTCOME_THROTTLED, 0.1)
+    assert controller.share() == 0.5
+    assert controller.snapshot()["rate_decreases"] == 3
+
+
+def test_latency_spike_cuts_the_rate():
+    controller = create_controller(FakeClock())
+    controller.observe(OUTCOME_OK, 0.5)
+    # slower than usual but below the minimum spike
+    assert controller.observe(OUTCOME_OK, 0.9) is None
+    assert controller.observe(OUTCOME_OK, 3.0) == SIGNAL_LATENCY_SPIKE
+    assert controller.snapshot()["rate_backoffs"][0]["signal"] == SIGNAL_LATENCY_SPIKE
+
+
+def test_over18_redirect_does_not_change_the_rate():
+    controller = create_controller(FakeClock())
+    controller.observe(OUTCOME_OVER18_REDIRECT, 5.0)
+    assert controller.share() == 2.0
+
+
+def test_tasks_of_the_machine_share_one_rate(tmp_path):
+    clock = FakeClock()
+    state_path = str(tmp_path / "www.ptt.cc.json")
+    first = create_controller(clock, state_path)
+    second = create_controller(clock, state_path, initial_rate=3.0)
+
+    assert first.share() == 2.0
+    # the rate of the host is split among the active tasks
+    assert second.share() == 1.0
+
+    second.observe(OUTCOME_SERVER_ERROR, 0.1)
+    assert first.share() == 0.5
+
+    second.leave()
+    assert first.share() == 1.0
+
+
+def test_inactive_tasks_stop_counting(tmp_path):
+    clock = FakeClock()
+    state_path = str(tmp_path / "www.ptt.cc.json")
+    first = create_controller(clock, state_path)
+    second = create_controller(clock, state_path)
+    first.share()
+    second.share()
+
+    clock.now += 120
+    assert first.share() == 2.0
+
+
+def test_tasks_share_the_rate_in_proportion_to_their_weights(tmp_path):
+    clock = FakeClock()
+    state_path = str(tmp_path / "www.ptt.cc.json")
+    gossip = create_controller(clock, state_path, weight=3.0)
+    politics = create_controller(clock, state_path)
+    gossip.share()
+
+    assert politics.share() == 0.5
+    assert gossip.share() == 1.5
+
+
+def test_workers_of_all_the_machines_share_one_rate_through_redis():
+    clock = FakeClock()
+    client = FakeRedis()
+    first = create_controller(clock, redis_client=client)
+    second = create_controller(clock, redis_client=client, initial_rate=3.0)
+
+    assert first.share() == 2.0
+    assert second.share() == 1.0
+
+    second.observe(OUTCOME_SERVER_ERROR, 0.1)
+    assert first.share() == 0.5
+    assert first.snapshot()["rate_active_tasks"] == 2
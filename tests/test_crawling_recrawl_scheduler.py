@@ -0,0 +1,67 @@
+import pytest
+from utils_crawler.recrawl_scheduler import (
+    RecrawlScheduler,
+    decayed_velocity,
+    observe_velocity,
+    recrawl_priority,
+)
+
+HALF_LIFE = 6 * 60 * 60
+MAX_ARTICLE_AGE = 3 * 24 * 60 * 60
+NOW = 1_700_000_000
+
+
+def build_state(velocity: float, observed_datetime: float = NOW) -> dict:
+    return {"velocity": velocity, "num_of_comment": 10, "observed_datetime": observed_datetime}
+
+
+def test_first_observation_spreads_comments_over_article_age():
+    state = observe_velocity(None, 20, NOW, NOW - 2 * 3600, HALF_LIFE)
+    assert state == {"velocity": 10.0, "num_of_comment": 20, "observed_datetime": NOW}
+
+
+def test_first_observation_without_article_time_has_no_velocity():
+    assert observe_velocity(None, 20, NOW, None, HALF_LIFE)["velocity"] == 0.0
+
+
+def test_observation_smooths_new_comments_with_previous_velocity():
+    previous = build_state(velocity=10.0, observed_datetime=NOW - 3600)
+    state = observe_velocity(previous, 40, NOW, NOW - 5 * 3600, HALF_LIFE)
+    expected = 0.5 * 30 + 0.5 * decayed_velocity(previous, NOW, HALF_LIFE)
+    assert state["velocity"] == pytest.approx(expected)
+    assert state["num_of_comment"] == 40
+
+
+def test_velocity_halves_after_half_life():
+    state = build_state(velocity=8.0)
+    assert decayed_velocity(state, NOW + HALF_LIFE, HALF_LIFE) == pytest.approx(4.0)
+
+
+def test_priority_grows_with_elapsed_time_and_is_bounded():
+    state = build_state(velocity=6.0)
+    assert recrawl_priority(state, NOW, HALF_LIFE) == 0
+    one_hour = recrawl_priority(state, NOW + 3600, HALF_LIFE)
+    two_hours = recrawl_priority(state, NOW + 2 * 3600, HALF_LIFE)
+    assert 0 < one_hour < two_hours < 6.0 * 2
+    assert recrawl_priority(state, NOW + 100 * HALF_LIFE, HALF_LIFE) == pytest.approx(
+        6.0 * HALF_LIFE / 3600 / 0.6931471805599453
+    )
+
+
+def test_scheduler_hands_out_budget_to_highest_priorities():
+    scheduler = RecrawlScheduler(2, HALF_LIFE, MAX_ARTICLE_AGE)
+    for article_url, velocity in [("slow", 2.0), ("fast", 50.0), ("medium", 10.0)]:
+        scheduler.push(article_url, build_state(velocity, NOW - 3600), NOW - 7200, NOW)
+
+    batch = scheduler.pop_batch()
+    assert [article_url for article_url, _ in batch] == ["fast", "medium"]
+    assert batch[0][1] > batch[1][1]
+    assert len(scheduler) == 1
+
+
+def test_scheduler_skips_old_and_quiet_articles():
+    scheduler = RecrawlScheduler(10, HALF_LIFE, MAX_ARTICLE_AGE, min_expected_comments=1.0)
+    old_time = NOW - MAX_ARTICLE_AGE - 1
+    assert scheduler.push("old", build_state(50.0, NOW - 3600), old_time, NOW) == 0
+    assert scheduler.push("quiet", build_state(0.1, NOW - 3600), NOW - 7200, NOW) == 0
+    assert scheduler.pop_batch() == []
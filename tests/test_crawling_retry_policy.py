@@ -0,0 +1,92 @@
+import random
+from utils_crawler.retry_policy import (
+    OUTCOME_OK,
+    OUTCOME_CLIENT_ERROR,
+    OUTCOME_SERVER_ERROR,
+    OUTCOME_THROTTLED,
+    OUTCOME_CONNECTION_ERROR,
+    OUTCOME_OVER18_REDIRECT,
+    RetryBudget,
+    AttemptRecorder,
+    ExponentialBackoffRetryPolicy,
+    classify_attempt,
+)
+
+
+def create_policy(max_attempts: int = 5, reserve: int = 10):
+    return ExponentialBackoffRetryPolicy(
+        max_attempts=max_attempts,
+        base_delay=2.0,
+        max_delay=60.0,
+        budget=RetryBudget(retry_ratio=0.25, reserve=reserve),
+        rng=random.Random(0),
+    )
+
+
+def test_classify_attempt():
+    assert classify_attempt(200, "https://www.ptt.cc/bbs/Gossiping/index.html") == OUTCOME_OK
+    assert classify_attempt(404, "https://www.ptt.cc/bbs/Gossiping/M.1.A.1.html") == OUTCOME_CLIENT_ERROR
+    assert classify_attempt(503, "https://www.ptt.cc/bbs/Gossiping/index.html") == OUTCOME_SERVER_ERROR
+    assert classify_attempt(429, "https://www.ptt.cc/bbs/Gossiping/index.html") == OUTCOME_THROTTLED
+    assert classify_attempt(200, "https://www.ptt.cc/ask/over18?from=%2Fbbs") == OUTCOME_OVER18_REDIRECT
+    assert classify_attempt(error=ConnectionError()) == OUTCOME_CONNECTION_ERROR
+
+
+def test_client_errors_are_not_retried():
+    assert create_policy().should_retry(OUTCOME_CLIENT_ERROR, 1) is False
+
+
+def test_retries_stop_at_max_attempts():
+    policy = create_policy(max_attempts=3)
+    assert policy.should_retry(OUTCOME_SERVER_ERROR, 2) is True
+    assert policy.should_retry(OUTCOME_SERVER_ERROR, 3) is False
+
+
+def test_retries_stop_when_budget_is_spent():
+    policy = create_policy(reserve=2)
+    assert [policy.should_retry(OUTCOME_CONNECTION_ERROR, 1) for _ in range(3)] == [
+        True,
+        True,
+        False,
+    ]
+
+
+def test_answered_requests_refill_the_budget_up_to_the_reserve():
+    policy = create_policy(reserve=2)
+    for _ in range(100):
+        policy.record_answer()
+    assert [policy.should_retry(OUTCOME_SERVER_ERROR, 1) for _ in range(3)] == [True, True, False]
+
+    for _ in range(3):
+        policy.record_answer()
+    assert policy.should_retry(OUTCOME_SERVER_ERROR, 1) is False
+    policy.record_answer()
+    assert policy.should_retry(OUTCOME_SERVER_ERROR, 1) is True
+
+
+def test_over18_redirect_does_not_spend_budget_or_wait():
+    policy = create_policy(reserve=0)
+    assert policy.should_retry(OUTCOME_OVER18_REDIRECT, 1) is True
+    assert policy.backoff(OUTCOME_OVER18_REDIRECT, 1) == 0.0
+
+
+def test_backoff_grows_exponentially_and_is_capped():
+    policy = create_policy()
+    for attempt in range(1, 10):
+        assert 0 <= policy.backoff(OUTCOME_SERVER_ERROR, attempt) <= min(
+            60.0, 2.0 * 2 ** (attempt - 1)
+        )
+
+
+def test_recorder_summary_counts_requests_and_retries():
+    recorder = AttemptRecorder()
+    recorder.record("a", 1, OUTCOME_OK, 200, 0.1)
+    position = len(recorder.attempts)
+    recorder.record("b", 1, OUTCOME_SERVER_ERROR, 503, 0.1)
+    recorder.record("b", 2, OUTCOME_OK, 200, 0.1)
+
+    assert recorder.summary(since=position) == {
+        "requests": 2,
+        "retries": 1,
+        "outcomes": {OUTCOME_SERVER_ERROR: 1, OUTCOME_OK: 1},
+    }
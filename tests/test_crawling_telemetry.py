@@ -0,0 +1,112 @@
+import os
+from types import SimpleNamespace
+from utils_crawler.pipeline import StageStats
+from utils_crawler.retry_policy import OUTCOME_OK, OUTCOME_SERVER_ERROR, AttemptRecorder
+from utils_crawler.telemetry import (
+    METRICS_FILE_NAME,
+    CrawlTelemetry,
+    Histogram,
+    export_telemetry,
+    load_histograms,
+    series_key,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def build_telemetry():
+    engine = SimpleNamespace(
+        recorder=AttemptRecorder(), sleep_seconds=0.0, parse_stats=StageStats("parse")
+    )
+    writer = SimpleNamespace(write_seconds=0.0, written_operations=0)
+    clock = FakeClock()
+    return CrawlTelemetry("logger_test", engine, writer, clock=clock), engine, writer, clock
+
+
+def test_histogram_exposition_is_cumulative():
+    histogram = Histogram((1, 5))
+    for value in [0.5, 1, 3, 7]:
+        histogram.observe(value)
+
+    assert histogram.exposition("metric", {"crawler": "a"}) == [
+        'metric_bucket{crawler="a",le="1"} 2',
+        'metric_bucket{crawler="a",le="5"} 3',
+        'metric_bucket{crawler="a",le="+Inf"} 4',
+        'metric_sum{crawler="a"} 11.5',
+        'metric_count{crawler="a"} 4',
+    ]
+
+
+def test_page_done_measures_the_counters_since_the_previous_page():
+    telemetry, engine, writer, clock = build_telemetry()
+    engine.recorder.record("a", 1, OUTCOME_SERVER_ERROR, 503, 0.5, 100)
+    engine.recorder.record("a", 2, OUTCOME_OK, 200, 0.25, 2000)
+    engine.sleep_seconds += 4.0
+    engine.parse_stats.leave(0.0, 0.125)
+    telemetry.add_db_read(0.5)
+    writer.write_seconds += 0.25
+    writer.written_operations += 20
+    clock.now = 6.0
+
+    assert telemetry.page_done() == {
+        "page_seconds": 6.0,
+        "network_seconds": 0.75,
+        "sleep_seconds": 4.0,
+        "parse_seconds": 0.125,
+        "mongo_seconds": 0.75,
+        "bytes": 2100,
+        "requests": 2,
+        "retries": 1,
+        "db_reads": 1,
+        "db_writes": 20,
+    }
+    clock.now = 7.0
+    assert telemetry.page_done()["requests"] == 0
+
+    stage_seconds = telemetry.histograms[
+        series_key("ptt_crawler_page_seconds", crawler="logger_test", stage="sleep")
+    ]
+    assert stage_seconds.count == 2
+    assert stage_seconds.total == 4.0
+
+
+def test_run_summary_includes_what_happened_after_the_last_page():
+    telemetry, engine, writer, clock = build_telemetry()
+    clock.now = 1.0
+    telemetry.page_done()
+    # the last window is written while the write stage is closed
+    writer.write_seconds += 0.5
+    writer.written_operations += 3
+    clock.now = 1.5
+
+    summary = telemetry.run_summary()
+    assert summary["run_pages"] == 1
+    assert summary["run_seconds"] == 1.5
+    assert summary["run_mongo_seconds"] == 0.5
+    assert summary["run_db_writes"] == 3
+
+
+def test_export_accumulates_task_runs_into_one_metrics_file(tmp_path):
+    for _ in range(2):
+        telemetry, _, _, clock = build_telemetry()
+        clock.now = 2.0
+        telemetry.page_done()
+        export_telemetry(str(tmp_path), telemetry)
+
+    histograms = load_histograms(str(tmp_path))
+    page_seconds = histograms[
+        series_key("ptt_crawler_page_seconds", crawler="logger_test", stage="page")
+    ]
+    assert page_seconds.count == 2
+    assert page_seconds.total == 4.0
+
+    with open(os.path.join(tmp_path, METRICS_FILE_NAME)) as file:
+        metrics = file.read()
+    assert metrics.count("# TYPE ptt_crawler_page_seconds histogram") == 1
+    assert 'ptt_crawler_page_seconds_count{crawler="logger_test",stage="page"} 2' in metrics
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+from utils_crawler.crawl_engine import AsyncCrawlEngine, TokenBucket, HostPolitenessBudget
+from utils_crawler.retry_policy import RetryPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_is_available_immediately():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, capacity=3, clock=clock)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire() == 1.0
+
+
+def test_tokens_refill_with_time():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=1, clock=clock)
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.5
+    clock.now = 0.5
+    assert bucket.try_acquire() == 0.0
+
+
+def test_rate_change_keeps_the_tokens_refilled_so_far():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, capacity=3, clock=clock)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    clock.now = 0.5
+    bucket.set_rate(4.0)
+    assert bucket.try_acquire() == 0.125
+
+
+def test_acquire_waits_for_token():
+    bucket = TokenBucket(rate=20.0, capacity=1)
+
+    async def acquire_twice():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await bucket.acquire()
+        await bucket.acquire()
+        return loop.time() - start
+
+    assert asyncio.run(acquire_twice()) >= 0.04
+
+
+def test_each_host_has_its_own_bucket():
+    budget = HostPolitenessBudget(rate=1.0, capacity=1)
+    ptt = budget.bucket_for("https://www.ptt.cc/bbs/Gossiping/index.html")
+    assert ptt is budget.bucket_for("https://www.ptt.cc/bbs/HatePolitics/index.html")
+    assert ptt is not budget.bucket_for("http://127.0.0.1:8000/bbs/Gossiping/index.html")
+
+
+def test_the_share_of_the_rate_is_synced_once_per_interval_off_the_event_loop():
+    loop_threads, share_threads = [], []
+
+    class CountingController:
+        def share(self):
+            share_threads.append(threading.get_ident())
+            return 50.0
+
+    engine = AsyncCrawlEngine(
+        user_agent_factory=lambda: "ua",
+        over18_data={},
+        max_in_flight=4,
+        requests_per_second=1.0,
+        burst=10,
+        retry_policy=RetryPolicy(),
+        rate_controller=lambda host: CountingController(),
+        rate_sync_seconds=60.0,
+    )
+
+    async def wait_for_tokens():
+        loop_threads.append(threading.get_ident())
+        for _ in range(5):
+            await engine._wait_for_token("https://www.ptt.cc/bbs/Gossiping/index.html")
+
+    asyncio.run(wait_for_tokens())
+    assert len(share_threads) == 1
+    assert share_threads[0] != loop_threads[0]
+    assert engine.budget.bucket_for("https://www.ptt.cc/bbs/Gossiping/index.html").rate == 50.0
@@ -31,3 +31,45 @@ def test_update_ip_with_error_ip():
         assert document["article_data"]["ipaddress"] == f"192.168.0.{idx}"
 
     db[TARGET_COLLECTION].delete_many({"_id": {"$regex": "^wrong_ip_"}})
+
+
+def test_update_ip_with_error_commenter_ip():
+    db[TARGET_COLLECTION].insert_many(
+        [
+            {
+                "_id": "wrong_commenter_ip_1",
+                "article_data": {
+                    "ipaddress": "192.168.0.1",
+                    "comments": [
+                        {"commenter_id": "a", "commenter_ip": "10.0.0.1 "},
+                        {"commenter_id": "b", "commenter_ip": None},
+                        {"commenter_id": "c", "commenter_ip": "10.0.0.3"},
+                    ],
+                },
+            },
+            {
+                "_id": "wrong_commenter_ip_2",
+                "article_data": {"ipaddress": "192.168.0.2 ", "comments": []},
+            },
+            {
+                "_id": "wrong_commenter_ip_3",
+                "article_data": {"ipaddress": "192.168.0.3"},
+            },
+        ]
+    )
+
+    assert update_wrong_ip(TARGET_COLLECTION) == 2
+    documents = {
+        document["_id"]: document["article_data"]
+        for document in db[TARGET_COLLECTION].find({"_id": {"$regex": "^wrong_commenter_ip_"}})
+    }
+
+    assert [comment["commenter_ip"] for comment in documents["wrong_commenter_ip_1"]["comments"]] == [
+        "10.0.0.1",
+        None,
+        "10.0.0.3",
+    ]
+    assert documents["wrong_commenter_ip_2"] == {"ipaddress": "192.168.0.2", "comments": []}
+    assert documents["wrong_commenter_ip_3"] == {"ipaddress": "192.168.0.3"}
+
+    db[TARGET_COLLECTION].delete_many({"_id": {"$regex": "^wrong_commenter_ip_"}})
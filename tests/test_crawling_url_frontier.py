@@ -0,0 +1,134 @@
+import asyncio
+import functools
+import threading
+import pytest
+from pymongo.results import BulkWriteResult
+from utils_crawler.bulk_writer import ArticleBulkWriter
+from utils_crawler.pipeline import WriteStage
+from utils_crawler.url_frontier import ITEM_KIND_ARTICLE, ITEM_KIND_INDEX, UrlFrontier
+from fake_redis import FakeRedis
+
+LEASE_SECONDS = 600
+
+
+def create_frontier(client: FakeRedis, worker_id: str) -> UrlFrontier:
+    return UrlFrontier(client, "gossip:dag:run", worker_id=worker_id, lease_seconds=LEASE_SECONDS)
+
+
+def index_item(page_idx: int, priority: int) -> dict:
+    return {
+        "url": f"https://www.ptt.cc/bbs/Gossiping/index{page_idx}.html",
+        "priority": priority,
+        "kind": ITEM_KIND_INDEX,
+        "page_idx": page_idx,
+    }
+
+
+def article_item(name: str, priority: float) -> dict:
+    return {
+        "url": f"https://www.ptt.cc/bbs/Gossiping/{name}.html",
+        "priority": priority,
+        "kind": ITEM_KIND_ARTICLE,
+        "page_idx": 100,
+        "nrec": "",
+        "title": "[問卦] 推",
+    }
+
+
+def test_urls_are_queued_once_per_run():
+    frontier = create_frontier(FakeRedis(), "a")
+    assert frontier.push([index_item(100, 0), index_item(99, 1)]) == 2
+    assert frontier.push([index_item(100, 0), index_item(98, 2)]) == 1
+
+    leased = frontier.lease(10)
+    frontier.ack([item["url"] for item in leased])
+    # done urls stay seen: a page listing them again does not queue them
+    assert frontier.push([index_item(100, 0)]) == 0
+    assert frontier.stats() == {"frontier_seen": 3, "frontier_queued": 0, "frontier_done": 3}
+
+
+def test_workers_lease_disjoint_batches_by_priority():
+    client = FakeRedis()
+    first, second = create_frontier(client, "a"), create_frontier(client, "b")
+    first.push([index_item(100, 0), index_item(99, 1)])
+    first.push([article_item("M.1", 0.5), article_item("M.2", 0.5)])
+
+    first_batch = first.lease(2)
+    assert first_batch == [index_item(100, 0), article_item("M.1", 0.5)]
+    second_batch = second.lease(10)
+    assert second_batch == [article_item("M.2", 0.5), index_item(99, 1)]
+
+    assert second.lease(10) == []
+    assert not second.is_drained()
+    first.ack([item["url"] for item in first_batch])
+    second.ack([item["url"] for item in second_batch])
+    assert first.is_drained()
+
+
+def test_urls_of_a_dead_worker_are_leased_again_after_the_visibility_timeout():
+    client = FakeRedis()
+    dead, alive = create_frontier(client, "dead"), create_frontier(client, "alive")
+    dead.push([index_item(100, 0)])
+    assert len(dead.lease(1)) == 1
+
+    client.clock.now += LEASE_SECONDS - 1
+    assert alive.lease(1) == []
+    client.clock.now += 1
+    assert alive.lease(1) == [index_item(100, 0)]
+
+
+def test_released_urls_are_leased_again_at_once():
+    client = FakeRedis()
+    failing, other = create_frontier(client, "failing"), create_frontier(client, "other")
+    failing.push([index_item(100, 0)])
+    leased = failing.lease(1)
+
+    failing.release([item["url"] for item in leased])
+    assert other.lease(1) == leased
+
+
+def test_acknowledged_urls_are_not_leased_again():
+    client = FakeRedis()
+    first, second = create_frontier(client, "a"), create_frontier(client, "b")
+    first.push([index_item(100, 0)])
+    leased = first.lease(1)
+    first.ack([item["url"] for item in leased])
+
+    client.clock.now += LEASE_SECONDS
+    assert second.lease(1) == []
+    assert second.is_drained()
+
+
+class FailingSecondWriteCollection:
+    name = "testing_collection"
+
+    def __init__(self):
+        self.attempts = 0
+
+    def bulk_write(self, operations, ordered=True):
+        self.attempts += 1
+        if self.attempts == 2:
+            # the next batches are handed over meanwhile
+            threading.Event().wait(0.05)
+            raise RuntimeError("bulk write failed")
+        return BulkWriteResult({"nInserted": len(operations), "upserted": []}, True)
+
+
+def test_articles_handed_over_after_a_failed_write_are_not_acknowledged():
+    frontier = create_frontier(FakeRedis(), "a")
+    frontier.push([article_item(f"M.{i}", i) for i in range(4)])
+    writer = ArticleBulkWriter(FailingSecondWriteCollection(), flush_every_pages=1)
+
+    async def crawl():
+        # as crawl_frontier: every batch is acknowledged once it is written
+        async with WriteStage(writer, max_pending_batches=3) as stage:
+            while leased := frontier.lease(1):
+                writer.add_inserts([{"article_url": item["url"]} for item in leased])
+                await stage.page_done(
+                    on_written=functools.partial(frontier.ack, [item["url"] for item in leased])
+                )
+
+    with pytest.raises(RuntimeError, match="bulk write failed"):
+        asyncio.run(crawl())
+    assert frontier.stats()["frontier_done"] == 1
+    assert not frontier.is_drained()
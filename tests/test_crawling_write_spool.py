@@ -0,0 +1,178 @@
+import os
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+from pymongo.results import BulkWriteResult
+from utils_crawler.bulk_writer import ArticleBulkWriter, build_article_update
+from utils_crawler.write_spool import WriteSpool, drain_spool, spool_backlog
+from mock_data import mock_new_data_for_checking_updating
+
+ARTICLE_URL = "https://www.ptt.cc/bbs/Gossiping/M.1695226745.A.B50.html"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingCollection:
+    def __init__(self, name: str, database):
+        self.name = name
+        self.database = database
+
+    def bulk_write(self, operations, ordered=True):
+        if self.database.error is not None:
+            raise self.database.error
+        self.database.calls.append((self.name, operations, ordered))
+        return BulkWriteResult(
+            {"nUpserted": len(operations), "nModified": 0, "upserted": []}, True
+        )
+
+
+class RecordingDatabase:
+    def __init__(self):
+        self.calls = []
+        self.error = None
+
+    def __getitem__(self, name: str):
+        return RecordingCollection(name, self)
+
+
+def segments(spool_dir) -> list[str]:
+    return sorted(name for name in os.listdir(spool_dir) if name != "rejected")
+
+
+def insert_record(article_url: str) -> dict:
+    return {
+        "filter": {"article_url": article_url},
+        "update": {"$setOnInsert": {"article_url": article_url, "article_data": {"title": "推"}}},
+        "upsert": True,
+    }
+
+
+def test_spooled_writes_are_replayed_with_one_bulk_write_per_collection(tmp_path):
+    with WriteSpool(str(tmp_path)) as spool:
+        spool.append("gossip", [insert_record("a"), insert_record("b")])
+        spool.append("politics", [insert_record("c")])
+        spool.append("gossip", [insert_record("d")])
+
+    database = RecordingDatabase()
+    report = drain_spool(str(tmp_path), database)
+
+    assert report["spool_segments"] == 1
+    assert report["spool_operations"] == 4
+    assert [(name, len(operations)) for name, operations, _ in database.calls] == [
+        ("gossip", 3),
+        ("politics", 1),
+    ]
+    operation = database.calls[0][1][0]
+    assert operation._filter == {"article_url": "a"}
+    assert operation._doc["$setOnInsert"]["article_data"]["title"] == "推"
+    assert operation._upsert is True
+    assert segments(tmp_path) == []
+
+
+def test_segment_of_a_running_writer_is_not_replayed(tmp_path):
+    spool = WriteSpool(str(tmp_path))
+    spool.append("gossip", [insert_record("a")])
+    database = RecordingDatabase()
+
+    assert drain_spool(str(tmp_path), database)["spool_segments"] == 0
+    assert spool_backlog(str(tmp_path))["spool_backlog_segments"] == 1
+
+    spool.close()
+    assert drain_spool(str(tmp_path), database)["spool_operations"] == 1
+
+
+def test_segments_are_sealed_when_full_or_old(tmp_path):
+    with WriteSpool(str(tmp_path / "full"), segment_max_bytes=1) as spool:
+        spool.append("gossip", [insert_record("a")])
+        spool.append("gossip", [insert_record("b")])
+        assert [name.endswith(".jsonl") for name in segments(tmp_path / "full")] == [True, False]
+
+    clock = FakeClock()
+    with WriteSpool(str(tmp_path / "old"), segment_max_seconds=60, clock=clock) as spool:
+        spool.append("gossip", [insert_record("a")])
+        clock.now += 59
+        spool.append("gossip", [insert_record("b")])
+        assert len(segments(tmp_path / "old")) == 1
+
+        clock.now += 1
+        spool.append("gossip", [insert_record("c")])
+        assert [name.endswith(".jsonl") for name in segments(tmp_path / "old")] == [True, False]
+
+
+def test_segments_are_kept_while_the_database_is_unreachable(tmp_path):
+    with WriteSpool(str(tmp_path)) as spool:
+        spool.append("gossip", [insert_record("a")])
+    database = RecordingDatabase()
+    database.error = ServerSelectionTimeoutError("no servers")
+
+    assert drain_spool(str(tmp_path), database)["spool_segments"] == 0
+    assert len(segments(tmp_path)) == 1
+
+    database.error = None
+    assert drain_spool(str(tmp_path), database)["spool_operations"] == 1
+    assert segments(tmp_path) == []
+
+
+def test_segment_of_a_crashed_writer_is_replayed_without_its_cut_line(tmp_path):
+    with open(tmp_path / "20231001000000-1-1-00001.open", "wb") as file:
+        file.write(
+            b'{"collection": "gossip", "filter": {"article_url": "a"}, "update": {"$set": {}}, "upsert": false}\n'
+        )
+        file.write(b'{"collection": "gossip", "filter": {"article_u')
+
+    database = RecordingDatabase()
+    report = drain_spool(str(tmp_path), database)
+    assert report["spool_operations"] == 1
+    assert segments(tmp_path) == []
+
+
+def test_segments_with_permanent_write_errors_are_set_aside(tmp_path):
+    with WriteSpool(str(tmp_path)) as spool:
+        spool.append("gossip", [insert_record("a")])
+    database = RecordingDatabase()
+    database.error = BulkWriteError(
+        {"writeErrors": [{"index": 0, "code": 10334, "errmsg": "too large"}], "nUpserted": 0}
+    )
+
+    assert drain_spool(str(tmp_path), database)["spool_rejected_segments"] == 1
+    assert segments(tmp_path) == []
+    assert len(os.listdir(tmp_path / "rejected")) == 1
+
+
+def test_writer_appends_its_flushes_to_the_spool(tmp_path):
+    database = RecordingDatabase()
+    with WriteSpool(str(tmp_path)) as spool:
+        writer = ArticleBulkWriter(database["gossip"], spool=spool)
+        writer.add_inserts([{"article_url": "a"}])
+        writer.add_update(
+            ARTICLE_URL,
+            mock_new_data_for_checking_updating,
+            [{"content": "推"}],
+            previous_num_comments=6,
+        )
+
+        report = writer.flush()
+        assert report["spooled_operations"] == 2
+        assert database.calls == []
+
+    drain_spool(str(tmp_path), database)
+    update = database.calls[0][1][1]
+    assert update._filter == {"article_url": ARTICLE_URL, "article_data.num_of_comment": 6}
+
+
+def test_comments_are_only_appended_to_the_comment_count_they_were_parsed_against():
+    query, update = build_article_update(
+        ARTICLE_URL, mock_new_data_for_checking_updating, [{"content": "推"}], previous_num_comments=6
+    )
+    assert query == {"article_url": ARTICLE_URL, "article_data.num_of_comment": 6}
+    # applied once, the stored count is no longer 6 and a replay matches nothing
+    assert update["$set"]["article_data.num_of_comment"] == 7
+
+    query, _ = build_article_update(
+        ARTICLE_URL, mock_new_data_for_checking_updating, [], previous_num_comments=6
+    )
+    assert query == {"article_url": ARTICLE_URL}